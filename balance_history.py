@@ -1,38 +1,75 @@
 from __future__ import annotations
-import json
 from pathlib import Path
-from typing import Dict, List, Tuple
-import requests
+from typing import Dict, List, Optional, Tuple
 import math
+import time
+
+import json_store
+import metrics
+from portfolio_engine import ENGINE
+from render_cache import RENDERS
+from timeseries_store import SERIES
 
-API = "https://api.mexc.com"
 STORAGE_DIR = Path("storage")
 ENTRIES_FILE = STORAGE_DIR / "entries.json"   # средняя цена входа по активам
 
-def _ensure_storage():
-    STORAGE_DIR.mkdir(parents=True, exist_ok=True)
-    if not ENTRIES_FILE.exists():
-        ENTRIES_FILE.write_text("{}", encoding="utf-8")
+_ENTRIES = json_store.doc(str(ENTRIES_FILE))
 
 def load_entries() -> Dict[str, float]:
-    _ensure_storage()
-    try:
-        return json.loads(ENTRIES_FILE.read_text(encoding="utf-8"))
-    except Exception:
-        return {}
+    return _ENTRIES.load()
 
 def save_entry(asset: str, price: float):
-    d = load_entries()
-    d[asset.upper()] = float(price)
-    ENTRIES_FILE.write_text(json.dumps(d, ensure_ascii=False, indent=2), encoding="utf-8")
-
-def _price(symbol: str) -> float:
-    r = requests.get(f"{API}/api/v3/ticker/price",
-                     params={"symbol": symbol},
-                     timeout=15,
-                     headers={"User-Agent": "Mozilla/5.0"})
-    r.raise_for_status()
-    return float(r.json()["price"])
+    asset = asset.upper()
+    _ENTRIES.update(lambda d: d.__setitem__(asset, float(price)))
+
+STABLES = ("USDT", "USDC")
+
+def _engine_entries(assets: List[str]) -> Dict[str, float]:
+    entries = {a: v for a, v in _ENTRIES.view().items() if a in assets}
+    missing = [f"{a}USDT" for a in assets if a not in entries]
+    if missing:
+        # входа нет в entries.json — посчитаем по локальной истории сделок
+        try:
+            from entries_cache import compute_avg_entries_local
+            for sym, v in compute_avg_entries_local(missing).items():
+                if v.get("avg_entry"):
+                    entries[sym[:-4]] = float(v["avg_entry"])
+        except Exception:
+            pass
+    return entries
+
+# вид общего движка: только свободные позиции, входы из entries.json
+PORTFOLIO = ENGINE.view(_engine_entries, lambda: _ENTRIES.version, qty_mode="free", stables=STABLES)
+
+# ===== История стоимости (timeseries_store, data/series/) =====
+# "total" — итог портфеля, "asset:BTC" — стоимость актива в USDT.
+
+TOTAL_SERIES = "total"
+
+def add_point(total_usdt: float, assets: Optional[Dict[str, float]] = None, ts_ms: Optional[int] = None) -> None:
+    ts = int(time.time() * 1000) if ts_ms is None else int(ts_ms)
+    with metrics.timer("balance_history_add_point_seconds"):
+        SERIES.append(TOTAL_SERIES, ts, float(total_usdt))
+        for asset, value in (assets or {}).items():
+            SERIES.append(f"asset:{asset.upper()}", ts, float(value))
+
+def portfolio_values() -> Tuple[float, Dict[str, float]]:
+    """(итог, {актив: стоимость}) из PORTFOLIO — для add_point."""
+    snap = PORTFOLIO.snapshot()
+    return snap["total"], {r["asset"]: r["value"] for r in snap["rows"] if r["value"] > 0}
+
+def sample_point() -> None:
+    """Точка истории по текущему портфелю (для частой выборки из планировщика)."""
+    total, assets = portfolio_values()
+    add_point(total, assets)
+
+def history(start_ms: int, end_ms: int, name: str = TOTAL_SERIES, level: str = "auto"):
+    """(ts, value) для графика; уровень свёртки подбирается по длине диапазона."""
+    return SERIES.get(name).points(start_ms, end_ms, level)
+
+def history_stats(start_ms: int, end_ms: int, name: str = TOTAL_SERIES) -> Dict[str, float]:
+    """min/max/mean/изменение/макс. просадка за период."""
+    return SERIES.stats(name, start_ms, end_ms)
 
 def _fmt_num(x: float, max_dp: int = 8) -> str:
     if x is None or math.isnan(x) or math.isinf(x):
@@ -46,53 +83,29 @@ def _fmt_num(x: float, max_dp: int = 8) -> str:
     s = f"{x:.8f}".rstrip("0").rstrip(".")
     return s
 
-def _calc_pl(current: float, entry: float, qty: float) -> Tuple[float, float]:
-    if not entry or entry <= 0:
-        return (float("nan"), float("nan"))
-    pct = (current - entry) / entry * 100
-    usdt = (current - entry) * qty
-    return pct, usdt
-
 def calc_portfolio_text() -> str:
     """
-    Использует твой mexc_client.get_account_info() и отображает активы красиво.
-    P/L берётся из storage/entries.json (заводится автоматически сделками через бота).
+    Портфель из готовых строк PORTFOLIO (балансы mexc_client.get_account_info(),
+    входы из storage/entries.json или по истории сделок); здесь только рендер,
+    и тот — один раз на версию вида.
     """
     try:
-        from mexc_client import get_account_info
-        account = get_account_info()
-        balances = account.get("balances") or account
+        with metrics.timer("portfolio_snapshot_seconds", view="balance_history"):
+            snap = PORTFOLIO.snapshot()
     except Exception as e:
+        metrics.swallowed("balance_history.calc_portfolio_text", e)
         return f"Портфель\n\nНе удалось получить активы: {e}"
-
-    entries = load_entries()
-
-    # Собираем активы
-    items = []  # (asset, free, price, value_usdt, entry_price, pl_pct, pl_usdt)
-    total_usdt = 0.0
-
-    for b in balances:
-        free = float(b.get("free", 0) or b.get("available", 0) or 0)
-        asset = (b.get("asset") or b.get("currency") or "").upper()
-        if not asset or free <= 0:
-            continue
-
-        if asset in ("USDT", "USDC"):
-            total_usdt += free
-            items.append((asset, free, 1.0, free, entries.get(asset), float("nan"), float("nan")))
-            continue
-
-        symbol = f"{asset}USDT"
-        try:
-            p = _price(symbol)
-            value = free * p
-            total_usdt += value
-            entry = entries.get(asset)
-            pl_pct, pl_usdt = _calc_pl(p, entry, free) if entry else (float("nan"), float("nan"))
-            items.append((asset, free, p, value, entry, pl_pct, pl_usdt))
-        except Exception:
-            # нет прямой пары — пропустим
-            continue
+    return RENDERS.render("balance_portfolio", snap["version"], lambda: _render_portfolio(snap))
+
+def _render_portfolio(snap) -> str:
+    # (asset, free, price, value_usdt, entry_price, pl_pct, pl_usdt); без цены — пропускаем
+    nan = float("nan")
+    items = [
+        (r["asset"], r["qty"], r["price"], r["value"], r["entry"] or None,
+         nan if r["pl_pct"] is None else r["pl_pct"], nan if r["pl_usdt"] is None else r["pl_usdt"])
+        for r in snap["rows"] if r["price"]
+    ]
+    total_usdt = snap["total"]
 
     if not items:
         return "Портфель\n\nУ тебя нет активов или их не удалось получить."
@@ -104,9 +117,7 @@ def calc_portfolio_text() -> str:
         if asset in ("USDT", "USDC") or value >= 0.5:
             filtered.append(it)
 
-    # сортировка по стоимости
-    filtered.sort(key=lambda x: x[3], reverse=True)
-
+    # строки PORTFOLIO уже отсортированы по стоимости
     lines: List[str] = []
     lines.append("📊 <b>Портфель</b>\n")
 
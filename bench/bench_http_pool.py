@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Латентность одного вызова mexc_client: новый AsyncClient на запрос (как было)
+против общего пула (как стало).
+
+    python -m bench.bench_http_pool [--n 200] [--latency-ms 0]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from bench.mock_mexc import MockMexc
+
+
+async def _old_style(base_url: str, n: int) -> list:
+    import httpx
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        async with httpx.AsyncClient(base_url=base_url, timeout=15.0) as client:
+            r = await client.get("/api/v3/ticker/price", params={"symbol": "BTCUSDT"})
+            r.raise_for_status()
+            r.json()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+async def _pooled(n: int) -> list:
+    import mexc_client
+    await mexc_client.startup()
+    out = []
+    try:
+        for _ in range(n):
+            t0 = time.perf_counter()
+            # max_age=0 — мимо кэша цен: каждая итерация идёт в сеть через пул
+            await mexc_client.get_price("BTCUSDT", max_age=0)
+            out.append(time.perf_counter() - t0)
+    finally:
+        await mexc_client.shutdown()
+    return out
+
+
+def _fmt(name: str, xs: list) -> str:
+    xs = sorted(xs)
+    p50 = statistics.median(xs) * 1000
+    p95 = xs[int(len(xs) * 0.95) - 1] * 1000
+    return f"{name:<10} n={len(xs)}  p50={p50:.3f}ms  p95={p95:.3f}ms  mean={statistics.mean(xs) * 1000:.3f}ms"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    args = ap.parse_args()
+
+    srv = MockMexc(latency_ms=args.latency_ms).start()
+    os.environ["MEXC_BASE_URL"] = srv.base_url
+    try:
+        old = asyncio.run(_old_style(srv.base_url, args.n))
+        new = asyncio.run(_pooled(args.n))
+    finally:
+        srv.stop()
+    print(_fmt("per-call", old))
+    print(_fmt("pooled", new))
+
+
+if __name__ == "__main__":
+    main()
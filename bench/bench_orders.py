@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Параллельные покупки N пользователей против локальной заглушки биржи:
+sync place_market_buy в пуле потоков (как бот через to_thread) против
+place_market_buy_async на общем пуле соединений.
+
+    python -m bench.bench_orders [--users 100] [--latency-ms 100] [--threads 8]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.mock_mexc import MockMexc
+
+
+def _fmt(name: str, wall: float, xs: list) -> str:
+    xs = sorted(xs)
+    p95 = xs[max(0, int(len(xs) * 0.95) - 1)] * 1000
+    return (f"{name:<7} orders={len(xs)}  wall={wall * 1000:.1f}ms  "
+            f"p50={statistics.median(xs) * 1000:.1f}ms  p95={p95:.1f}ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--latency-ms", type=float, default=100.0)
+    ap.add_argument("--threads", type=int, default=8)
+    args = ap.parse_args()
+
+    srv = MockMexc(latency_ms=args.latency_ms, n_symbols=args.users).start()
+    os.environ.update({
+        "MEXC_BASE_URL": srv.base_url, "LIVE_ARM": "1",
+        "MEXC_API_KEY": "bench", "MEXC_SECRET_KEY": "bench",
+    })
+    os.chdir(tempfile.mkdtemp())  # индекс символов пишется в ./storage
+
+    import mexc_client
+    import orders
+    import symbols_index
+    from price_cache import PRICES
+
+    symbols_index.refresh()  # тёплый индекс — как в работающем боте
+    syms = list(srv.symbols)
+
+    def timed_sync(sym):
+        t0 = time.perf_counter()
+        orders.place_market_buy(sym, 25.0)
+        return time.perf_counter() - t0
+
+    try:
+        PRICES.invalidate()
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as ex:
+            sync_lat = list(ex.map(timed_sync, syms))
+        sync_wall = time.perf_counter() - t0
+
+        async def run_async():
+            async def one(sym):
+                t = time.perf_counter()
+                await orders.place_market_buy_async(sym, 25.0)
+                return time.perf_counter() - t
+            await mexc_client.startup()
+            try:
+                PRICES.invalidate()
+                t = time.perf_counter()
+                lat = await asyncio.gather(*(one(s) for s in syms))
+                return time.perf_counter() - t, lat
+            finally:
+                await mexc_client.shutdown()
+
+        async_wall, async_lat = asyncio.run(run_async())
+    finally:
+        srv.stop()
+
+    print(_fmt(f"sync/{args.threads}t", sync_wall, sync_lat))
+    print(_fmt("async", async_wall, async_lat))
+    print(f"(async ограничен пулом: MEXC_HTTP_MAX_CONNECTIONS={mexc_client.HTTP_MAX_CONNECTIONS})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Время оценки вселенной символов в зависимости от числа шардов/воркеров
+(screener_pool). Свечи синтетические, сеть не участвует.
+
+    python -m bench.bench_screener [--symbols 2000] [--candles 300] [--shards 1,2,4,8]
+
+cold — состояния индикаторов пустые (первый прогон, полный пересчёт);
+warm — состояния с прошлого прогона, добавилась одна свеча (обычный час).
+"""
+import argparse
+import time
+from typing import Dict
+
+import numpy as np
+
+import screener_pool
+
+STEP = 3_600_000
+
+
+def _universe(n: int, depth: int, seed: int = 3) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    t0 = (int(time.time() * 1000) // STEP - depth - 1) * STEP
+    out = {}
+    for i in range(n):
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.01, depth)))
+        opn = np.concatenate([[close[0]], close[:-1]])
+        arr = np.empty((depth, 6))
+        arr[:, 0] = t0 + np.arange(depth) * STEP
+        arr[:, 1], arr[:, 4] = opn, close
+        arr[:, 2] = np.maximum(opn, close) * (1 + rng.uniform(0, 0.01, depth))
+        arr[:, 3] = np.minimum(opn, close) * (1 - rng.uniform(0, 0.01, depth))
+        arr[:, 5] = rng.lognormal(7, 0.5, depth)
+        out[f"TKN{i:05d}USDT"] = arr
+    return out
+
+
+def _run(arrays, states, shards: int) -> float:
+    t0 = time.perf_counter()
+    screener_pool.evaluate(arrays, states, 0.0, 7, time.time() * 1000, STEP, workers=shards, shards=shards)
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=2000)
+    ap.add_argument("--candles", type=int, default=300)
+    ap.add_argument("--shards", default="1,2,4,8")
+    args = ap.parse_args()
+
+    screener_pool.PARALLEL_MIN_SYMBOLS = 0
+    arrays = _universe(args.symbols, args.candles)
+    shifted = {s: np.concatenate([a[1:], a[-1:] + [STEP, 0, 0, 0, 0, 0]]) for s, a in arrays.items()}
+    print(f"symbols={args.symbols} candles={args.candles}")
+    print(f"{'shards':>6} {'cold, s':>9} {'warm, s':>9}")
+    try:
+        for k in [int(x) for x in args.shards.split(",")]:
+            if k > 1:
+                _run(arrays, {}, k)  # поднять пул, чтобы не мерить старт процессов
+            states: Dict = {}
+            cold = _run(arrays, states, k)
+            warm = _run(shifted, states, k)
+            print(f"{k:>6} {cold:>9.3f} {warm:>9.3f}")
+    finally:
+        screener_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Скоринг сигналов на синтетическом снимке рынка: построчно через Decimal
+(как было) против массивов NumPy (signals_engine.score_frame).
+
+    python -m bench.bench_signals [--symbols 3000] [--rounds 50]
+"""
+import argparse
+import math
+import random
+import statistics
+import time
+from decimal import Decimal
+from typing import Dict, List
+
+from market_frame import TickerFrame
+from signals_engine import score_frame
+
+
+def _snapshot(n: int, seed: int = 7) -> List[Dict]:
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        quote = "USDT" if i % 5 else rnd.choice(["USDC", "BTC"])
+        opn = rnd.lognormvariate(0, 2)
+        last = opn * rnd.uniform(0.7, 1.4)
+        out.append({
+            "symbol": f"TKN{i:05d}{quote}",
+            "lastPrice": f"{last:.8g}",
+            "openPrice": f"{opn:.8g}",
+            "highPrice": f"{max(opn, last) * 1.05:.8g}",
+            "lowPrice": f"{min(opn, last) * 0.95:.8g}",
+            "priceChangePercent": f"{(last / opn - 1) * 100:.2f}",
+            "volume": f"{rnd.uniform(0, 1e7):.2f}",
+            "quoteVolume": f"{10 ** rnd.uniform(2, 9):.2f}",
+        })
+    return out
+
+
+def _legacy(data: List[Dict]) -> List[Dict]:
+    # прежняя реализация scan_market_for_signals — для сравнения
+    # (с Decimal("0.3") вместо 0.3: смешение float и Decimal падало с TypeError)
+    def _to_dec(x, default="0"):
+        try:
+            return Decimal(str(x))
+        except Exception:
+            return Decimal(default)
+
+    ideas = []
+    for t in data:
+        sym = str(t.get("symbol", ""))
+        if not sym.endswith("USDT"):
+            continue
+        ch_pct = _to_dec(t.get("priceChangePercent", "0"))
+        qvol = _to_dec(t.get("quoteVolume", "0"))
+        last = _to_dec(t.get("lastPrice", "0"))
+        if qvol <= 0 or last <= 0:
+            continue
+        if not (qvol >= Decimal("1000000") and abs(ch_pct) >= Decimal("5")):
+            continue
+        vol_bonus = min(Decimal("0.3"), Decimal(str(math.log10(float(qvol) + 1))) / Decimal("10"))
+        base = Decimal("0.5") + (ch_pct / Decimal("100")) + vol_bonus
+        score = float(max(Decimal("0.0"), min(Decimal("0.99"), base)))
+        ideas.append({"symbol": sym, "score": round(score, 3), "reason": f"Δ {ch_pct}% | V {qvol} | P {last}"})
+    ideas.sort(key=lambda x: x["score"], reverse=True)
+    return ideas[:10]
+
+
+def _time(fn, rounds: int) -> List[float]:
+    out = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def _fmt(name: str, xs: List[float]) -> str:
+    return f"{name:<16} p50 {statistics.median(xs) * 1e3:8.3f} ms   min {min(xs) * 1e3:8.3f} ms"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=3000)
+    ap.add_argument("--rounds", type=int, default=50)
+    args = ap.parse_args()
+
+    data = _snapshot(args.symbols)
+    fr = TickerFrame.from_rows(data)
+
+    old, new = _legacy(data), score_frame(fr)
+    same = [(x["symbol"], x["score"]) for x in old] == [(x["symbol"], x["score"]) for x in new]
+    print(f"symbols={args.symbols} ideas={len(new)} same_top={same}")
+    print(_fmt("decimal rows", _time(lambda: _legacy(data), args.rounds)))
+    print(_fmt("numpy parse+score", _time(lambda: score_frame(TickerFrame.from_rows(data)), args.rounds)))
+    print(_fmt("numpy score", _time(lambda: score_frame(fr), args.rounds)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Подпись запроса: как было (сортировка + сборка строки + hmac.new от сырого
+секрета на каждый запрос, затем httpx кодирует params ещё раз) против
+Signer (копия готового HMAC-состояния, query собирается один раз и уходит
+в URL как есть).
+
+Строка sign — на уровне старой: копия HMAC экономит ~0.8 мкс, примерно
+столько же стоит проверка query на символы, требующие кодирования
+(раньше их подписывали сырыми, а отправляли закодированными). Выигрыш —
+в sign+request: httpx больше не разбирает и не кодирует params заново.
+
+    python -m bench.bench_signer [--n 100000] [--check]
+
+--check — прогнать подписанные запросы через заглушку биржи с проверкой подписи.
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import time
+
+import httpx
+
+SECRET = "x" * 64
+PARAMS = {"symbol": "BTCUSDT", "startTime": 1700000000000, "endTime": 1702592000000, "limit": 1000}
+
+
+def _old_sign(params, secret):
+    q = "&".join(f"{k}={params[k]}" for k in sorted(params.keys()))
+    return hmac.new(secret.encode(), q.encode(), hashlib.sha256).hexdigest()
+
+
+def _old(i):
+    p = dict(PARAMS, recvWindow=5000, timestamp=1700000000000 + i)
+    p["signature"] = _old_sign(p, SECRET)
+    return p
+
+
+def _old_request(i):
+    return httpx.Request("GET", "https://api.mexc.com/api/v3/myTrades", params=_old(i))
+
+
+def _timeit(fn, n: int, rounds: int = 7) -> float:
+    """Лучший из rounds прогонов по n // rounds вызовов — фон машины меньше влияет на сравнение."""
+    per = max(1, n // rounds)
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for i in range(per):
+            fn(i)
+        best = min(best, time.perf_counter() - t0)
+    return best / per * 1e6
+
+
+def _check(n: int) -> None:
+    from bench.mock_mexc import MockMexc
+    srv = MockMexc(secret="bench").start()
+    os.environ.update({"MEXC_BASE_URL": srv.base_url, "MEXC_API_KEY": "bench", "MEXC_API_SECRET": "bench"})
+    from exchange_client import ExchangeClient
+    cli = ExchangeClient(base_url=srv.base_url, api_key="bench", api_secret="bench")
+    try:
+        for i in range(n):
+            cli.request("GET", "/api/v3/myTrades", dict(PARAMS, startTime=PARAMS["startTime"] + i), signed=True)
+        cli.request("POST", "/api/v3/order", {"symbol": "BTCUSDT", "side": "BUY", "type": "MARKET",
+                                              "quoteOrderQty": "25.5", "newClientOrderId": "a b/c"}, signed=True)
+    finally:
+        srv.stop()
+    print(f"check: {n + 1} signed requests, bad signatures: {srv.bad_signatures}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--check", action="store_true")
+    args = ap.parse_args()
+
+    from exchange_client import ExchangeClient
+    cli = ExchangeClient(api_key="bench", api_secret=SECRET)
+
+    def new(i):
+        return cli.sign(dict(PARAMS, timestamp=1700000000000 + i))
+
+    def new_request(i):
+        q, headers = new(i)
+        return httpx.Request("GET", f"https://api.mexc.com/api/v3/myTrades?{q}", headers=headers)
+
+    for name, old_fn, new_fn in (("sign", _old, new), ("sign+request", _old_request, new_request)):
+        o, n = _timeit(old_fn, args.n), _timeit(new_fn, args.n)
+        print(f"{name:<13} old={o:.2f}us  new={n:.2f}us  x{o / n:.2f}")
+    if args.check:
+        _check(200)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная заглушка MEXC REST для бенчмарков.
+
+Запуск в фоне из кода:
+    srv = MockMexc(latency_ms=5).start()
+    os.environ["MEXC_BASE_URL"] = srv.base_url
+    ...
+    srv.stop()
+
+latency_ms (+ случайный jitter_ms) — задержка каждого ответа; error_rate — доля
+запросов, на которые отвечаем 503 (или 429 с Retry-After: retry_after секунд,
+каждый второй сбой);
+n_symbols — размер рынка (/ticker/24hr, /ticker/price, /exchangeInfo);
+n_assets — сколько активов с ненулевым балансом отдаёт /account.
+secret — если задан, подпись запросов проверяется по сырой query
+(всё до "&signature="), как на бирже; неверная — 400 / -1022, а timestamp
+старше recvWindow на момент прихода запроса — 400 / -1021. Оба отказа
+считаются (bad_signatures, stale_timestamps).
+Случайность — от seed, прогоны повторяемы.
+"""
+import hashlib
+import hmac
+import json
+import math
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+def _make_symbols(n: int) -> List[str]:
+    base = ["BTC", "ETH", "SOL", "XRP", "DOGE", "ADA", "TRX", "LINK", "XLM", "TON"]
+    out = [f"{a}USDT" for a in base]
+    i = 0
+    while len(out) < n:
+        out.append(f"TKN{i:04d}USDT")
+        i += 1
+    return out[:n]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # дефолтные 5 дают потерю SYN при пачке новых соединений
+
+
+class MockMexc:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0, n_symbols: int = 50,
+                 error_rate: float = 0.0, jitter_ms: float = 0.0, n_assets: int = 10, seed: int = 1,
+                 secret: Optional[str] = None, retry_after: float = 0.0):
+        self.secret = secret
+        self.retry_after = retry_after
+        self.bad_signatures = 0
+        self.stale_timestamps = 0
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.symbols = _make_symbols(n_symbols)
+        self.prices: Dict[str, float] = {s: 1.0 + i * 0.5 for i, s in enumerate(self.symbols)}
+        self.n_assets = min(n_assets, len(self.symbols))
+        self.hits: Dict[str, int] = {}
+        self.errors = 0
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = _Server((host, port), self._make_handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockMexc":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    # --- маршруты ------------------------------------------------------------
+
+    def route(self, method: str, path: str, q: Dict[str, str]) -> Any:
+        if path == "/api/v3/ticker/price":
+            sym = q.get("symbol")
+            if sym:
+                if sym not in self.prices:
+                    return 400, {"code": -1121, "msg": "Invalid symbol."}
+                return 200, {"symbol": sym, "price": str(self.prices[sym])}
+            return 200, [{"symbol": s, "price": str(p)} for s, p in self.prices.items()]
+        if path == "/api/v3/ticker/24hr":
+            syms = [q["symbol"]] if q.get("symbol") else self.symbols
+            rows = [self._ticker24h(i, s) for i, s in enumerate(syms) if s in self.prices]
+            return 200, rows[0] if q.get("symbol") and rows else rows
+        if path == "/api/v3/account":
+            return 200, {"balances": self._balances()}
+        if path == "/api/v3/exchangeInfo":
+            syms = [q["symbol"]] if q.get("symbol") else self.symbols
+            return 200, {"symbols": [self._symbol_info(s) for s in syms if s in self.prices]}
+        if path == "/api/v3/myTrades":
+            return 200, self._trades(q.get("symbol", ""), int(q.get("startTime", 0)), int(q.get("endTime", 0)),
+                                     int(q.get("limit", 1000)))
+        if path == "/api/v3/klines":
+            return 200, self._klines(q.get("symbol", ""), q.get("interval", "60m"),
+                                     q.get("startTime"), int(q.get("limit", 500)))
+        if path == "/api/v3/order" and method == "POST":
+            return 200, {
+                "symbol": q.get("symbol"), "orderId": str(int(time.time() * 1000)),
+                "status": "FILLED", "type": q.get("type"), "side": q.get("side"),
+                "executedQty": q.get("quantity"),
+            }
+        return 404, {"code": -1, "msg": f"no route {method} {path}"}
+
+    def _ticker24h(self, i: int, sym: str) -> Dict[str, Any]:
+        # детерминированный разброс: рост/падение до ±15%, объёмы на 4 порядка
+        px = self.prices[sym]
+        seed = sum(map(ord, sym)) + i
+        pct = ((seed * 7919) % 3001 - 1500) / 10000.0
+        open_ = px / (1 + pct)
+        volq = 10 ** (3 + (seed * 104729) % 4000 / 1000.0)
+        return {
+            "symbol": sym, "lastPrice": str(px), "openPrice": str(open_),
+            "highPrice": str(max(px, open_) * 1.02), "lowPrice": str(min(px, open_) * 0.98),
+            "priceChangePercent": str(pct), "quoteVolume": str(volq), "volume": str(volq / px),
+        }
+
+    def _balances(self) -> List[Dict[str, Any]]:
+        out = [{"asset": "USDT", "free": "1000", "locked": "0"}]
+        for i, sym in enumerate(self.symbols[: self.n_assets]):
+            out.append({"asset": sym[:-4], "free": str(1.0 + i), "locked": "0"})
+        return out
+
+    def _symbol_info(self, sym: str) -> Dict[str, Any]:
+        return {
+            "symbol": sym, "status": "ENABLED", "baseAsset": sym[:-4], "quoteAsset": "USDT",
+            "filters": [
+                {"filterType": "PRICE_FILTER", "tickSize": "0.0001"},
+                {"filterType": "LOT_SIZE", "stepSize": "0.01"},
+                {"filterType": "NOTIONAL", "minNotional": "1"},
+            ],
+        }
+
+    def _trades(self, sym: str, start_ms: int, end_ms: int, limit: int) -> List[Dict[str, Any]]:
+        # детерминированно: по сделке в сутки, каждая третья — продажа
+        px = self.prices.get(sym, 1.0)
+        day = 24 * 3600 * 1000
+        out = []
+        t = start_ms - start_ms % day + day // 2
+        while t < end_ms and len(out) < limit:
+            if t >= start_ms:
+                n = t // day
+                qty = 1.0 + n % 5
+                out.append({
+                    "symbol": sym, "id": n, "time": t, "isBuyer": n % 3 != 0,
+                    "qty": str(qty), "price": str(px), "quoteQty": str(qty * px),
+                    "commission": "0", "commissionAsset": "USDT",
+                })
+            t += day
+        return out
+
+    def _klines(self, sym: str, interval: str, start: Optional[str], limit: int) -> List[List[Any]]:
+        # детерминированная синусоида с трендом вокруг текущей цены; последняя свеча не закрыта
+        step = {"1m": 60_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+                "60m": 3_600_000, "4h": 14_400_000, "1d": 86_400_000}.get(interval, 3_600_000)
+        now = int(time.time() * 1000)
+        last = now - now % step
+        first = int(start) - int(start) % step if start else last - (limit - 1) * step
+        px, seed = self.prices.get(sym, 1.0), sum(map(ord, sym))
+        out = []
+        t = first
+        while t <= last and len(out) < limit:
+            n = t // step
+            c = px * (1 + 0.03 * math.sin((n + seed) / 7.0) + 0.0005 * (n % 500))
+            o = px * (1 + 0.03 * math.sin((n + seed - 1) / 7.0) + 0.0005 * ((n - 1) % 500))
+            out.append([t, str(o), str(max(o, c) * 1.004), str(min(o, c) * 0.996), str(c),
+                        str(1000 + (n * 37 + seed) % 400), t + step - 1, str(c * 1000)])
+            t += step
+        return out
+
+    @property
+    def signed_rejects(self) -> int:
+        return self.bad_signatures + self.stale_timestamps
+
+    @staticmethod
+    def _timestamp_ok(q: Dict[str, str], now_ms: int) -> bool:
+        try:
+            return now_ms - int(q["timestamp"]) <= int(q.get("recvWindow", 5000))
+        except (KeyError, ValueError):
+            return False
+
+    def _signature_ok(self, query: str) -> bool:
+        payload, _, sig = query.rpartition("&signature=")
+        want = hmac.new(self.secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(want, sig)
+
+    def _make_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def setup(self):
+                super().setup()
+                # без Nagle, иначе delayed ACK добавляет ~40мс к каждому ответу
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self, method: str):
+                u = urlparse(self.path)
+                q = {k: v[-1] for k, v in parse_qs(u.query).items()}
+                arrived_ms = int(time.time() * 1000)
+                with mock._lock:
+                    mock.hits[u.path] = mock.hits.get(u.path, 0) + 1
+                    fail = mock.error_rate > 0 and mock._rnd.random() < mock.error_rate
+                    if fail:
+                        mock.errors += 1
+                    jitter = mock._rnd.random() * mock.jitter_ms if mock.jitter_ms else 0.0
+                if mock.latency_ms or jitter:
+                    time.sleep((mock.latency_ms + jitter) / 1000.0)
+                headers = {}
+                if fail:
+                    if mock.errors % 2:
+                        status, payload = 503, {"code": -1001, "msg": "Service unavailable (mock)"}
+                    else:
+                        status, payload = 429, {"code": -1003, "msg": "Too many requests (mock)"}
+                        headers["Retry-After"] = f"{mock.retry_after:g}"
+                elif mock.secret and "&signature=" in u.query and not mock._signature_ok(u.query):
+                    with mock._lock:
+                        mock.bad_signatures += 1
+                    status, payload = 400, {"code": -1022, "msg": "Signature for this request is not valid."}
+                elif mock.secret and "&signature=" in u.query and not mock._timestamp_ok(q, arrived_ms):
+                    with mock._lock:
+                        mock.stale_timestamps += 1
+                    status, payload = 400, {"code": -1021, "msg": "Timestamp for this request is outside of the recvWindow."}
+                else:
+                    status, payload = mock.route(method, u.path, q)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+        return Handler
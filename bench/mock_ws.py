@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная заглушка WebSocket MEXC (JSON-каналы) для проверки market_feed.
+
+    ws = MockMexcWs(symbols=["BTCUSDT"], interval=0.2).start()
+    feed = MarketFeed(["BTCUSDT"], url=ws.url, snapshot=...)
+    ...
+    ws.drop_all()   # оборвать соединения — проверить переподключение
+    ws.stop()
+
+reject=True — отвечать на подписку отказом, как MEXC на закрытые каналы;
+binary=True — слать бинарные кадры, как protobuf-поток.
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web, WSMsgType
+
+
+class MockMexcWs:
+    def __init__(self, symbols: List[str], host: str = "127.0.0.1", port: int = 0, interval: float = 0.5,
+                 reject: bool = False, binary: bool = False):
+        self.symbols = [s.upper() for s in symbols]
+        self.reject, self.binary = reject, binary
+        self.subscriptions: List[str] = []  # подписки последнего соединения
+        self.prices: Dict[str, float] = {s: 1.0 + i for i, s in enumerate(self.symbols)}
+        self.host, self.port, self.interval = host, port, interval
+        self.connections = 0
+        self.paused = False  # True — соединение живо, но сообщений нет (проверка stale)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._clients: List[web.WebSocketResponse] = []
+        self._ready = threading.Event()
+        self._stop: Optional[asyncio.Event] = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}/ws"
+
+    async def _handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections += 1
+        self._clients.append(ws)
+        subs: List[str] = []
+        self.subscriptions = subs
+        pusher = asyncio.create_task(self._push(ws, subs))
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                m = json.loads(msg.data)
+                if m.get("method") == "SUBSCRIPTION":
+                    params = m.get("params") or []
+                    if self.reject:
+                        await ws.send_str(json.dumps({"id": 0, "code": 0, "msg": f"Not Subscribed successfully! "
+                                                      f"[{','.join(params)}].  Reason： Blocked! "}))
+                        continue
+                    subs.extend(ch for ch in params if ch not in subs)
+                    await ws.send_str(json.dumps({"id": 0, "code": 0, "msg": ",".join(params)}))
+                elif m.get("method") == "UNSUBSCRIPTION":
+                    params = m.get("params") or []
+                    subs[:] = [ch for ch in subs if ch not in params]
+                    await ws.send_str(json.dumps({"id": 0, "code": 0, "msg": ",".join(params)}))
+                elif m.get("method") == "PING":
+                    await ws.send_str(json.dumps({"id": 0, "code": 0, "msg": "PONG"}))
+        finally:
+            pusher.cancel()
+            if ws in self._clients:
+                self._clients.remove(ws)
+        return ws
+
+    async def _push(self, ws, subs: List[str]) -> None:
+        while not ws.closed:
+            await asyncio.sleep(self.interval)
+            if self.paused:
+                continue
+            if self.binary:
+                await ws.send_bytes(b"\x0a\x05spot@")
+                continue
+            now = int(time.time() * 1000)
+            for s in self.symbols:
+                self.prices[s] *= 1.001
+            for ch in list(subs):
+                if ch.startswith("spot@public.miniTickers"):
+                    d = [{"s": s, "p": str(p), "r": "0.01", "h": str(p * 1.02), "l": str(p * 0.98),
+                          "v": "1000", "q": str(p * 1000)} for s, p in self.prices.items()]
+                    await ws.send_str(json.dumps({"c": ch, "d": d, "t": now}))
+                elif ch.startswith("spot@public.bookTicker.v3.api@"):
+                    s = ch.rsplit("@", 1)[1]
+                    p = self.prices.get(s, 1.0)
+                    d = {"b": str(p * 0.999), "B": "1", "a": str(p * 1.001), "A": "1"}
+                    await ws.send_str(json.dumps({"c": ch, "d": d, "s": s, "t": now}))
+                elif ch.startswith("spot@public.deals.v3.api@"):
+                    s = ch.rsplit("@", 1)[1]
+                    d = {"deals": [{"p": str(self.prices.get(s, 1.0)), "v": "1", "S": 1, "t": now}], "e": "spot@public.deals.v3.api"}
+                    await ws.send_str(json.dumps({"c": ch, "d": d, "s": s, "t": now}))
+
+    def drop_all(self) -> None:
+        async def _close():
+            for ws in list(self._clients):
+                await ws.close()
+        asyncio.run_coroutine_threadsafe(_close(), self._loop).result(5)
+
+    def _serve(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        async def main():
+            self._stop = asyncio.Event()
+            app = web.Application()
+            app.router.add_get("/ws", self._handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, self.host, self.port)
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+            self._ready.set()
+            await self._stop.wait()
+            await runner.cleanup()
+
+        self._loop.run_until_complete(main())
+        self._loop.close()
+
+    def start(self) -> "MockMexcWs":
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread is not None:
+            self._thread.join(5)
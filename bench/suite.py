@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Набор сценариев против локальной заглушки MEXC (bench.mock_mexc) с
+результатом в JSON — для сравнения между релизами.
+
+    python -m bench.suite [--symbols 2000] [--latency-ms 20] [--error-rate 0.02]
+                          [--repeat 20] [--only portfolio_render,market_overview]
+                          [--out bench.json] [--baseline prev.json --tolerance 0.25]
+    python -m bench.suite --signed-limits --symbols 200 --assets 4 --repeat 1   # ~35 с
+
+Сценарий — фабрика, возвращающая варианты {имя: вызов}: «cold» сбрасывает
+кэши перед каждым вызовом (как первый запрос после простоя), «warm» — как
+повторная команда. По каждому варианту: n, errors и латентность в мс
+(p50/p95/mean/min/max). Клиентский лимитер веса по умолчанию снят
+(--real-limits — оставить). С --baseline сравниваем p50 с прошлым прогоном;
+рост больше tolerance — регрессия, код выхода 1.
+
+Заглушка проверяет подпись и recvWindow подписанных запросов; любой такой
+отказ (signed_rejects в результате сценария) — тоже код выхода 1.
+--signed-limits — ручная проверка перед релизом: реальный лимитер, 429 с
+Retry-After дольше recvWindow (--retry-after 6) и сценарии с подписанными
+запросами. Запрос, подписанный до ожидания веса, здесь получит -1021.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from bench.mock_mexc import MockMexc
+
+Variants = Dict[str, Callable[[], Any]]
+SCENARIOS: Dict[str, Callable[["Ctx"], Variants]] = {}
+
+
+def scenario(name: str):
+    def deco(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return deco
+
+
+class Ctx:
+    def __init__(self, srv: MockMexc, args: argparse.Namespace):
+        self.srv = srv
+        self.args = args
+        self.assets = [s[:-4] for s in srv.symbols[: srv.n_assets]]
+        self._i = 0
+
+    def next_symbol(self) -> str:
+        # покупки по кругу, чтобы не упираться в один символ
+        self._i += 1
+        return self.srv.symbols[self._i % self.srv.n_assets]
+
+
+def _reset_caches() -> None:
+    from price_cache import PRICES
+    from render_cache import RENDERS
+    PRICES.invalidate()
+    RENDERS.invalidate()
+
+
+# --- сценарии -------------------------------------------------------------------------
+
+@scenario("portfolio_render")
+def _portfolio_render(ctx: Ctx) -> Variants:
+    import main_portfolio_adapter
+
+    def cold():
+        _reset_caches()
+        main_portfolio_adapter.ENGINE.invalidate()
+        return main_portfolio_adapter.calc_portfolio_text()
+
+    return {"cold": cold, "warm": main_portfolio_adapter.calc_portfolio_text}
+
+
+@scenario("market_overview")
+def _market_overview(ctx: Ctx) -> Variants:
+    import market_engine
+
+    def cold():
+        _reset_caches()
+        return market_engine.get_market_overview_text()
+
+    return {"cold": cold, "warm": market_engine.get_market_overview_text}
+
+
+@scenario("signal_scan")
+def _signal_scan(ctx: Ctx) -> Variants:
+    import signals_engine
+
+    def cold():
+        _reset_caches()
+        return signals_engine.scan_market_for_signals()
+
+    return {"cold": cold, "warm": signals_engine.scan_market_for_signals}
+
+
+@scenario("avg_entry")
+def _avg_entry(ctx: Ctx) -> Variants:
+    import entries_cache
+    syms = [a + "USDT" for a in ctx.assets]
+    return {
+        "full": lambda: entries_cache.compute_avg_entries(syms, full=True),
+        "incremental": lambda: entries_cache.compute_avg_entries(syms),
+    }
+
+
+@scenario("order_preview")
+def _order_preview(ctx: Ctx) -> Variants:
+    import orders
+
+    def cold():
+        _reset_caches()
+        return orders.preview_market_buy(ctx.next_symbol(), 25.0)
+
+    return {"cold": cold, "warm": lambda: orders.preview_market_buy(ctx.next_symbol(), 25.0)}
+
+
+# сценарии с подписанными запросами — для --signed-limits
+SIGNED_SCENARIOS = ("portfolio_render", "avg_entry", "order_place")
+
+
+@scenario("order_place")
+def _order_place(ctx: Ctx) -> Variants:
+    import orders
+    return {"sync": lambda: orders.place_market_buy(ctx.next_symbol(), 25.0)}
+
+
+# --- прогон -------------------------------------------------------------------------------
+
+def _summary(lat: List[float], errors: int) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"n": len(lat), "errors": errors}
+    if lat:
+        xs = sorted(x * 1000 for x in lat)
+        out.update({
+            "p50_ms": round(statistics.median(xs), 3),
+            "p95_ms": round(xs[max(0, int(len(xs) * 0.95) - 1)], 3),
+            "mean_ms": round(statistics.mean(xs), 3),
+            "min_ms": round(xs[0], 3),
+            "max_ms": round(xs[-1], 3),
+        })
+    return out
+
+
+def run_variant(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, Any]:
+    for _ in range(warmup):
+        try:
+            fn()
+        except Exception:
+            pass
+    lat, errors = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception:
+            errors += 1
+            continue
+        lat.append(time.perf_counter() - t0)
+    return _summary(lat, errors)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Строки о регрессиях p50 относительно baseline."""
+    out = []
+    for name, variants in current["scenarios"].items():
+        for var, res in variants.items():
+            if not isinstance(res, dict) or "p50_ms" not in res:
+                continue
+            old = baseline.get("scenarios", {}).get(name, {}).get(var, {})
+            if not old.get("p50_ms"):
+                continue
+            ratio = res["p50_ms"] / old["p50_ms"]
+            if ratio > 1 + tolerance:
+                out.append(f"{name}/{var}: p50 {old['p50_ms']}ms -> {res['p50_ms']}ms (x{ratio:.2f})")
+    return out
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=2000)
+    ap.add_argument("--assets", type=int, default=10)
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--retry-after", type=float, default=0.0, help="Retry-After у инжектированных 429, сек")
+    ap.add_argument("--real-limits", action="store_true",
+                    help="оставить клиентский лимитер веса MEXC (иначе меряем код, а не ожидание бюджета)")
+    ap.add_argument("--signed-limits", action="store_true",
+                    help="реальные лимиты + 429 с паузой дольше recvWindow на сценариях с подписью")
+    ap.add_argument("--only", default="", help="сценарии через запятую")
+    ap.add_argument("--out", default="", help="файл для JSON (по умолчанию stdout)")
+    ap.add_argument("--baseline", default="")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    args = ap.parse_args()
+    if args.signed_limits:
+        args.real_limits = True
+        args.error_rate = args.error_rate or 0.05
+        args.retry_after = args.retry_after or 6.0
+        args.only = args.only or ",".join(SIGNED_SCENARIOS)
+
+    srv = MockMexc(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                   n_symbols=args.symbols, n_assets=args.assets, seed=args.seed,
+                   secret="bench", retry_after=args.retry_after).start()
+    os.environ.update({
+        "MEXC_BASE_URL": srv.base_url, "LIVE_ARM": "1", "MEXC_WS_FEED": "0",
+        "MEXC_API_KEY": "bench", "MEXC_SECRET_KEY": "bench", "MEXC_API_SECRET": "bench",
+    })
+    if not args.real_limits:
+        os.environ["MEXC_WEIGHT_CAPACITY"] = "1000000000"
+    out_path = os.path.abspath(args.out) if args.out else ""
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else ""
+    os.chdir(tempfile.mkdtemp())  # storage/ и data/ прогона — во временной папке
+
+    import symbols_index
+    symbols_index.refresh()
+
+    names = [n for n in args.only.split(",") if n] or list(SCENARIOS)
+    ctx = Ctx(srv, args)
+    result: Dict[str, Any] = {
+        "meta": {
+            "ts": int(time.time()), "git": _git_rev(), "python": sys.version.split()[0],
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        },
+        "scenarios": {},
+    }
+    try:
+        for name in names:
+            hits0, err0, rej0 = sum(srv.hits.values()), srv.errors, srv.signed_rejects
+            t0 = time.perf_counter()
+            try:
+                variants = SCENARIOS[name](ctx)
+                res = {var: run_variant(fn, args.repeat) for var, fn in variants.items()}
+            except Exception as e:
+                res = {"failed": f"{type(e).__name__}: {e}"}
+            res["requests"] = sum(srv.hits.values()) - hits0
+            res["injected_errors"] = srv.errors - err0
+            res["signed_rejects"] = srv.signed_rejects - rej0
+            res["wall_s"] = round(time.perf_counter() - t0, 3)
+            result["scenarios"][name] = res
+            print(f"{name}: done in {res['wall_s']}s", file=sys.stderr)
+    finally:
+        srv.stop()
+
+    text = json.dumps(result, ensure_ascii=False, indent=1)
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    failed = False
+    for name, res in result["scenarios"].items():
+        if res.get("signed_rejects"):
+            print(f"SIGNED REJECT {name}: {res['signed_rejects']} request(s) refused by signature/recvWindow",
+                  file=sys.stderr)
+            failed = True
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION " + line, file=sys.stderr)
+        failed = failed or bool(regressions)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Скользящий кэш свечей по символам: в памяти и на диске (data/candles/<interval>/<SYMBOL>.npy).
+
+Свечи хранятся массивом float64 формы (n, 6): open_time, open, high, low, close, volume —
+от старых к новым, не больше KEEP штук. Первый запуск выгружает KEEP свечей; дальше
+каждое обновление просит у биржи только хвост, начиная с последней сохранённой свечи
+(она могла быть ещё не закрыта) — обычно 1–2 свечи на символ.
+
+    arrs = run_sync(CANDLES.update_many(["BTCUSDT", "ETHUSDT"]))
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+import numpy as np
+
+import metrics
+from mexc_client import get_klines
+from rate_limiter import BACKGROUND, lane
+
+DATA_DIR = os.path.join("data", "candles")
+
+INTERVAL = os.getenv("KLINES_INTERVAL", "60m")
+KEEP = int(os.getenv("KLINES_KEEP", "300"))
+KLINES_CONCURRENCY = int(os.getenv("KLINES_CONCURRENCY", "8"))
+KLINES_RETRIES = 3
+
+INTERVAL_MS = {
+    "1m": 60_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "60m": 3_600_000, "4h": 14_400_000, "1d": 86_400_000, "1W": 604_800_000,
+}
+
+T, O, H, L, C, V = range(6)  # колонки массива свечей
+
+
+def _to_array(klines: List[List[Any]]) -> np.ndarray:
+    rows = []
+    for k in klines:
+        try:
+            rows.append([float(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5])])
+        except (TypeError, ValueError, IndexError):
+            continue
+    return np.array(rows, dtype=np.float64).reshape(-1, 6)
+
+
+class CandleStore:
+    def __init__(self, interval: str = INTERVAL, keep: int = KEEP, root: str = DATA_DIR):
+        self.interval = interval
+        self.interval_ms = INTERVAL_MS[interval]
+        self.keep = keep
+        self.dir = os.path.join(root, interval)
+        self._mem: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "candles": 0, "cold": 0, "errors": 0}
+
+    # --- диск / память ------------------------------------------------------------
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.dir, symbol + ".npy")
+
+    def get(self, symbol: str) -> np.ndarray:
+        sym = symbol.upper()
+        with self._lock:
+            arr = self._mem.get(sym)
+            if arr is None:
+                try:
+                    arr = np.load(self._path(sym))
+                    if arr.ndim != 2 or arr.shape[1] != 6:
+                        raise ValueError("bad shape")
+                except (OSError, ValueError):
+                    arr = np.empty((0, 6), dtype=np.float64)
+                self._mem[sym] = arr
+            return arr
+
+    def _save(self, symbol: str, arr: np.ndarray) -> None:
+        os.makedirs(self.dir, exist_ok=True)
+        path = self._path(symbol)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp, path)
+
+    def merge(self, symbol: str, new: np.ndarray) -> np.ndarray:
+        """Дописать свечи: совпадающие по open_time заменяются, хвост обрезается до keep."""
+        sym = symbol.upper()
+        cur = self.get(sym)
+        if len(new):
+            cur = np.concatenate([cur[cur[:, T] < new[0, T]], new])[-self.keep:]
+            with self._lock:
+                self._mem[sym] = cur
+            self._save(sym, cur)
+        return cur
+
+    def closed(self, arr: np.ndarray, now_ms: Optional[float] = None) -> np.ndarray:
+        """Только закрытые свечи (последняя может ещё формироваться)."""
+        now_ms = time.time() * 1000 if now_ms is None else now_ms
+        n = len(arr)
+        while n and arr[n - 1, T] + self.interval_ms > now_ms:
+            n -= 1
+        return arr[:n]
+
+    # --- обновление с биржи -----------------------------------------------------------
+
+    async def _fetch(self, symbol: str, start_ms: Optional[int], limit: int, sem: asyncio.Semaphore) -> np.ndarray:
+        delay = 0.5
+        for attempt in range(KLINES_RETRIES + 1):
+            # вес запроса берёт mexc_client; свечи — фоновая полоса лимитера
+            async with sem:
+                try:
+                    self.stats["requests"] += 1
+                    with lane(BACKGROUND):
+                        return _to_array(await get_klines(symbol, self.interval, start_ms, limit))
+                except httpx.HTTPStatusError as e:
+                    status = e.response.status_code
+                    if (status != 429 and status < 500) or attempt == KLINES_RETRIES:
+                        raise
+                except httpx.TransportError:
+                    if attempt == KLINES_RETRIES:
+                        raise
+            metrics.inc("exchange_retries_total", client="candle_store", endpoint="/api/v3/klines")
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+            delay *= 2
+        return np.empty((0, 6), dtype=np.float64)
+
+    async def update(self, symbol: str, sem: Optional[asyncio.Semaphore] = None) -> np.ndarray:
+        sym = symbol.upper()
+        sem = sem or asyncio.Semaphore(KLINES_CONCURRENCY)
+        cur = self.get(sym)
+        now_ms = time.time() * 1000
+        if len(cur):
+            last = int(cur[-1, T])
+            missing = int((now_ms - last) // self.interval_ms) + 1
+        if not len(cur) or missing >= self.keep:
+            # кэша нет или он безнадёжно устарел — берём всю глубину
+            self.stats["cold"] += 1
+            new = await self._fetch(sym, None, self.keep, sem)
+            cur = np.empty((0, 6), dtype=np.float64)
+            with self._lock:
+                self._mem[sym] = cur
+        else:
+            new = await self._fetch(sym, last, missing + 1, sem)
+        self.stats["candles"] += len(new)
+        return self.merge(sym, new)
+
+    async def update_many(self, symbols: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Обновить символы параллельно; символ с ошибкой просто пропускается."""
+        sem = asyncio.Semaphore(KLINES_CONCURRENCY)
+        syms = [s.upper() for s in symbols]
+        res = await asyncio.gather(*(self.update(s, sem) for s in syms), return_exceptions=True)
+        out = {}
+        for s, r in zip(syms, res):
+            if isinstance(r, BaseException):
+                self.stats["errors"] += 1
+                continue
+            out[s] = r
+        return out
+
+
+CANDLES = CandleStore()
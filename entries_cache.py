@@ -1,42 +1,47 @@
 import os
-import json
 import time
+import random
+import asyncio
 from typing import Dict, Any, List, Tuple, Optional
 
-from mexc_client import get_my_trades
+import httpx
+
+import json_store
+import metrics
+import trade_store
+from mexc_client import get_my_trades, run_sync
+from rate_limiter import BACKGROUND, lane
 
 DATA_DIR = os.path.join("data")
 MANUAL_FILE = os.path.join(DATA_DIR, "avg_entries_manual.json")
 AUTO_FILE = os.path.join(DATA_DIR, "avg_entries_auto.json")
 
+# параллельная выгрузка сделок
+TRADES_CONCURRENCY = int(os.getenv("TRADES_CONCURRENCY", "8"))
+TRADES_RETRIES = 4
+TRADES_PAGE_LIMIT = 1000
+
 os.makedirs(DATA_DIR, exist_ok=True)
 
 
 def _load_json(path: str) -> Dict[str, Any]:
-    if not os.path.exists(path):
-        return {}
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+    data = json_store.doc(path).load()
+    return data if isinstance(data, dict) else {}
 
 
 def _save_json(path: str, data: Dict[str, Any]) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    json_store.doc(path).save(data)
 
 
 # ===== Ручные оверрайды =====
 def load_manual_entries() -> Dict[str, float]:
-    raw = _load_json(MANUAL_FILE)
-    return {k.upper(): float(v) for k, v in raw.items()}
+    raw = json_store.doc(MANUAL_FILE).view()
+    return {k.upper(): float(v) for k, v in raw.items()} if isinstance(raw, dict) else {}
 
 
 def set_manual_entry(symbol: str, price: float) -> None:
-    data = load_manual_entries()
-    data[symbol.upper()] = float(price)
-    _save_json(MANUAL_FILE, data)
+    sym = symbol.upper()
+    json_store.doc(MANUAL_FILE).update(lambda d: d.__setitem__(sym, float(price)))
 
 
 # ===== Авторасчёт из сделок =====
@@ -48,14 +53,13 @@ def save_auto_entries(data: Dict[str, Any]) -> None:
     _save_json(AUTO_FILE, data)
 
 
-def _calc_avg_from_trades(trades: List[Dict[str, Any]]) -> Tuple[Optional[float], float]:
+def _fold_trades(qty: float, cost: float, trades: List[Dict[str, Any]],
+                 realized: float = 0.0) -> Tuple[float, float, float]:
     """
-    Простой FIFO-подобный расчёт средневзвешенной цены по текущему остатку.
-    Возвращает (avg_entry_or_None, qty_result).
-    Комиссии учитываем только если комиссия в quote (USDT).
+    Доливает сделки в состояние позиции (qty, cost, realized) и возвращает новое.
+    realized — зафиксированный P/L продаж по средней цене (в quote).
+    Сделки должны идти по времени. Комиссии учитываем только в quote (USDT).
     """
-    qty = 0.0
-    cost = 0.0  # общая себестоимость (в quote)
     for t in trades:
         # поля API MEXC:
         # isBuyer, qty, quoteQty, price, commission, commissionAsset
@@ -79,20 +83,36 @@ def _calc_avg_from_trades(trades: List[Dict[str, Any]]) -> Tuple[Optional[float]
                 avg = cost / qty
                 cost -= avg * q
                 qty -= q
+                realized += (p * q if p else quote_q) - avg * q
             # комиссия при продаже в USDT — добавим в расходы для корректной средней, если что-то осталось
             if fee_asset in ("USDT", "USD") and qty > 0:
                 cost += fee
+            elif fee_asset in ("USDT", "USD"):
+                realized -= fee
+    return qty, cost, realized
 
+
+def _avg_from_state(qty: float, cost: float) -> Tuple[Optional[float], float]:
     if qty <= 0:
         return None, 0.0
-    avg_entry = cost / qty
-    return avg_entry, qty
+    return cost / qty, qty
 
 
-def _iterate_time_windows(days: int, step_days: int = 30) -> List[Tuple[int, int]]:
+def _calc_avg_from_trades(trades: List[Dict[str, Any]]) -> Tuple[Optional[float], float]:
+    """
+    Простой FIFO-подобный расчёт средневзвешенной цены по текущему остатку.
+    Возвращает (avg_entry_or_None, qty_result).
+    Комиссии учитываем только если комиссия в quote (USDT).
+    """
+    qty, cost, _ = _fold_trades(0.0, 0.0, trades)
+    return _avg_from_state(qty, cost)
+
+
+def _iterate_time_windows(days: int, step_days: int = 30, start_ms: Optional[int] = None) -> List[Tuple[int, int]]:
     now_ms = int(time.time() * 1000)
     res = []
-    start_ms = now_ms - days * 24 * 3600 * 1000
+    if start_ms is None:
+        start_ms = now_ms - days * 24 * 3600 * 1000
     cur = start_ms
     while cur < now_ms:
         end = min(cur + step_days * 24 * 3600 * 1000, now_ms)
@@ -101,28 +121,182 @@ def _iterate_time_windows(days: int, step_days: int = 30) -> List[Tuple[int, int
     return res
 
 
-def compute_avg_entries(symbols: List[str], lookback_days: int = 180) -> Dict[str, Any]:
+async def _fetch_page(sym: str, start_ms: int, end_ms: int, sem: asyncio.Semaphore) -> List[Dict[str, Any]]:
+    """
+    Один запрос сделок с учётом веса запроса и повторами на 429/5xx/сетевых ошибках
+    (экспоненциальная пауза с джиттером, Retry-After уважаем).
+    """
+    delay = 0.5
+    for attempt in range(TRADES_RETRIES + 1):
+        async with sem:
+            try:
+                # вес (10 за /myTrades) берёт mexc_client; выгрузка истории — фоновая полоса
+                with lane(BACKGROUND):
+                    return await get_my_trades(sym, start_ms, end_ms, limit=TRADES_PAGE_LIMIT) or []
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                if (status != 429 and status < 500) or attempt == TRADES_RETRIES:
+                    raise
+                try:
+                    wait = float(e.response.headers.get("Retry-After") or delay)
+                except ValueError:
+                    wait = delay
+            except httpx.TransportError:
+                if attempt == TRADES_RETRIES:
+                    raise
+                wait = delay
+        metrics.inc("exchange_retries_total", client="entries_cache", endpoint="/api/v3/myTrades")
+        await asyncio.sleep(wait + random.uniform(0, wait / 2))
+        delay *= 2
+    return []
+
+
+async def _fetch_window(sym: str, start_ms: int, end_ms: int, sem: asyncio.Semaphore) -> List[Dict[str, Any]]:
+    """
+    Все сделки окна. Если биржа вернула полную страницу — догружаем
+    следующую с времени последней сделки, иначе курсор пропустил бы хвост.
+    """
+    out: List[Dict[str, Any]] = []
+    seen = set()
+    cur = start_ms
+    while True:
+        page = await _fetch_page(sym, cur, end_ms, sem)
+        fresh = [t for t in page if str(t.get("id")) not in seen]
+        out.extend(fresh)
+        seen.update(str(t.get("id")) for t in fresh)
+        if len(page) < TRADES_PAGE_LIMIT or not fresh:
+            return out
+        cur = max(int(t.get("time") or 0) for t in page)
+
+
+def _cursor_of(trades: List[Dict[str, Any]], prev: Dict[str, Any], scan_end_ms: int) -> Dict[str, Any]:
+    """Время последней сделки и id сделок с этим временем (для дедупа на границе)."""
+    if not trades:
+        if prev.get("last_ts") is not None:
+            return {"last_ts": prev["last_ts"], "last_ids": prev.get("last_ids", [])}
+        # сделок не было вовсе — следующий раз начнём почти с конца окна
+        # (минута запаса на запаздывание истории на бирже)
+        return {"last_ts": scan_end_ms - 60_000, "last_ids": []}
+    last_ts = int(trades[-1].get("time") or 0)
+    ids = [str(t.get("id")) for t in trades if int(t.get("time") or 0) == last_ts]
+    if last_ts == prev.get("last_ts"):
+        ids = sorted(set(ids) | set(prev.get("last_ids", [])))
+    return {"last_ts": last_ts, "last_ids": ids}
+
+
+async def compute_avg_entries_async(symbols: List[str], lookback_days: int = 180, full: bool = False) -> Dict[str, Any]:
+    """
+    Async-версия compute_avg_entries: все окна всех символов качаются
+    параллельно (не больше TRADES_CONCURRENCY запросов одновременно).
+
+    Инкрементально: в автокэше по символу хранится состояние позиции
+    (qty/cost) и курсор (время и id последних сделок). Если курсор есть —
+    качаем только сделки после него и доливаем их в состояние.
+    full=True — пересчитать с нуля за lookback_days.
+    """
+    sem = asyncio.Semaphore(TRADES_CONCURRENCY)
+    cache = load_auto_entries()
+
+    async def _one(sym: str) -> Dict[str, Any]:
+        prev = {} if full else (cache.get(sym) or {})
+        state = prev.get("state")
+        if state and prev.get("last_ts") is not None:
+            windows = _iterate_time_windows(lookback_days, 30, start_ms=int(prev["last_ts"]))
+            qty, cost = float(state["qty"]), float(state["cost"])
+            realized = float(state.get("realized", 0.0))
+        else:
+            prev = {}
+            windows = _iterate_time_windows(lookback_days, 30)
+            qty, cost, realized = 0.0, 0.0, 0.0
+
+        chunks = await asyncio.gather(*(_fetch_window(sym, s, e, sem) for s, e in windows))
+        last_ts = prev.get("last_ts")
+        last_ids = set(prev.get("last_ids", []))
+        trades: List[Dict[str, Any]] = []
+        seen = set()
+        for chunk in chunks:
+            for t in chunk:
+                tid, ts = str(t.get("id")), int(t.get("time") or 0)
+                if tid in seen:
+                    continue  # сделка на границе двух окон
+                if last_ts is not None and (ts < last_ts or (ts == last_ts and tid in last_ids)):
+                    continue  # уже учтена в состоянии
+                seen.add(tid)
+                trades.append(t)
+        trades.sort(key=lambda t: int(t.get("time") or 0))
+        # всё скачанное оседает в локальном хранилище сделок
+        await asyncio.to_thread(trade_store.upsert_trades, sym, trades)
+
+        qty, cost, realized = _fold_trades(qty, cost, trades, realized)
+        avg_entry, qty_seen = _avg_from_state(qty, cost)
+        return {
+            "avg_entry": avg_entry,
+            "qty_seen": qty_seen,
+            "state": {"qty": qty, "cost": cost, "realized": realized},
+            **_cursor_of(trades, prev, windows[-1][1] if windows else int(time.time() * 1000)),
+        }
+
+    per_symbol = await asyncio.gather(*(_one(sym) for sym in symbols))
+    result: Dict[str, Any] = dict(zip(symbols, per_symbol))
+
+    # запишем автокэш (поверх свежей версии — файл мог поменяться, пока качали)
+    json_store.doc(AUTO_FILE).update(lambda d: d.update(result))
+    return result
+
+
+def compute_avg_entries(symbols: List[str], lookback_days: int = 180, full: bool = False) -> Dict[str, Any]:
     """
     Считает средние входы по списку символов и сохраняет в кэш.
-    Возвращает словарь {SYMBOL: {"avg_entry": float|None, "qty_seen": float}}
+    Возвращает словарь {SYMBOL: {"avg_entry": float|None, "qty_seen": float, ...}}
+    Повторные вызовы догружают только новые сделки (см. compute_avg_entries_async).
+    Синхронная обёртка; из async-кода вызывайте compute_avg_entries_async.
     """
+    return run_sync(compute_avg_entries_async(symbols, lookback_days, full))
+
+
+# ===== Расчёты по локальной истории (без сети) =====
+# символ -> (версия автокэша, результат). Сделки попадают в trade_store только
+# вместе с новым курсором в AUTO_FILE, поэтому пока версия та же — пересчитывать
+# нечего; это касается и «входа нет» (актив без сделок), иначе каждый рендер
+# портфеля ходил бы за ним в SQLite.
+_LOCAL_ENTRIES: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
+
+def _cursor_version() -> int:
+    d = json_store.doc(AUTO_FILE)
+    d.view()  # подхватить запись курсоров другим процессом
+    return d.version
+
+
+def compute_avg_entries_local(symbols: List[str]) -> Dict[str, Any]:
+    """
+    Средние входы по сделкам из trade_store (то, что уже выгружали).
+    Формат как у compute_avg_entries, автокэш не трогает.
+    """
+    ver = _cursor_version()
     result: Dict[str, Any] = {}
     for sym in symbols:
-        all_trades: List[Dict[str, Any]] = []
-        for start_ms, end_ms in _iterate_time_windows(lookback_days, 30):
-            chunk = get_my_trades(sym, start_ms, end_ms, limit=1000)
-            if not chunk:
-                continue
-            all_trades.extend(chunk)
+        sym = sym.upper()
+        hit = _LOCAL_ENTRIES.get(sym)
+        if hit is None or hit[0] != ver:
+            qty, cost, _ = _fold_trades(0.0, 0.0, trade_store.load_trades(sym))
+            avg_entry, qty_seen = _avg_from_state(qty, cost)
+            hit = _LOCAL_ENTRIES[sym] = (ver, {"avg_entry": avg_entry, "qty_seen": qty_seen})
+        result[sym] = dict(hit[1])
+    return result
 
-        avg_entry, qty_seen = _calc_avg_from_trades(all_trades)
-        result[sym] = {"avg_entry": avg_entry, "qty_seen": qty_seen}
 
-    # запишем автокэш
-    cache = load_auto_entries()
-    cache.update(result)
-    save_auto_entries(cache)
-    return result
+def position_pnl(symbol: str, price: Optional[float] = None, until_ms: Optional[int] = None) -> Dict[str, Any]:
+    """
+    P/L позиции по локальной истории сделок (на момент until_ms, по умолчанию — сейчас):
+    {"qty", "avg_entry", "realized", "unrealized"}; unrealized — только если передана price.
+    """
+    qty, cost, realized = _fold_trades(0.0, 0.0, trade_store.load_trades(symbol, until_ms=until_ms))
+    avg_entry, qty = _avg_from_state(qty, cost)
+    unrealized = None
+    if price is not None and avg_entry is not None:
+        unrealized = (float(price) - avg_entry) * qty
+    return {"qty": qty, "avg_entry": avg_entry, "realized": realized, "unrealized": unrealized}
 
 
 def get_effective_entry(symbol: str, auto_cache: Dict[str, Any]) -> Optional[float]:
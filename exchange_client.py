@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Единый клиент MEXC REST: синхронное и асинхронное лицо над общими
+ресурсами процесса.
+
+• соединения — один httpx.Client и один httpx.AsyncClient на event loop
+  (keep-alive, HTTP/2 при наличии h2, общий лимит соединений);
+• подпись — один набор ключей и один Signer: ключ HMAC подготовлен заранее,
+  query собирается один раз и уходит в URL ровно в подписанном виде;
+  подписываем после того, как лимитер выдал вес, — ожидание в очереди
+  не съедает recvWindow;
+• кэш — price_cache.PRICES: цены, загруженные любым лицом, видны всем;
+• лимитер — rate_limiter.LIMITER (вес endpoint'а, полосы, заголовки биржи);
+• метрики — metrics.exchange_call с меткой source вызывающего модуля.
+
+mexc_client, orders и market_engine — тонкие обёртки над CLIENT.
+
+    data = CLIENT.request("GET", "/api/v3/ticker/price", {"symbol": "BTCUSDT"})
+    data = await CLIENT.arequest("GET", "/api/v3/account", signed=True)
+
+Ошибки: ответ не 2xx — httpx.HTTPStatusError (как raise_for_status),
+нет ключей или неизвестный метод — MexcError.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import quote_plus
+
+import httpx
+from dotenv import load_dotenv
+
+import metrics
+from price_cache import PRICES, PriceCache
+from rate_limiter import LIMITER, WeightLimiter, weight_of
+
+load_dotenv()
+
+MEXC_BASE_URL = os.getenv("MEXC_BASE_URL", "https://api.mexc.com")
+MEXC_API_KEY = os.getenv("MEXC_API_KEY", "")
+# исторически orders читал MEXC_SECRET_KEY, mexc_client — MEXC_API_SECRET; принимаем оба
+MEXC_API_SECRET = os.getenv("MEXC_API_SECRET") or os.getenv("MEXC_SECRET_KEY") or ""
+RECV_WINDOW = 5000
+
+HTTP_TIMEOUT = 15.0
+HTTP_MAX_CONNECTIONS = int(os.getenv("MEXC_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("MEXC_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("MEXC_HTTP_KEEPALIVE_EXPIRY", "30"))
+
+
+class MexcError(RuntimeError):
+    pass
+
+
+class Signer:
+    """
+    HMAC-SHA256 с заранее подготовленным ключом: состояние hmac после
+    обработки секрета считается один раз, на запрос — только copy() и update().
+    """
+
+    def __init__(self, secret: str):
+        self._base = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+
+    def sign(self, payload: bytes) -> str:
+        m = self._base.copy()
+        m.update(payload)
+        return m.hexdigest()
+
+
+# ключи и обычные значения (символы, числа, BUY/MARKET) кодирования не требуют
+_SAFE_QUERY = re.compile(r"[A-Za-z0-9_.\-~=&]*").fullmatch
+
+
+def canonical_query(params: Dict[str, Any]) -> str:
+    """
+    Query по отсортированным ключам — её и подписываем, и отправляем как есть.
+    Обычно кодировать нечего: одна проверка на всю строку; иначе — quote_plus
+    значений.
+    """
+    q = "&".join([f"{k}={params[k]}" for k in sorted(params)])
+    if _SAFE_QUERY(q):
+        return q
+    return "&".join([f"{k}={quote_plus(str(params[k]))}" for k in sorted(params)])
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class ExchangeClient:
+    def __init__(self, base_url: str = MEXC_BASE_URL, api_key: str = MEXC_API_KEY,
+                 api_secret: str = MEXC_API_SECRET, limiter: WeightLimiter = LIMITER,
+                 cache: PriceCache = PRICES, timeout: float = HTTP_TIMEOUT):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self._signer = Signer(api_secret) if api_secret else None
+        self.limiter = limiter
+        self.cache = cache
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_client: Optional[httpx.Client] = None
+        self._sync_lock = threading.Lock()
+
+    # --- пулы соединений -------------------------------------------------------------
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+
+    def async_client(self) -> httpx.AsyncClient:
+        """
+        Общий async-пул. Клиент привязан к event loop: если loop сменился
+        (asyncio.run в другом потоке) — создаём новый, чужой пул не трогаем.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout,
+                                             http2=_http2_available(), limits=self._limits())
+            self._client_loop = loop
+        return self._client
+
+    def sync_client(self) -> httpx.Client:
+        """Синхронный пул — для кода в потоках (рендеры, ордера из to_thread)."""
+        with self._sync_lock:
+            if self._sync_client is None or self._sync_client.is_closed:
+                self._sync_client = httpx.Client(base_url=self.base_url, timeout=self.timeout,
+                                                 http2=_http2_available(), limits=self._limits())
+            return self._sync_client
+
+    async def close_async(self) -> None:
+        """Закрыть async-пул, если он принадлежит текущему loop."""
+        if self._client_loop is not asyncio.get_running_loop():
+            return
+        client, self._client, self._client_loop = self._client, None, None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+    async def shutdown(self) -> None:
+        await self.close_async()
+        with self._sync_lock:
+            sync_client, self._sync_client = self._sync_client, None
+        if sync_client is not None:
+            sync_client.close()
+
+    # --- подпись ---------------------------------------------------------------------
+
+    def sign(self, params: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, str]]:
+        """
+        (query с timestamp/recvWindow/signature, заголовки) для подписанного запроса.
+        Query собирается один раз: подписываются ровно те байты, что уйдут в URL,
+        — без повторного кодирования параметров клиентом.
+        """
+        self._check_keys()
+        p = {"recvWindow": RECV_WINDOW}
+        if params:
+            p.update(params)
+        if "timestamp" not in p:
+            p["timestamp"] = int(time.time() * 1000)
+        q = canonical_query(p)
+        return f"{q}&signature={self._signer.sign(q.encode())}", {"X-MEXC-APIKEY": self.api_key}
+
+    def _check_keys(self) -> None:
+        if not self.api_key or self._signer is None:
+            raise MexcError("Не заданы MEXC_API_KEY / MEXC_API_SECRET (или MEXC_SECRET_KEY) в .env")
+
+    def _check(self, method: str, signed: bool) -> str:
+        """Метод и ключи проверяем до лимитера: заведомо неудачный запрос веса не берёт."""
+        method = method.upper()
+        if method not in ("GET", "POST", "DELETE"):
+            raise MexcError("Unsupported method")
+        if signed:
+            self._check_keys()
+        return method
+
+    def _prepare(self, path: str, params: Optional[Dict[str, Any]], signed: bool):
+        """
+        (url, params для httpx, заголовки). Вызывается уже после лимитера:
+        timestamp подписи — момент отправки, а не постановки в очередь.
+        """
+        if signed:
+            q, headers = self.sign(params)
+            return f"{path}?{q}", None, headers
+        return path, params or None, {}
+
+    # --- запросы -----------------------------------------------------------------------
+
+    def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                signed: bool = False, source: str = "exchange", timeout: Optional[float] = None) -> Any:
+        """Синхронный запрос; JSON ответа. MEXC v3: параметры в query и у POST."""
+        method = self._check(method, signed)
+        self.limiter.acquire_sync(weight_of(path, params))
+        url, p, headers = self._prepare(path, params, signed)
+        with metrics.exchange_call(source, method, path) as call:
+            r = self.sync_client().request(method, url, params=p, headers=headers,
+                                           timeout=timeout or self.timeout)
+            call.status = r.status_code
+            self.limiter.on_response(r.status_code, r.headers)
+            r.raise_for_status()
+            return r.json()
+
+    async def arequest(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                       signed: bool = False, source: str = "exchange", timeout: Optional[float] = None) -> Any:
+        """Async-запрос на общем пуле текущего loop; JSON ответа."""
+        method = self._check(method, signed)
+        await self.limiter.acquire(weight_of(path, params))
+        url, p, headers = self._prepare(path, params, signed)
+        with metrics.exchange_call(source, method, path) as call:
+            r = await self.async_client().request(method, url, params=p, headers=headers,
+                                                  timeout=timeout or self.timeout)
+            call.status = r.status_code
+            self.limiter.on_response(r.status_code, r.headers)
+            r.raise_for_status()
+            return r.json()
+
+    # --- цены через общий кэш ----------------------------------------------------------
+
+    def price(self, symbol: str, max_age: float, tag: str = "exchange", source: str = "exchange") -> float:
+        s = symbol.upper()
+
+        def _load() -> float:
+            return float(self.request("GET", "/api/v3/ticker/price", {"symbol": s}, source=source)["price"])
+        return self.cache.get(s, _load, max_age, tag=tag)
+
+    async def aprice(self, symbol: str, max_age: float, tag: str = "exchange", source: str = "exchange") -> float:
+        s = symbol.upper()
+
+        async def _load() -> float:
+            data = await self.arequest("GET", "/api/v3/ticker/price", {"symbol": s}, source=source)
+            return float(data["price"])
+        return await self.cache.aget(s, _load, max_age, tag=tag)
+
+
+# общий клиент процесса
+CLIENT = ExchangeClient()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Индикаторы по закрытым свечам (массивы candle_store) с инкрементальным состоянием.
+
+EMA, RSI и ATR — рекуррентные: состояние символа (последние значения и open_time
+последней учтённой свечи) хранится в памяти, и при новом прогоне в него
+доливаются только появившиеся закрытые свечи. Окна (z-score объёма, пробой
+максимума) считаются по хвосту массива — это O(окно).
+
+Каждый инструмент (TOOLS) даёт силу 0..1; голос «за» — сила >= 0.5.
+Скор символа — средняя сила по всем инструментам.
+"""
+import math
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from candle_store import T, O, H, L, C, V
+
+EMA_FAST = 12
+EMA_SLOW = 26
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+VOLUME_WINDOW = 20
+BREAKOUT_WINDOW = 20
+MIN_CANDLES = EMA_SLOW + 2  # меньше — индикаторы ещё не прогреты
+
+VOTE_THRESHOLD = 0.5
+
+
+def _new_state() -> Dict[str, Any]:
+    return {"t": -1.0, "n": 0, "close": None, "ema_fast": None, "ema_slow": None,
+            "gain": 0.0, "loss": 0.0, "atr": None}
+
+
+def fold(state: Optional[Dict[str, Any]], closed: np.ndarray) -> Dict[str, Any]:
+    """
+    Долить в состояние закрытые свечи новее state["t"]. Если кэш свечей
+    начинается позже состояния (символ перевыгружен с нуля) — считаем заново.
+    """
+    if state is None or (len(closed) and state["t"] >= 0 and state["t"] < closed[0, T]):
+        state = _new_state()
+    if not len(closed) or closed[-1, T] <= state["t"]:
+        return state
+    new = closed[closed[:, T] > state["t"]]
+
+    af, aslow = 2.0 / (EMA_FAST + 1), 2.0 / (EMA_SLOW + 1)
+    ar, aa = 1.0 / RSI_PERIOD, 1.0 / ATR_PERIOD
+    prev, ef, es = state["close"], state["ema_fast"], state["ema_slow"]
+    gain, loss, atr = state["gain"], state["loss"], state["atr"]
+    for h, l, c in new[:, [H, L, C]].tolist():
+        if prev is None:
+            ef = es = c
+            atr = h - l
+        else:
+            ef += af * (c - ef)
+            es += aslow * (c - es)
+            d = c - prev
+            # сглаживание Уайлдера
+            gain += ar * (max(d, 0.0) - gain)
+            loss += ar * (max(-d, 0.0) - loss)
+            tr = max(h - l, abs(h - prev), abs(l - prev))
+            atr += aa * (tr - atr)
+        prev = c
+    state.update(t=float(new[-1, T]), n=state["n"] + len(new), close=prev,
+                 ema_fast=ef, ema_slow=es, gain=gain, loss=loss, atr=atr)
+    return state
+
+
+def rsi(state: Dict[str, Any]) -> float:
+    g, l = state["gain"], state["loss"]
+    if l == 0:
+        return 100.0 if g > 0 else 50.0
+    return 100.0 - 100.0 / (1.0 + g / l)
+
+
+def _clip(x: float) -> float:
+    x = float(x)
+    return 0.0 if not math.isfinite(x) else max(0.0, min(1.0, x))
+
+
+# --- инструменты: (state, closed) -> сила 0..1 ------------------------------------
+
+ToolFn = Callable[[Dict[str, Any], np.ndarray], float]
+TOOLS: Dict[str, ToolFn] = {}
+
+
+def register_tool(name: str):
+    def deco(fn: ToolFn) -> ToolFn:
+        TOOLS[name] = fn
+        return fn
+    return deco
+
+
+@register_tool("ema_trend")
+def _ema_trend(st, closed):
+    # быстрая EMA выше медленной; разрыв 1% — полная сила
+    if st["close"] < st["ema_fast"]:
+        return 0.0
+    return _clip(0.5 + (st["ema_fast"] / st["ema_slow"] - 1.0) * 50)
+
+
+@register_tool("rsi")
+def _rsi(st, closed):
+    # импульс без перекупленности: пик на 60, голос в диапазоне 50..70
+    return _clip(1.0 - abs(rsi(st) - 60.0) / 20.0)
+
+
+@register_tool("atr")
+def _atr(st, closed):
+    # расширение диапазона: последний true range относительно ATR
+    h, l = closed[-1, H], closed[-1, L]
+    pc = closed[-2, C]
+    tr = max(h - l, abs(h - pc), abs(l - pc))
+    if not st["atr"]:
+        return 0.0
+    up = closed[-1, C] >= closed[-1, O]
+    return _clip(tr / st["atr"] - 0.5) if up else 0.0
+
+
+@register_tool("volume_z")
+def _volume_z(st, closed):
+    vols = closed[-VOLUME_WINDOW - 1:-1, V]
+    sd = vols.std()
+    if sd == 0:
+        return 0.0
+    return _clip((closed[-1, V] - vols.mean()) / sd / 3.0)
+
+
+@register_tool("breakout")
+def _breakout(st, closed):
+    # закрытие над максимумом предыдущих свечей; +2% — полная сила
+    hi = closed[-BREAKOUT_WINDOW - 1:-1, H].max()
+    if hi <= 0:
+        return 0.0
+    return _clip(0.5 + (closed[-1, C] / hi - 1.0) * 25)
+
+
+def evaluate(state: Dict[str, Any], closed: np.ndarray) -> Optional[Dict[str, Any]]:
+    """{"score", "votes", "total_tools", "tools": {имя: сила}, "price"} или None, если истории мало."""
+    if state["n"] < MIN_CANDLES or len(closed) < MIN_CANDLES:
+        return None
+    tools = {name: round(fn(state, closed), 3) for name, fn in TOOLS.items()}
+    votes = sum(1 for v in tools.values() if v >= VOTE_THRESHOLD)
+    return {
+        "score": round(sum(tools.values()) / len(tools), 4),
+        "votes": votes,
+        "total_tools": len(tools),
+        "tools": tools,
+        "price": float(closed[-1, C]),
+    }
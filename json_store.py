@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+JSON-документы состояния (settings.json, entries.json, ...) с кэшем в памяти.
+
+• чтение — из памяти, без разбора JSON; раз в CHECK_INTERVAL секунд
+  проверяется mtime/размер файла, и если файл поменял другой процесс —
+  документ перечитывается;
+• запись — во временный файл рядом, fsync и атомарный os.replace,
+  под межпроцессной блокировкой (<файл>.lock);
+• частые изменения можно склеивать (flush_delay > 0): в файл уходит
+  одна запись, а если за это время файл изменил кто-то ещё — наши
+  изменения накатываются поверх свежей версии, а не затирают её.
+
+Использование:
+    _DOC = json_store.doc("storage/settings.json")
+    data = _DOC.load()                      # копия документа
+    _DOC.update(lambda d: d.update(x=1))    # изменение на месте или новый объект
+"""
+import atexit
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+FLUSH_DELAY = float(os.getenv("JSON_STORE_FLUSH_DELAY", "0"))
+CHECK_INTERVAL = float(os.getenv("JSON_STORE_CHECK_INTERVAL", "1.0"))
+
+_UNLOADED = object()
+
+
+@contextmanager
+def file_lock(path: str):
+    """Межпроцессная блокировка на файле path (flock / msvcrt); не реентерабельна."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+class JsonDoc:
+    def __init__(self, path: str, default: Callable[[], Any] = dict, indent: Optional[int] = 2,
+                 flush_delay: float = FLUSH_DELAY, check_interval: float = CHECK_INTERVAL):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self._default = default
+        self._indent = indent
+        self._flush_delay = flush_delay
+        self._check_interval = check_interval
+        self._lock = threading.RLock()
+        self._data: Any = _UNLOADED
+        self._stamp = None
+        self._checked = 0.0
+        self._pending: List[Callable[[Any], Any]] = []
+        self._timer: Optional[threading.Timer] = None
+        self.version = 0      # растёт при каждом изменении/перечитывании
+        self.corrupt = False  # файл есть, но это не JSON
+        self.parses = 0       # сколько раз реально разбирали файл
+
+    # --- диск (всё под self._lock) --------------------------------------------
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read_disk(self) -> None:
+        stamp = self._stat()
+        self.corrupt = False
+        if stamp is None:
+            data = self._default()
+        else:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.parses += 1
+            except Exception:
+                data = self._default()
+                self.corrupt = True
+        self._data, self._stamp = data, stamp
+        self._checked = time.monotonic()
+        self.version += 1
+
+    def _refresh(self) -> None:
+        if self._data is _UNLOADED:
+            self._read_disk()
+            return
+        if self._pending:
+            return  # наши несохранённые изменения главнее; сольём при flush
+        now = time.monotonic()
+        if now - self._checked < self._check_interval:
+            return
+        self._checked = now
+        if self._stat() != self._stamp:
+            self._read_disk()
+
+    def _write(self) -> None:
+        d = os.path.dirname(self.path) or "."
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".", suffix=".tmp", dir=d)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=self._indent)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self._stamp = self._stat()
+        self.corrupt = False
+
+    @staticmethod
+    def _apply(data: Any, fn: Callable[[Any], Any]) -> Any:
+        res = fn(data)
+        return data if res is None else res
+
+    # --- API --------------------------------------------------------------------
+
+    def exists(self) -> bool:
+        with self._lock:
+            self._refresh()
+            return self._stamp is not None or bool(self._pending)
+
+    def view(self) -> Any:
+        """Сам документ из памяти — только для чтения, не изменять!"""
+        with self._lock:
+            self._refresh()
+            return self._data
+
+    def load(self) -> Any:
+        """Копия документа: можно менять, на кэш это не повлияет."""
+        return copy.deepcopy(self.view())
+
+    def update(self, fn: Callable[[Any], Any]) -> None:
+        """
+        fn(doc) меняет документ на месте (вернуть None) или возвращает новый.
+        fn может быть вызвана повторно поверх чужой свежей версии файла.
+        """
+        with self._lock:
+            self._refresh()
+            self._data = self._apply(self._data, fn)
+            self._pending.append(fn)
+            self.version += 1
+            if self._flush_delay <= 0:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self._flush_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def save(self, data: Any) -> None:
+        snapshot = copy.deepcopy(data)
+        self.update(lambda _: copy.deepcopy(snapshot))
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with file_lock(self.lock_path):
+                if self._stat() != self._stamp:
+                    # файл поменяли снаружи — накатываем свои изменения поверх
+                    pending = self._pending
+                    self._read_disk()
+                    for fn in pending:
+                        self._data = self._apply(self._data, fn)
+                self._write()
+            self._pending = []
+
+
+_DOCS: Dict[str, JsonDoc] = {}
+_DOCS_LOCK = threading.Lock()
+
+
+def doc(path: str, **kwargs) -> JsonDoc:
+    """Общий JsonDoc на файл (по абсолютному пути) — на процесс один кэш."""
+    key = os.path.abspath(path)
+    with _DOCS_LOCK:
+        d = _DOCS.get(key)
+        if d is None:
+            d = _DOCS[key] = JsonDoc(key, **kwargs)
+        return d
+
+
+@atexit.register
+def flush_all() -> None:
+    with _DOCS_LOCK:
+        docs = list(_DOCS.values())
+    for d in docs:
+        try:
+            d.flush()
+        except Exception:
+            pass
@@ -10,15 +10,24 @@
 from typing import Dict, List, Tuple
 from decimal import Decimal, InvalidOperation
 
-# Используем твои функции из mexc_client и настройки входов
-from mexc_client import get_account_info, get_ticker_price
+from portfolio_engine import ENGINE
+from render_cache import RENDERS
 
 try:
-    from settings_manager import load_settings  # ожидается {"entries": {"BTCUSDT": 111000.0, ...}}
+    from settings_manager import load_settings, settings_version  # ожидается {"entries": {"BTCUSDT": 111000.0, ...}}
 except Exception:
     def load_settings():
         return {"entries": {}}
 
+    def settings_version():
+        return 0
+
+try:
+    from entries_cache import compute_avg_entries_local  # входы по локальной истории сделок
+except Exception:
+    def compute_avg_entries_local(symbols):
+        return {}
+
 
 # ---------- утилиты форматирования ----------
 
@@ -67,30 +76,14 @@ def _fmt_pl_percent(price: float, entry: float) -> str:
 
 # ---------- данные ----------
 
-def _collect_balances() -> Dict[str, float]:
-    """
-    Возвращаем словарь asset -> qty (free+locked), только положительные.
-    """
-    acc = get_account_info()
-    result: Dict[str, float] = {}
-    for b in acc.get("balances", []):
-        asset = (b.get("asset") or "").upper()
-        qty = float(b.get("free", 0) or 0) + float(b.get("locked", 0) or 0)
-        if asset and qty > 0:
-            result[asset] = result.get(asset, 0.0) + qty
-    return result
-
-def _price_usdt(asset: str) -> float:
-    if asset.upper() == "USDT":
-        return 1.0
-    symbol = f"{asset.upper()}USDT"
-    try:
-        p = get_ticker_price(symbol)
-        return float(p or 0.0)
-    except Exception:
-        return 0.0
+_entries_map_cache: Tuple[int, Dict[str, float]] = (-1, {})
 
 def _load_entries_map() -> Dict[str, float]:
+    # пересобираем только когда настройки поменялись
+    global _entries_map_cache
+    ver = settings_version()
+    if _entries_map_cache[0] == ver:
+        return dict(_entries_map_cache[1])
     s = load_settings() or {}
     entries = s.get("entries", {}) or {}
     clean = {}
@@ -99,7 +92,33 @@ def _load_entries_map() -> Dict[str, float]:
             clean[str(k).upper()] = float(v)
         except Exception:
             pass
-    return clean
+    _entries_map_cache = (ver, clean)
+    return dict(clean)
+
+def _local_entries(symbols) -> Dict[str, float]:
+    """
+    Входы из локального хранилища сделок (без сети) — для активов,
+    по которым нет ручного входа в настройках.
+    """
+    try:
+        local = compute_avg_entries_local(list(symbols))
+    except Exception:
+        return {}
+    return {s: float(v["avg_entry"]) for s, v in local.items() if v.get("avg_entry")}
+
+
+def _engine_entries(assets) -> Dict[str, float]:
+    """Входы для движка: ручные из настроек, для остальных — по локальной истории сделок."""
+    entries = _load_entries_map()
+    out = {a: entries[f"{a}USDT"] for a in assets if f"{a}USDT" in entries}
+    missing = [f"{a}USDT" for a in assets if a not in out]
+    if missing:
+        out.update({s[:-4]: v for s, v in _local_entries(missing).items()})
+    return out
+
+
+# вид общего движка: позиции free+locked, входы из настроек
+PORTFOLIO = ENGINE.view(_engine_entries, settings_version, qty_mode="total", stables=("USDT",))
 
 
 # ---------- основной рендер ----------
@@ -107,55 +126,52 @@ def _load_entries_map() -> Dict[str, float]:
 def calc_portfolio_text() -> str:
     """
     Минимальный вид «как раньше», + поддержка Вход/P&L.
+    Строки берутся готовыми из PORTFOLIO — здесь только форматирование;
+    пока версия вида не сменилась, отдаётся уже готовый текст.
     """
     try:
-        balances = _collect_balances()
-        if not balances:
-            return "📊 Портфель\n\nНет активов на споте."
-
-        entries = _load_entries_map()
-
-        # подготавливаем позиции: (asset, qty, price, cost, entry, pl_usdt)
-        rows: List[Tuple[str, float, float, float, float, float]] = []
-        for asset, qty in balances.items():
-            price = _price_usdt(asset)
-            cost = qty * price
-            entry = entries.get(f"{asset}USDT", 0.0)
-            pl_usdt = qty * (price - entry) if (entry > 0 and price > 0) else 0.0
-            rows.append((asset, qty, price, cost, entry, pl_usdt))
-
-        # сортировка «как у тебя визуально получалось» — по стоимости по убыванию,
-        # но USDT пусть остаётся отдельной строкой снизу.
-        usdt_qty = balances.get("USDT", 0.0)
-        body_rows = [r for r in rows if r[0] != "USDT"]
-        body_rows.sort(key=lambda r: r[3], reverse=True)
-
-        total = sum(r[3] for r in body_rows) + (usdt_qty * 1.0)
-
-        # рендер позиций
-        lines: List[str] = ["📊 Портфель", ""]
-        for asset, qty, price, _cost, entry, pl_usdt in body_rows:
-            # В минимальном стиле не показываем «Стоимость/Доля» (только как раньше)
-            # Блок из трёх строк на актив
-            lines.append(f"• {asset}: {_fmt_qty(qty)}")
-            lines.append(f"   Цена: {_fmt_price(price)}  |  Вход: {(_fmt_price(entry) if entry > 0 else 'n/a')}")
-            if entry > 0 and price > 0:
-                pl_pct = _fmt_pl_percent(price, entry)
-                lines.append(f"   P/L: {pl_pct} ({_fmt_money2(pl_usdt)} USDT)")
-            else:
-                lines.append("   P/L: n/a")
-            lines.append("")  # пустая строка между активами
-
-        # отдельная строка «💵 USDT: ...» (как у тебя было)
-        if usdt_qty > 0:
-            lines.append(f"💵 USDT: {_fmt_qty(usdt_qty)}")
-            lines.append("")
-
-        # итог
-        lines.append(f"💰 Итоговая стоимость: {_fmt_money2(total)} USDT")
-
-        return "\n".join(lines)
-
+        snap = PORTFOLIO.snapshot()
+        return RENDERS.render("portfolio", snap["version"], lambda: _render_portfolio(snap))
     except Exception as e:
         msg = str(e).replace("<", "").replace(">", "")
         return f"Ошибка портфеля: {msg}"
+
+
+def _render_portfolio(snap) -> str:
+    if not snap["rows"]:
+        return "📊 Портфель\n\nНет активов на споте."
+
+    # сортировка «как у тебя визуально получалось» — по стоимости по убыванию,
+    # но USDT пусть остаётся отдельной строкой снизу.
+    usdt_qty = 0.0
+    body_rows = []
+    for r in snap["rows"]:
+        if r["asset"] == "USDT":
+            usdt_qty = r["qty"]
+        else:
+            body_rows.append(r)
+
+    # рендер позиций
+    lines: List[str] = ["📊 Портфель", ""]
+    for r in body_rows:
+        price, entry = r["price"] or 0.0, r["entry"]
+        # В минимальном стиле не показываем «Стоимость/Доля» (только как раньше)
+        # Блок из трёх строк на актив
+        lines.append(f"• {r['asset']}: {_fmt_qty(r['qty'])}")
+        lines.append(f"   Цена: {_fmt_price(price)}  |  Вход: {(_fmt_price(entry) if entry > 0 else 'n/a')}")
+        if r["pl_usdt"] is not None:
+            pl_pct = _fmt_pl_percent(price, entry)
+            lines.append(f"   P/L: {pl_pct} ({_fmt_money2(r['pl_usdt'])} USDT)")
+        else:
+            lines.append("   P/L: n/a")
+        lines.append("")  # пустая строка между активами
+
+    # отдельная строка «💵 USDT: ...» (как у тебя было)
+    if usdt_qty > 0:
+        lines.append(f"💵 USDT: {_fmt_qty(usdt_qty)}")
+        lines.append("")
+
+    # итог
+    lines.append(f"💰 Итоговая стоимость: {_fmt_money2(snap['total'])} USDT")
+
+    return "\n".join(lines)
@@ -1,47 +1,61 @@
-import requests
-from math import isfinite
-
-API = "https://api.mexc.com"
-
-def _get_24hr_all():
-    r = requests.get(f"{API}/api/v3/ticker/24hr", timeout=20, headers={"User-Agent":"Mozilla/5.0"})
-    r.raise_for_status()
-    data = r.json()
-    # отфильтруем только USDT/USDC и валидные числа
-    out = []
-    for x in data:
-        sym = x.get("symbol", "")
-        if not (sym.endswith("USDT") or sym.endswith("USDC")):
-            continue
-        try:
-            pct = float(x.get("priceChangePercent", 0))
-            volq = float(x.get("quoteVolume", 0))
-            last = float(x.get("lastPrice", 0))
-            high, low, opn = float(x.get("highPrice", 0)), float(x.get("lowPrice", 0)), float(x.get("openPrice", 0))
-        except Exception:
-            continue
-        if not all(isfinite(v) for v in (pct, volq, last, high, low, opn)):
-            continue
-        vola = 0.0
-        if opn and isfinite(high) and isfinite(low):
-            vola = abs(high - low) / opn if opn != 0 else 0.0
-        out.append({
-            "symbol": sym, "pct": pct, "volq": volq, "last": last, "vola": vola
-        })
-    return out
+import os
+import time
+
+import metrics
+from exchange_client import CLIENT
+from market_feed import MIRROR
+from market_frame import TickerFrame
+from price_cache import PRICES
+from render_cache import RENDERS
+
+MARKET_MAX_AGE = 30.0  # обзор рынка не обязан быть точнее полминуты
+QUOTES = ("USDT", "USDC")
+# зеркало меняется на каждое сообщение WebSocket; витрину (и тексты, которые
+# кэшируются по ней) пересобираем не чаще раза в столько секунд
+MIRROR_FRAME_INTERVAL = float(os.getenv("MARKET_FRAME_INTERVAL", "5"))
+
+_mirror_frame = (-1, 0.0, None)  # (MIRROR.version, monotonic сборки, TickerFrame)
+
+def get_frame() -> TickerFrame:
+    """Витрина 24ч по всем парам; разбирается один раз на снимок рынка."""
+    # если запущен WebSocket-поток — читаем зеркало рынка, без REST
+    global _mirror_frame
+    if MIRROR.is_fresh():
+        ver, built_at, fr = _mirror_frame
+        now = time.monotonic()
+        if fr is None or (ver != MIRROR.version and now - built_at >= MIRROR_FRAME_INTERVAL):
+            ver = MIRROR.version
+            with metrics.timer("market_frame_build_seconds"):
+                fr = TickerFrame.from_rows(MIRROR.rows_24h())
+            _mirror_frame = (ver, now, fr)
+        return fr
+    return PRICES.get("ticker24h:frame", _load_frame, MARKET_MAX_AGE, tag="market_engine")
+
+def _load_frame():
+    # общий пул и лимитер (вес 40 — без symbol)
+    rows = CLIENT.request("GET", "/api/v3/ticker/24hr", source="market_engine", timeout=20)
+    with metrics.timer("market_frame_build_seconds"):
+        fr = TickerFrame.from_rows(rows)
+    PRICES.put_many(fr.prices())
+    return fr
 
 def _fmt_row(r):
     return f"{r['symbol']}:  | Δ {r['pct']:.2f}% | V {r['volq']:,} | P {r['last']} | vola {r['vola']:.3f}".replace(",", " ")
 
 def get_market_overview_text():
-    rows = _get_24hr_all()
-    if not rows:
+    # тот же снимок рынка — тот же текст
+    fr = get_frame()
+    return RENDERS.render("market_overview", fr, lambda: _render_overview(fr))
+
+def _render_overview(fr):
+    m = fr.mask(quotes=QUOTES)
+    if not m.any():
         return "Нет данных по рынку"
 
-    top_up   = sorted(rows, key=lambda r: r["pct"], reverse=True)[:5]
-    top_down = sorted(rows, key=lambda r: r["pct"])[:5]
-    top_vol  = sorted(rows, key=lambda r: r["volq"], reverse=True)[:5]
-    top_vola = sorted(rows, key=lambda r: r["vola"], reverse=True)[:5]
+    top_up   = fr.rows(fr.top("pct", 5, m))
+    top_down = fr.rows(fr.top("pct", 5, m, ascending=True))
+    top_vol  = fr.rows(fr.top("volq", 5, m))
+    top_vola = fr.rows(fr.top("vola", 5, m))
 
     parts = []
     parts.append("Топ рост 24ч")
@@ -55,5 +69,9 @@ def get_market_overview_text():
     return "\n".join(parts)
 
 def raw_symbols_text():
-    rows = _get_24hr_all()
-    return "symbols=" + str(len(rows)) + "\n\n" + "\n".join([f"{r['symbol']}:1" for r in rows[:100]])
+    fr = get_frame()
+    return RENDERS.render("raw_symbols", fr, lambda: _render_raw_symbols(fr))
+
+def _render_raw_symbols(fr):
+    syms = fr.symbols[fr.mask(quotes=QUOTES)]
+    return "symbols=" + str(len(syms)) + "\n\n" + "\n".join([f"{s}:1" for s in syms[:100].tolist()])
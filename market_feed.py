@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+"""
+Поток рыночных данных MEXC по WebSocket и локальное зеркало рынка.
+
+MIRROR держит по каждому символу последнюю цену, 24ч-статистику и лучшие
+bid/ask. Его читают market_engine, signals_engine и (через общий кэш цен
+price_cache) портфельные рендеры — без похода в REST.
+
+Источник — JSON-каналы MEXC:
+  spot@public.miniTickers.v3.api@UTC+8        — все пары (цена, 24ч)
+  spot@public.bookTicker.v3.api@<SYMBOL>      — лучшие bid/ask
+  spot@public.deals.v3.api@<SYMBOL>           — сделки (последняя цена)
+После каждого (пере)подключения зеркало доснимается через REST
+/ticker/24hr. Если сообщений нет дольше STALE_AFTER секунд — считаем, что
+поток потерян, переподключаемся и снимаем снапшот заново.
+
+Символы для bookTicker/deals можно менять на ходу (set_symbols или
+повторный start_feed): подписка правится на живом соединении.
+
+MEXC переводит spot-WebSocket на protobuf (wbs-api.mexc.com, каналы *.pb);
+этот модуль понимает только JSON. Поэтому поток не молчит, а падает
+громко: отказ в подписке («Not Subscribed successfully» / «Blocked»),
+бинарные кадры вместо JSON или FAIL_AFTER сессий подряд без данных —
+ошибка в лог и метрики, поток останавливается (feed.failed — причина).
+Читатели зеркала в этом случае, как и при устаревшем зеркале, идут в REST.
+
+    feed = await market_feed.start_feed(["BTCUSDT", "ETHUSDT"])
+    ...
+    await market_feed.stop_feed()
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+
+import metrics
+from price_cache import PRICES
+from rate_limiter import BACKGROUND, lane
+
+log = logging.getLogger(__name__)
+
+WS_URL = os.getenv("MEXC_WS_URL", "wss://wbs.mexc.com/ws")
+STALE_AFTER = float(os.getenv("MEXC_WS_STALE_AFTER", "30"))
+# столько сессий подряд без единого сообщения с данными — и поток сдаётся
+FAIL_AFTER = int(os.getenv("MEXC_WS_FAIL_AFTER", "5"))
+PING_INTERVAL = 20.0
+MAX_SUBSCRIPTIONS = 30  # лимит MEXC на одно соединение
+
+MINI_TICKERS = "spot@public.miniTickers.v3.api@UTC+8"
+BOOK_TICKER = "spot@public.bookTicker.v3.api@"
+DEALS = "spot@public.deals.v3.api@"
+
+
+def _f(x, default=0.0) -> float:
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return default
+
+
+class MarketMirror:
+    """
+    Зеркало рынка. Строки хранятся в полях REST /ticker/24hr (числа, не строки),
+    плюс bidPrice/askPrice/bidQty/askQty и служебное _ts (monotonic обновления).
+    """
+
+    def __init__(self):
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self.updated_at = 0.0   # monotonic последнего обновления
+        self.snapshot_at = 0.0
+
+    def _touch(self, now: float) -> None:
+        self.version += 1
+        self.updated_at = now
+
+    def apply_snapshot(self, data: List[Dict[str, Any]], started_at: float) -> None:
+        """REST-снапшот; строки, обновлённые потоком после started_at, не трогаем."""
+        now = time.monotonic()
+        prices = {}
+        with self._lock:
+            for x in data:
+                sym = str(x.get("symbol", "")).upper()
+                if not sym:
+                    continue
+                row = self._rows.get(sym)
+                if row is not None and row["_ts"] > started_at:
+                    continue
+                row = self._rows.setdefault(sym, {"symbol": sym})
+                for k in ("lastPrice", "priceChangePercent", "quoteVolume", "volume",
+                          "highPrice", "lowPrice", "openPrice", "bidPrice", "askPrice", "bidQty", "askQty"):
+                    if k in x:
+                        row[k] = _f(x.get(k))
+                row["_ts"] = now
+                if row.get("lastPrice"):
+                    prices[sym] = row["lastPrice"]
+            self.snapshot_at = now
+            self._touch(now)
+        PRICES.put_many(prices)
+
+    def apply_mini_tickers(self, items: List[Dict[str, Any]]) -> None:
+        now = time.monotonic()
+        prices = {}
+        with self._lock:
+            for d in items:
+                sym = str(d.get("s", "")).upper()
+                if not sym:
+                    continue
+                row = self._rows.setdefault(sym, {"symbol": sym})
+                last = _f(d.get("p"))
+                rate = _f(d.get("r"))  # доля, как priceChangePercent в /ticker/24hr
+                row["lastPrice"] = last
+                row["priceChangePercent"] = rate
+                if rate != -1:
+                    row["openPrice"] = last / (1 + rate)
+                if "h" in d:
+                    row["highPrice"] = _f(d.get("h"))
+                if "l" in d:
+                    row["lowPrice"] = _f(d.get("l"))
+                if "v" in d:
+                    row["volume"] = _f(d.get("v"))
+                if "q" in d:
+                    row["quoteVolume"] = _f(d.get("q"))
+                row["_ts"] = now
+                if last:
+                    prices[sym] = last
+            self._touch(now)
+        PRICES.put_many(prices)
+
+    def apply_book(self, symbol: str, d: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            row = self._rows.setdefault(symbol, {"symbol": symbol})
+            row["bidPrice"], row["bidQty"] = _f(d.get("b")), _f(d.get("B"))
+            row["askPrice"], row["askQty"] = _f(d.get("a")), _f(d.get("A"))
+            row["_ts"] = now
+            self._touch(now)
+
+    def apply_deals(self, symbol: str, deals: List[Dict[str, Any]]) -> None:
+        if not deals:
+            return
+        now = time.monotonic()
+        last = max(deals, key=lambda x: x.get("t", 0))
+        px = _f(last.get("p"))
+        if not px:
+            return
+        with self._lock:
+            row = self._rows.setdefault(symbol, {"symbol": symbol})
+            row["lastPrice"] = px
+            row["_ts"] = now
+            self._touch(now)
+        PRICES.put(symbol, px)
+
+    # --- чтение ---------------------------------------------------------------
+
+    def is_fresh(self, max_age: float = STALE_AFTER) -> bool:
+        return bool(self.snapshot_at) and time.monotonic() - self.updated_at <= max_age
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        row = self._rows.get(symbol.upper())
+        return dict(row) if row is not None else None
+
+    def price(self, symbol: str) -> Optional[float]:
+        row = self._rows.get(symbol.upper())
+        return row.get("lastPrice") if row is not None else None
+
+    def rows_24h(self) -> List[Dict[str, Any]]:
+        """Все строки в формате /ticker/24hr (копии)."""
+        with self._lock:
+            return [dict(r) for r in self._rows.values()]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+            self.snapshot_at = self.updated_at = 0.0
+            self.version += 1
+
+
+MIRROR = MarketMirror()
+
+
+def _rest_snapshot() -> List[Dict[str, Any]]:
+    from mexc_client import get_24h_all
+    # доснимок после переподключения — фон, не в ущерб командам пользователя
+    with lane(BACKGROUND):
+        return get_24h_all()
+
+
+class FeedFailed(RuntimeError):
+    """Поток в этом формате не работает — переподключение не поможет."""
+
+
+def _symbols(symbols: Iterable[str]) -> List[str]:
+    # 1 подписка на miniTickers + по 2 на символ; порядок — приоритет
+    return list(dict.fromkeys(s.upper() for s in symbols))[: (MAX_SUBSCRIPTIONS - 1) // 2]
+
+
+class MarketFeed:
+    def __init__(self, symbols: Iterable[str] = (), url: Optional[str] = None,
+                 mirror: MarketMirror = MIRROR, snapshot: Callable[[], List[Dict[str, Any]]] = _rest_snapshot,
+                 stale_after: float = STALE_AFTER, fail_after: int = FAIL_AFTER):
+        self.url = url or WS_URL
+        self.mirror = mirror
+        self.snapshot = snapshot
+        self.stale_after = stale_after
+        self.fail_after = fail_after
+        self.symbols = _symbols(symbols)
+        self.stats = {"connects": 0, "reconnects": 0, "snapshots": 0, "messages": 0, "stale": 0, "errors": 0,
+                      "rejected": 0, "binary": 0}
+        self.failed: Optional[str] = None  # причина остановки, если поток сдался
+        self._task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+        self._ws = None
+        self._session_messages = 0
+
+    def channels(self, symbols: Optional[List[str]] = None) -> List[str]:
+        out = [MINI_TICKERS]
+        for s in self.symbols if symbols is None else symbols:
+            out += [BOOK_TICKER + s, DEALS + s]
+        return out
+
+    async def set_symbols(self, symbols: Iterable[str]) -> None:
+        """Сменить символы bookTicker/deals; на живом соединении — доподписка/отписка."""
+        new = _symbols(symbols)
+        old, self.symbols = self.symbols, new
+        ws = self._ws
+        if ws is None or ws.closed:
+            return  # подпишемся при следующем подключении
+        gone = [ch for ch in self.channels(old) if ch not in self.channels(new)]
+        added = [ch for ch in self.channels(new) if ch not in self.channels(old)]
+        if gone:
+            await ws.send_str(json.dumps({"method": "UNSUBSCRIPTION", "params": gone}))
+        if added:
+            await ws.send_str(json.dumps({"method": "SUBSCRIPTION", "params": added}))
+
+    async def start(self) -> "MarketFeed":
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="market_feed")
+        return self
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def wait_connected(self, timeout: Optional[float] = None) -> bool:
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _fail(self, reason: str) -> None:
+        self.failed = reason
+        metrics.inc("market_feed_failures_total", reason=reason.split(":", 1)[0])
+        log.error("market_feed остановлен: %s (%s). Зеркало рынка не обновляется, "
+                  "чтения идут в REST; MEXC_WS_FEED=0 — отключить поток.", reason, self.url)
+
+    async def _run(self) -> None:
+        delay = 1.0
+        silent = 0  # подключений подряд без данных (ошибки соединения не в счёт)
+        while True:
+            self._session_messages = 0
+            connects = self.stats["connects"]
+            try:
+                await self._session()
+                delay = 1.0
+            except asyncio.CancelledError:
+                raise
+            except FeedFailed as e:
+                self._fail(str(e))
+                return
+            except Exception as e:
+                self.stats["errors"] += 1
+                metrics.swallowed("market_feed.session", e)
+                log.warning("market_feed: обрыв сессии (%s: %s), переподключение", type(e).__name__, e)
+            finally:
+                self._ws = None
+                self._connected.clear()
+            if self._session_messages:
+                silent = 0
+            elif self.stats["connects"] > connects:
+                silent += 1
+            if silent >= self.fail_after:
+                self._fail(f"no data: {silent} подключений подряд без сообщений")
+                return
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+            delay = min(delay * 2, 60.0)
+
+    async def _session(self) -> None:
+        async with aiohttp.ClientSession() as http:
+            async with http.ws_connect(self.url, heartbeat=None, autoping=True) as ws:
+                self._ws = ws
+                self.stats["connects"] += 1
+                # сначала подписка, потом снапшот — чтобы не потерять обновления между ними
+                await ws.send_str(json.dumps({"method": "SUBSCRIPTION", "params": self.channels()}))
+                started = time.monotonic()
+                data = await asyncio.to_thread(self.snapshot)
+                self.mirror.apply_snapshot(data, started)
+                self.stats["snapshots"] += 1
+                self._connected.set()
+
+                pinger = asyncio.create_task(self._ping(ws))
+                try:
+                    while True:
+                        try:
+                            # таймаут самого receive, не asyncio.wait_for: в 3.11 wait_for
+                            # может проглотить отмену, если сообщение пришло в тот же момент
+                            msg = await ws.receive(timeout=self.stale_after)
+                        except asyncio.TimeoutError:
+                            # поток замолчал — выходим, _run переподключится и доснимет снапшот
+                            self.stats["stale"] += 1
+                            return
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            self._on_message(msg.data)
+                        elif msg.type == aiohttp.WSMsgType.BINARY:
+                            # protobuf-поток: разбирать нечем, и само не пройдёт
+                            self.stats["binary"] += 1
+                            raise FeedFailed("binary frames: сервер шлёт protobuf, поддерживается только JSON")
+                        elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED,
+                                          aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.ERROR):
+                            return
+                finally:
+                    pinger.cancel()
+
+    async def _ping(self, ws) -> None:
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            await ws.send_str('{"method":"PING"}')
+
+    def _on_message(self, raw: str) -> None:
+        try:
+            m = json.loads(raw)
+        except ValueError:
+            return
+        ch = m.get("c")
+        if not ch:
+            # ack подписки / PONG; отказ MEXC приходит тем же ack с текстом в msg
+            text = str(m.get("msg") or "")
+            if m.get("code") not in (None, 0) or "Not Subscribed" in text or "Blocked" in text:
+                self.stats["rejected"] += 1
+                raise FeedFailed(f"subscription rejected: {text or m.get('code')}")
+            return
+        self.stats["messages"] += 1
+        self._session_messages += 1
+        d = m.get("d")
+        if ch.startswith(MINI_TICKERS.split("@UTC")[0]):
+            self.mirror.apply_mini_tickers(d if isinstance(d, list) else [d])
+        elif ch.startswith(BOOK_TICKER):
+            self.mirror.apply_book(str(m.get("s") or ch[len(BOOK_TICKER):]).upper(), d or {})
+        elif ch.startswith(DEALS):
+            self.mirror.apply_deals(str(m.get("s") or ch[len(DEALS):]).upper(), (d or {}).get("deals") or [])
+
+
+_FEED: Optional[MarketFeed] = None
+
+
+async def start_feed(symbols: Iterable[str] = (), url: Optional[str] = None) -> MarketFeed:
+    """
+    Запустить общий поток (из event loop бота). Повторный вызов вернёт уже
+    запущенный и, если переданы symbols, сменит его подписку. Сдавшийся поток
+    (feed.failed) заново не запускается.
+    """
+    global _FEED
+    if _FEED is None:
+        _FEED = MarketFeed(symbols, url)
+    elif symbols:
+        await _FEED.set_symbols(symbols)
+    if _FEED.failed:
+        return _FEED
+    return await _FEED.start()
+
+
+def _feed_gauges():
+    feed = _FEED
+    if feed is None:
+        return
+    yield "market_feed_connected", {}, 1 if feed._connected.is_set() else 0
+    yield "market_feed_failed", {}, 1 if feed.failed else 0
+    yield "market_feed_symbols", {}, len(feed.symbols)
+    for k, v in feed.stats.items():
+        yield f"market_feed_{k}", {}, v
+
+
+metrics.register_collector(_feed_gauges)
+
+
+async def stop_feed() -> None:
+    global _FEED
+    feed, _FEED = _FEED, None
+    if feed is not None:
+        await feed.stop()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Колоночная витрина 24ч-тикеров (NumPy) для скринеров.
+
+Ответ /api/v3/ticker/24hr (или строки market_feed.MIRROR) разбирается один
+раз в TickerFrame: массив символов и по массиву float64 на каждое поле.
+Дальше всё векторно:
+
+    fr = TickerFrame.from_rows(data)
+    m = fr.mask(quotes=("USDT",), min_volq=1e6)        # фильтры переиспользуются
+    for i in fr.top("pct", 5, mask=m):                 # O(n) partition + сортировка k
+        print(fr.row(i))
+
+Отбор top-k по любому числу критериев — по проходу partition на критерий,
+без полной сортировки списка словарей.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# поле /ticker/24hr -> колонка
+FIELDS = {
+    "lastPrice": "last",
+    "priceChangePercent": "pct",
+    "quoteVolume": "volq",
+    "volume": "vol",
+    "highPrice": "high",
+    "lowPrice": "low",
+    "openPrice": "open",
+}
+# колонки, которые обязаны быть числами (как в прежнем фильтре); vol — справочно
+REQUIRED = ("last", "pct", "volq", "high", "low", "open")
+
+
+def _column(values: List[Any]) -> np.ndarray:
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        # быстрый путь не прошёл (None, "", мусор) — поэлементно, плохое -> nan
+        out = np.empty(len(values), dtype=np.float64)
+        for i, v in enumerate(values):
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                out[i] = np.nan
+        return out
+
+
+class TickerFrame:
+    def __init__(self, symbols: np.ndarray, cols: Dict[str, np.ndarray]):
+        self.symbols = symbols
+        self.cols = cols
+        n = len(symbols)
+        if "vola" not in cols:
+            high, low, opn = cols["high"], cols["low"], cols["open"]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                vola = np.abs(high - low) / opn
+            cols["vola"] = np.where(opn != 0, vola, 0.0)
+        # строка годится, если конечны цена, изменение, объём в котировке и high/low/open
+        valid = np.ones(n, dtype=bool)
+        for name in REQUIRED:
+            valid &= np.isfinite(cols[name])
+        self.valid = valid
+
+    @classmethod
+    def from_rows(cls, data: Iterable[Dict[str, Any]]) -> "TickerFrame":
+        rows = [x for x in data if isinstance(x, dict) and x.get("symbol")]
+        symbols = np.array([str(x["symbol"]).upper() for x in rows], dtype=str)
+        cols = {name: _column([x.get(field, 0) for x in rows]) for field, name in FIELDS.items()}
+        return cls(symbols, cols)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.cols[name]
+
+    # --- фильтры ----------------------------------------------------------------
+
+    def quote_mask(self, quotes: Sequence[str]) -> np.ndarray:
+        m = np.zeros(len(self), dtype=bool)
+        for q in quotes:
+            m |= np.char.endswith(self.symbols, q)
+        return m
+
+    def mask(self, quotes: Optional[Sequence[str]] = None, min_volq: float = 0.0,
+             min_last: float = 0.0, min_abs_pct: float = 0.0) -> np.ndarray:
+        """Булева маска строк; маски можно сохранять и комбинировать (&, |)."""
+        m = self.valid.copy()
+        if quotes:
+            m &= self.quote_mask(quotes)
+        if min_volq:
+            m &= self.cols["volq"] >= min_volq
+        if min_last:
+            m &= self.cols["last"] >= min_last
+        if min_abs_pct:
+            m &= np.abs(self.cols["pct"]) >= min_abs_pct
+        return m
+
+    # --- отбор ------------------------------------------------------------------
+
+    def top(self, key, k: int, mask: Optional[np.ndarray] = None, ascending: bool = False) -> np.ndarray:
+        """
+        Индексы k лучших строк по колонке (имя) или готовому массиву значений.
+        partition — O(n), сортируются только выбранные k.
+        """
+        values = self.cols[key] if isinstance(key, str) else np.asarray(key)
+        idx = np.flatnonzero(self.valid if mask is None else mask)
+        if k <= 0 or idx.size == 0:
+            return idx[:0]
+        v = values[idx] if ascending else -values[idx]
+        if k < idx.size:
+            # порог k-го значения; при равенстве на границе берём строки
+            # в исходном порядке — как стабильный sorted()
+            kth = np.partition(v, k - 1)[k - 1]
+            less = np.flatnonzero(v < kth)
+            part = np.concatenate([less, np.flatnonzero(v == kth)[: k - less.size]])
+        else:
+            part = np.arange(idx.size)
+        part = part[np.argsort(v[part], kind="stable")]
+        return idx[part]
+
+    def row(self, i: int) -> Dict[str, Any]:
+        out = {name: float(col[i]) for name, col in self.cols.items()}
+        out["symbol"] = str(self.symbols[i])
+        return out
+
+    def rows(self, idx: Iterable[int]) -> List[Dict[str, Any]]:
+        return [self.row(i) for i in idx]
+
+    def prices(self, mask: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """{SYMBOL: last} для строк с ценой > 0 — чтобы засеять кэш цен."""
+        m = (self.valid if mask is None else mask) & (self.cols["last"] > 0)
+        return dict(zip(self.symbols[m].tolist(), self.cols["last"][m].tolist()))
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики процесса: счётчики, гистограммы латентности и снимки чужих
+статистик (кэши, планировщик) — в текст Prometheus или в JSON.
+
+Вызовы биржи оборачиваются в exchange_call — это латентность по endpoint,
+число запросов по статусам и ошибки по виду:
+
+    with metrics.exchange_call("mexc_client", "GET", "/api/v3/ticker/price") as call:
+        r = client.get(...)
+        call.status = r.status_code
+        r.raise_for_status()
+
+Прочее:
+    metrics.inc("exchange_retries_total", client="entries_cache", endpoint=path)
+    with metrics.timer("report_stage_seconds", stage="portfolio"): ...
+    metrics.swallowed("signals_engine.scan", e)   # ошибка, которую глотаем ради бота
+    metrics.register_collector(fn)                # fn() -> [(имя, {метки}, значение), ...]
+
+Экспорт: prometheus_text(), snapshot() (dict для JSON), dump_json(path);
+METRICS_PORT — HTTP /metrics (serve()), METRICS_DUMP_SECONDS — периодический
+JSON в METRICS_DUMP_PATH (задача планировщика).
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_DUMP_SECONDS = int(os.getenv("METRICS_DUMP_SECONDS", "0"))
+METRICS_DUMP_PATH = os.getenv("METRICS_DUMP_PATH", os.path.join("data", "metrics.json"))
+
+# границы гистограмм, сек: от быстрого кэш-промаха до медленного отчёта
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[Labels, float]] = {}
+_hists: Dict[str, Dict[Labels, List[float]]] = {}   # [count по бакетам..., +Inf, sum]
+_collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]] = []
+
+_HELP = {
+    "exchange_request_seconds": "Латентность запросов к бирже",
+    "exchange_requests_total": "Запросы к бирже по статусу ответа",
+    "exchange_errors_total": "Неудачные запросы к бирже по виду ошибки",
+    "exchange_retries_total": "Повторы запросов к бирже",
+    "swallowed_errors_total": "Ошибки, заглушённые ради работы бота",
+}
+
+
+def _key(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    k = _key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[k] = series.get(k, 0) + value
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    k = _key(labels)
+    i = bisect_left(BUCKETS, seconds)
+    with _lock:
+        series = _hists.setdefault(name, {})
+        h = series.get(k)
+        if h is None:
+            h = series[k] = [0.0] * (len(BUCKETS) + 2)
+        h[i] += 1
+        h[-1] += seconds
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Длительность блока — в гистограмму name (и при исключении тоже)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, **labels)
+
+
+def swallowed(where: str, e: BaseException) -> None:
+    inc("swallowed_errors_total", where=where, error=type(e).__name__)
+
+
+class _Call:
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status: Optional[int] = None
+
+
+def _error_kind(call: _Call, e: BaseException) -> str:
+    status = call.status
+    if status is None:
+        resp = getattr(e, "response", None)
+        status = getattr(resp, "status_code", None)
+    if status is not None and status >= 400:
+        return "rate_limited" if status in (418, 429) else f"http_{status // 100}xx"
+    name = type(e).__name__
+    if "Timeout" in name:
+        return "timeout"
+    if "Connect" in name or "Transport" in name or "Network" in name:
+        return "transport"
+    return "other"
+
+
+@contextmanager
+def exchange_call(client: str, method: str, endpoint: str):
+    """Латентность, статус и вид ошибки одного HTTP-вызова биржи."""
+    call = _Call()
+    t0 = time.perf_counter()
+    try:
+        yield call
+    except BaseException as e:
+        inc("exchange_errors_total", client=client, endpoint=endpoint, kind=_error_kind(call, e))
+        raise
+    finally:
+        observe("exchange_request_seconds", time.perf_counter() - t0,
+                client=client, method=method, endpoint=endpoint)
+        inc("exchange_requests_total", client=client, method=method, endpoint=endpoint,
+            status=call.status if call.status is not None else "none")
+
+
+def register_collector(fn: Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]) -> None:
+    """fn() -> [(имя, {метки}, значение)] — снимается при каждом экспорте как gauge."""
+    _collectors.append(fn)
+
+
+def _collect() -> List[Tuple[str, Dict[str, Any], float]]:
+    out = []
+    for fn in list(_collectors):
+        try:
+            out.extend(fn())
+        except Exception as e:
+            swallowed("metrics.collector", e)
+    return out
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _hists.clear()
+
+
+# --- экспорт --------------------------------------------------------------------------
+
+def _quantile(h: List[float], q: float) -> Optional[float]:
+    """Оценка квантиля по бакетам (верхняя граница бакета)."""
+    n = sum(h[:-1])
+    if not n:
+        return None
+    acc = 0.0
+    for i, c in enumerate(h[:-1]):
+        acc += c
+        if acc >= q * n:
+            return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+    return None
+
+
+def snapshot() -> Dict[str, Any]:
+    """
+    {"ts", "counters": {имя: [{"labels", "value"}]},
+     "histograms": {имя: [{"labels", "count", "sum", "avg", "p50", "p95", "p99", "buckets"}]},
+     "gauges": {имя: [{"labels", "value"}]}}
+    """
+    with _lock:
+        counters = {n: dict(s) for n, s in _counters.items()}
+        hists = {n: {k: list(h) for k, h in s.items()} for n, s in _hists.items()}
+    out: Dict[str, Any] = {"ts": int(time.time()), "counters": {}, "histograms": {}, "gauges": {}}
+    for n, s in counters.items():
+        out["counters"][n] = [{"labels": dict(k), "value": v} for k, v in s.items()]
+    for n, s in hists.items():
+        rows = []
+        for k, h in s.items():
+            count = sum(h[:-1])
+            rows.append({
+                "labels": dict(k), "count": int(count), "sum": round(h[-1], 6),
+                "avg": round(h[-1] / count, 6) if count else 0.0,
+                "p50": _quantile(h, 0.5), "p95": _quantile(h, 0.95), "p99": _quantile(h, 0.99),
+                "buckets": {("+Inf" if i == len(BUCKETS) else str(BUCKETS[i])): int(c)
+                            for i, c in enumerate(h[:-1]) if c},
+            })
+        out["histograms"][n] = rows
+    for n, labels, v in _collect():
+        out["gauges"].setdefault(n, []).append({"labels": labels, "value": v})
+    return out
+
+
+def _fmt_labels(labels: Dict[str, Any], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = [(k, str(v)) for k, v in labels.items()]
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    esc = lambda s: s.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def prometheus_text() -> str:
+    """Текстовый формат Prometheus 0.0.4."""
+    with _lock:
+        counters = {n: dict(s) for n, s in _counters.items()}
+        hists = {n: {k: list(h) for k, h in s.items()} for n, s in _hists.items()}
+    lines: List[str] = []
+    for n, s in sorted(counters.items()):
+        if n in _HELP:
+            lines.append(f"# HELP {n} {_HELP[n]}")
+        lines.append(f"# TYPE {n} counter")
+        for k, v in s.items():
+            lines.append(f"{n}{_fmt_labels(dict(k))} {v:g}")
+    for n, s in sorted(hists.items()):
+        if n in _HELP:
+            lines.append(f"# HELP {n} {_HELP[n]}")
+        lines.append(f"# TYPE {n} histogram")
+        for k, h in s.items():
+            labels = dict(k)
+            acc = 0.0
+            for i, c in enumerate(h[:-1]):
+                acc += c
+                le = "+Inf" if i == len(BUCKETS) else f"{BUCKETS[i]:g}"
+                lines.append(f"{n}_bucket{_fmt_labels(labels, ('le', le))} {acc:g}")
+            lines.append(f"{n}_sum{_fmt_labels(labels)} {h[-1]:.6f}")
+            lines.append(f"{n}_count{_fmt_labels(labels)} {acc:g}")
+    gauges: Dict[str, List[str]] = {}
+    for n, labels, v in _collect():
+        gauges.setdefault(n, []).append(f"{n}{_fmt_labels(labels)} {float(v):g}")
+    for n, rows in sorted(gauges.items()):
+        lines.append(f"# TYPE {n} gauge")
+        lines.extend(rows)
+    return "\n".join(lines) + "\n"
+
+
+def dump_json(path: str = METRICS_DUMP_PATH) -> None:
+    """snapshot() в файл (атомарно)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+_server = None
+
+
+def serve(port: int = METRICS_PORT, host: str = "127.0.0.1"):
+    """HTTP /metrics в отдельном потоке (текст Prometheus); /metrics.json — snapshot()."""
+    global _server
+    if _server is not None or not port:
+        return _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, ctype = json.dumps(snapshot(), ensure_ascii=False).encode(), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, ctype = prometheus_text().encode(), "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    _server = ThreadingHTTPServer((host, port), Handler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, daemon=True, name="metrics-http").start()
+    return _server
+
+
+# --- стандартные сборщики ----------------------------------------------------------------
+
+def _cache_gauges():
+    from price_cache import PRICES
+    from render_cache import RENDERS
+    st = PRICES.stats()
+    yield "price_cache_entries", {}, st["entries"]
+    yield "price_cache_evictions", {}, st["evictions"]
+    for tag, s in st["by_tag"].items():
+        for what in ("hits", "misses", "coalesced", "errors"):
+            yield f"price_cache_{what}", {"tag": tag}, s[what]
+        yield "price_cache_hit_ratio", {"tag": tag}, s["hit_ratio"]
+    for name, s in RENDERS.stats().items():
+        yield "render_cache_hits", {"view": name}, s["hits"]
+        yield "render_cache_misses", {"view": name}, s["misses"]
+        yield "render_cache_hit_ratio", {"view": name}, s["hit_ratio"]
+        yield "render_seconds_avg", {"view": name}, s["render_ms_avg"] / 1000
+
+
+register_collector(_cache_gauges)
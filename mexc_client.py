@@ -1,83 +1,161 @@
 #!/usr/bin/env python3
-import os
-import time
-import hmac
-import hashlib
-from typing import Any, Dict, Optional, List
+import asyncio
+from typing import Any, Dict, Iterable, Optional, List
 
 import httpx
-from dotenv import load_dotenv
 
-load_dotenv()
+from exchange_client import CLIENT, HTTP_MAX_CONNECTIONS
+import metrics
+from price_cache import PRICES
 
-MEXC_BASE_URL = os.getenv("MEXC_BASE_URL", "https://api.mexc.com")
-MEXC_API_KEY = os.getenv("MEXC_API_KEY")
-MEXC_API_SECRET = os.getenv("MEXC_API_SECRET")
+# допустимый возраст цены из кэша, сек
+PRICE_MAX_AGE = 5.0
+BULK_PRICE_MAX_AGE = 10.0
 
-# --- низкоуровневые помощники -------------------------------------------------
+# --- общий HTTP-клиент -------------------------------------------------------
+#
+# Соединения, подпись, лимитер и метрики — в exchange_client.CLIENT (один на
+# процесс, общий с orders и market_engine). Здесь — прежние точки входа.
 
-def _ts_ms() -> int:
-    return int(time.time() * 1000)
+def get_http_client() -> httpx.AsyncClient:
+    """Общий async-пул текущего event loop."""
+    return CLIENT.async_client()
+
+
+async def startup() -> None:
+    """Открыть пул заранее (вызывать при старте бота)."""
+    CLIENT.async_client()
+
+
+async def _close_async_client() -> None:
+    await CLIENT.close_async()
+
+
+async def shutdown() -> None:
+    """Закрыть пулы соединений (вызывать при остановке бота)."""
+    await CLIENT.shutdown()
 
-def _sign(params: Dict[str, Any], secret: str) -> str:
-    # Строка для подписи — querystring (key=val&key=val...) без URL-эскейпа
-    q = "&".join(f"{k}={params[k]}" for k in sorted(params.keys()))
-    return hmac.new(secret.encode(), q.encode(), hashlib.sha256).hexdigest()
 
 async def _public_get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    async with httpx.AsyncClient(base_url=MEXC_BASE_URL, timeout=15.0) as client:
-        r = await client.get(path, params=params or {})
-        r.raise_for_status()
-        return r.json()
+    return await CLIENT.arequest("GET", path, params, source="mexc_client")
+
+def run_sync(coro) -> Any:
+    """
+    Выполнить корутину из синхронного кода (в своём event loop) и закрыть
+    async-пул, созданный в этом loop. Из работающего loop — просто await.
+    """
+    async def _runner():
+        try:
+            return await coro
+        finally:
+            await _close_async_client()
+    return asyncio.run(_runner())
+
+def _public_get_sync(path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    return CLIENT.request("GET", path, params, source="mexc_client")
 
 async def _signed_request(method: str, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    if not MEXC_API_KEY or not MEXC_API_SECRET:
-        raise RuntimeError("Не заданы MEXC_API_KEY / MEXC_API_SECRET в .env")
-
-    p = dict(params or {})
-    p.setdefault("recvWindow", 5000)
-    p.setdefault("timestamp", _ts_ms())
-    signature = _sign(p, MEXC_API_SECRET)
-    p["signature"] = signature
-
-    headers = {"X-MEXC-APIKEY": MEXC_API_KEY}
-    async with httpx.AsyncClient(base_url=MEXC_BASE_URL, timeout=20.0, headers=headers) as client:
-        if method.upper() == "GET":
-            r = await client.get(path, params=p)
-        elif method.upper() == "POST":
-            # MEXC v3 — параметры в query, тело пустое (как у Binance)
-            r = await client.post(path, params=p)
-        else:
-            raise ValueError("Unsupported method")
-        r.raise_for_status()
-        return r.json()
+    # MEXC v3 — параметры в query и у POST, тело пустое (как у Binance)
+    return await CLIENT.arequest(method, path, params, signed=True, source="mexc_client", timeout=20.0)
 
 # --- ПУБЛИЧНАЯ ЦЕНА -----------------------------------------------------------
 
-async def get_price(symbol: str) -> Optional[float]:
+async def get_price(symbol: str, max_age: float = PRICE_MAX_AGE) -> Optional[float]:
     """
     Возвращает последнюю цену символа (например, 'BTCUSDT').
     Для 'USDT' вернёт 1.0. Если цены нет — None.
+    Читает через общий кэш цен: значение не старше max_age секунд.
     """
     s = symbol.upper()
     if s in ("USDT", "USDTUSDT"):
         return 1.0
+
     try:
-        data = await _public_get("/api/v3/ticker/price", {"symbol": s})
-        # Ответ вида: {"symbol":"BTCUSDT","price":"111111.11"}
-        px = float(data.get("price"))
-        return px
-    except Exception:
+        return await CLIENT.aprice(s, max_age, tag="mexc_client", source="mexc_client")
+    except Exception as e:
+        metrics.swallowed("mexc_client.get_price", e)
         return None
 
-# --- БАЛАНСЫ ------------------------------------------------------------------
+def _load_all_prices() -> Dict[str, float]:
+    data = _public_get_sync("/api/v3/ticker/price")
+    out: Dict[str, float] = {}
+    for row in data if isinstance(data, list) else []:
+        try:
+            out[str(row.get("symbol", "")).upper()] = float(row.get("price"))
+        except (TypeError, ValueError):
+            continue
+    # отдельные символы тоже кладём в кэш — пригодятся get_price / orders
+    PRICES.put_many(out)
+    return out
+
+def get_prices_bulk(symbols: Optional[Iterable[str]] = None, max_age: float = BULK_PRICE_MAX_AGE) -> Dict[str, float]:
+    """
+    Цены сразу по многим символам одним запросом /api/v3/ticker/price
+    (без параметра symbol биржа отдаёт все пары).
+    Возвращает {SYMBOL: price}; символы без цены в ответ не попадают.
+    Если symbols не задан — вернёт все пары. Синхронная: для рендеров портфеля.
+    Снимок берётся из общего кэша, если он не старше max_age секунд.
+    """
+    wanted = None if symbols is None else {s.upper() for s in symbols}
+    out: Dict[str, float] = {}
+    if wanted is not None:
+        for s in ("USDT", "USDTUSDT"):
+            if s in wanted:
+                out[s] = 1.0
+                wanted.discard(s)
+        if not wanted:
+            return out
+
+        # все цены уже свежие в кэше (WebSocket-поток, недавний снимок) — без запроса
+        cached = PRICES.fresh_many(wanted, max_age)
+        if len(cached) == len(wanted):
+            out.update(cached)
+            return out
+
+    snapshot = PRICES.get("ticker:price:all", _load_all_prices, max_age, tag="bulk")
+    if wanted is None:
+        out.update(snapshot)
+    else:
+        out.update((s, snapshot[s]) for s in wanted if s in snapshot)
+    return out
+
+def get_24h_all() -> List[Dict[str, Any]]:
+    """
+    Сырой /api/v3/ticker/24hr по всем парам (синхронная).
+    Формат биржи: [{"symbol", "lastPrice", "priceChangePercent", "quoteVolume", ...}].
+    """
+    data = _public_get_sync("/api/v3/ticker/24hr", None)
+    return data if isinstance(data, list) else []
 
-async def get_account_balances() -> List[Dict[str, Any]]:
+async def get_klines(
+    symbol: str,
+    interval: str = "60m",
+    start_ms: Optional[int] = None,
+    limit: int = 500,
+) -> List[List[Any]]:
     """
-    Возвращает список балансов в форме:
-    [{"asset":"BTC","free":"0.001","locked":"0.0"}, ...]
+    Свечи /api/v3/klines: [[openTime, open, high, low, close, volume, closeTime, quoteVolume], ...],
+    от старых к новым. Интервалы MEXC: 1m 5m 15m 30m 60m 4h 1d 1W 1M.
     """
-    data = await _signed_request("GET", "/api/v3/account", {})
+    params: Dict[str, Any] = {"symbol": symbol.upper(), "interval": interval, "limit": limit}
+    if start_ms is not None:
+        params["startTime"] = int(start_ms)
+    data = await _public_get("/api/v3/klines", params)
+    return data if isinstance(data, list) else []
+
+# --- СПРАВОЧНИК СИМВОЛОВ -----------------------------------------------------
+
+def get_exchange_info(symbol: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Сырой /api/v3/exchangeInfo (всё или один символ). Синхронная.
+    Для фильтров/списков символов используйте symbols_index — он кэширует.
+    """
+    params = {"symbol": symbol.upper()} if symbol else None
+    return _public_get_sync("/api/v3/exchangeInfo", params)
+
+# --- БАЛАНСЫ ------------------------------------------------------------------
+
+def _norm_balances(data: Dict[str, Any]) -> List[Dict[str, Any]]:
     # Совместимо с binance-style ответом
     balances = data.get("balances") or data.get("data") or data.get("assets") or []
     # Нормализуем ключи
@@ -95,6 +173,38 @@ async def get_account_balances() -> List[Dict[str, Any]]:
             norm.append({"asset": asset.upper(), "free": _free, "locked": _locked})
     return norm
 
+async def get_account_balances() -> List[Dict[str, Any]]:
+    """
+    Возвращает список балансов в форме:
+    [{"asset":"BTC","free":"0.001","locked":"0.0"}, ...]
+    """
+    return _norm_balances(await _signed_request("GET", "/api/v3/account", {}))
+
+def get_account_info() -> Dict[str, Any]:
+    """Синхронно (на общем sync-пуле): {"balances": [{"asset", "free", "locked"}, ...]}."""
+    data = CLIENT.request("GET", "/api/v3/account", {}, signed=True, source="mexc_client", timeout=20.0)
+    return {"balances": _norm_balances(data)}
+
+# --- ИСТОРИЯ СДЕЛОК -----------------------------------------------------------
+
+async def get_my_trades(
+    symbol: str,
+    start_ms: Optional[int] = None,
+    end_ms: Optional[int] = None,
+    limit: int = 1000,
+) -> List[Dict[str, Any]]:
+    """
+    Сделки аккаунта по символу за окно [start_ms, end_ms] (/api/v3/myTrades).
+    MEXC отдаёт не больше limit (до 1000) сделок за вызов.
+    """
+    params: Dict[str, Any] = {"symbol": symbol.upper(), "limit": limit}
+    if start_ms is not None:
+        params["startTime"] = int(start_ms)
+    if end_ms is not None:
+        params["endTime"] = int(end_ms)
+    data = await _signed_request("GET", "/api/v3/myTrades", params)
+    return data if isinstance(data, list) else []
+
 # --- РАЗМЕЩЕНИЕ ОРДЕРА --------------------------------------------------------
 
 async def place_order(
@@ -1,28 +1,185 @@
-import json, os, time
+import json, os, time, threading
+from contextlib import contextmanager
 from typing import Dict, Any, List
 
+from json_store import file_lock
+
+# Журнал ордеров — append-only JSON Lines: одна запись = одна строка.
+# Запись стоит O(1) независимо от длины истории; list_orders читает файл
+# с конца и разбирает только последние N строк (оборванные падением пропускает).
+# Когда файл превышает JOURNAL_MAX_BYTES, он атомарно (os.replace)
+# уезжает в сегмент orders.jsonl.1 (старые сдвигаются, лишние удаляются).
+# Запись, ротация, compact и миграция идут под _LOCK и межпроцессной
+# блокировкой orders.jsonl.lock; чтение блокировок не берёт.
+
 STORAGE_DIR = "storage"
-ORDERS_PATH = os.path.join(STORAGE_DIR, "orders.json")
+JOURNAL_PATH = os.path.join(STORAGE_DIR, "orders.jsonl")
+LEGACY_PATH = os.path.join(STORAGE_DIR, "orders.json")  # старый формат: JSON-массив
 
-def _ensure():
-    if not os.path.isdir(STORAGE_DIR):
+JOURNAL_MAX_BYTES = int(os.getenv("ORDER_JOURNAL_MAX_BYTES", str(4 * 1024 * 1024)))
+JOURNAL_SEGMENTS = int(os.getenv("ORDER_JOURNAL_SEGMENTS", "3"))
+# always — fsync после каждой записи (ордера не теряются при падении ОС),
+# never — полагаемся на кэш ОС
+JOURNAL_FSYNC = os.getenv("ORDER_JOURNAL_FSYNC", "always").strip().lower()
+
+_LOCK = threading.Lock()
+
+
+def _segment(i: int) -> str:
+    return JOURNAL_PATH if i == 0 else f"{JOURNAL_PATH}.{i}"
+
+
+@contextmanager
+def _locked():
+    # потоки этого процесса — _LOCK, другие процессы — flock на <журнал>.lock
+    with _LOCK:
         os.makedirs(STORAGE_DIR, exist_ok=True)
-    if not os.path.isfile(ORDERS_PATH):
-        with open(ORDERS_PATH, "w", encoding="utf-8") as f:
-            json.dump([], f)
+        with file_lock(JOURNAL_PATH + ".lock"):
+            yield
+
+
+def _needs_migration() -> bool:
+    return not os.path.isfile(JOURNAL_PATH) and os.path.isfile(LEGACY_PATH)
+
+
+def _ensure():
+    # вызывается под _locked()
+    if not _needs_migration():
+        return
+    # разовая миграция старого orders.json в журнал
+    try:
+        with open(LEGACY_PATH, "r", encoding="utf-8") as f:
+            arr = json.load(f)
+    except Exception:
+        arr = []
+    tmp = JOURNAL_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for rec in arr if isinstance(arr, list) else []:
+            f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, JOURNAL_PATH)
+    os.replace(LEGACY_PATH, LEGACY_PATH + ".migrated")
+
+
+def _rotate():
+    # вызывается под _locked(); каждый шаг — атомарный os.replace
+    last = _segment(JOURNAL_SEGMENTS)
+    if os.path.exists(last):
+        os.remove(last)
+    for i in range(JOURNAL_SEGMENTS - 1, -1, -1):
+        if os.path.exists(_segment(i)):
+            os.replace(_segment(i), _segment(i + 1))
+
 
 def log_order(entry: Dict[str, Any]) -> None:
-    _ensure()
     entry = dict(entry)
     entry.setdefault("ts", int(time.time()*1000))
-    with open(ORDERS_PATH, "r", encoding="utf-8") as f:
-        arr = json.load(f)
-    arr.append(entry)
-    with open(ORDERS_PATH, "w", encoding="utf-8") as f:
-        json.dump(arr, f, ensure_ascii=False, indent=2)
+    line = (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+    with _locked():
+        _ensure()
+        try:
+            if os.path.getsize(JOURNAL_PATH) + len(line) > JOURNAL_MAX_BYTES:
+                _rotate()
+        except OSError:
+            pass
+        # O_APPEND + одна запись на строку; под блокировкой файл не подменят
+        # ротацией или compact между open и write
+        fd = os.open(JOURNAL_PATH, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                # хвост оборван падением посреди записи — не склеиваем с ним новую строку
+                line = b"\n" + line
+            os.write(fd, line)
+            if JOURNAL_FSYNC == "always":
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _parse(line: bytes):
+    try:
+        rec = json.loads(line)
+    except ValueError:
+        return None
+    return rec if isinstance(rec, dict) else None
+
+
+def _tail_records(path: str, limit: int, block: int = 8192) -> List[Dict[str, Any]]:
+    """
+    Последние limit записей файла, читая его с конца блоками. Пустые и
+    оборванные строки пропускаются и в limit не считаются.
+    """
+    if limit <= 0:
+        return []
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return []
+    out: List[Dict[str, Any]] = []  # от новых к старым
+    with f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        head = b""  # начало самой ранней прочитанной строки — может быть неполным
+        seen_newline = False
+        while pos > 0 and len(out) < limit:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            parts = (f.read(step) + head).split(b"\n")
+            head, lines = parts[0], parts[1:]
+            if lines and not seen_newline:
+                # после последнего \n — пусто или запись, оборванная падением
+                lines = lines[:-1]
+                seen_newline = True
+            for ln in reversed(lines):
+                rec = _parse(ln)
+                if rec is not None:
+                    out.append(rec)
+                    if len(out) == limit:
+                        break
+        if pos == 0 and seen_newline and len(out) < limit:
+            # дочитали до начала файла: head — первая строка, целая
+            rec = _parse(head)
+            if rec is not None:
+                out.append(rec)
+    out.reverse()
+    return out
+
 
 def list_orders(limit: int = 20) -> List[Dict[str, Any]]:
-    _ensure()
-    with open(ORDERS_PATH, "r", encoding="utf-8") as f:
-        arr = json.load(f)
-    return arr[-limit:]
+    if _needs_migration():
+        with _locked():
+            _ensure()
+    return _read_tail(limit)
+
+
+def _read_tail(limit: int) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for i in range(JOURNAL_SEGMENTS + 1):
+        if len(out) >= limit:
+            break
+        out = _tail_records(_segment(i), limit - len(out)) + out
+    return out
+
+
+def compact(keep: int = 1000) -> int:
+    """
+    Свернуть журнал до последних keep записей: пишем во временный файл,
+    fsync и атомарно подменяем; сегменты удаляются. Возвращает число записей.
+    """
+    with _locked():
+        _ensure()
+        recs = _read_tail(keep)
+        tmp = JOURNAL_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for rec in recs:
+                f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, JOURNAL_PATH)
+        for i in range(1, JOURNAL_SEGMENTS + 1):
+            if os.path.exists(_segment(i)):
+                os.remove(_segment(i))
+    return len(recs)
@@ -1,95 +1,78 @@
 # orders.py
 import os
-import time
-import hmac
-import hashlib
+import asyncio
 import math
 from typing import Optional, Tuple, Dict, Any
 
-import requests
+import httpx
 from dotenv import load_dotenv
 
+import symbols_index
+from exchange_client import CLIENT, MexcError
+from portfolio_engine import mark_balances_dirty
+from rate_limiter import ORDER, lane
+
 load_dotenv()
 
-API_KEY = os.getenv("MEXC_API_KEY", "")
-API_SECRET = os.getenv("MEXC_SECRET_KEY", "")
 LIVE_ARM = os.getenv("LIVE_ARM", "0").strip() == "1"
 
-BASE = "https://api.mexc.com"  # рабочий домен API
 TIMEOUT = 15
+# предпросмотр и следующая за ним покупка используют одну и ту же цену
+PRICE_MAX_AGE = 3.0
 
 
-class MexcError(RuntimeError):
-    pass
-
+# --- запросы через общий клиент exchange_client (sync и async) ----------------
+# Ответ не 2xx здесь по-прежнему превращается в MexcError("<код> <тело>").
 
-def _sign(params: Dict[str, Any]) -> str:
-    query = "&".join(f"{k}={params[k]}" for k in sorted(params))
-    return hmac.new(API_SECRET.encode(), query.encode(), hashlib.sha256).hexdigest()
+def _mexc_error(e: httpx.HTTPStatusError) -> MexcError:
+    return MexcError(f"{e.response.status_code} {e.response.text}")
 
 
 def _public_get(path: str, params: Optional[Dict[str, Any]] = None) -> Any:
-    url = f"{BASE}{path}"
-    r = requests.get(url, params=params or {}, timeout=TIMEOUT)
-    if r.status_code != 200:
-        raise MexcError(f"{r.status_code} {r.text}")
-    data = r.json()
-    return data
+    try:
+        return CLIENT.request("GET", path, params, source="orders", timeout=TIMEOUT)
+    except httpx.HTTPStatusError as e:
+        raise _mexc_error(e) from e
 
 
 def _signed_request(method: str, path: str, params: Dict[str, Any]) -> Any:
-    if not API_KEY or not API_SECRET:
-        raise MexcError("Не заданы MEXC_API_KEY / MEXC_SECRET_KEY в .env")
-    ts = int(time.time() * 1000)
-    params = dict(params or {})
-    params["timestamp"] = ts
-    params["recvWindow"] = 5000
-    sig = _sign(params)
-    params["signature"] = sig
-
-    url = f"{BASE}{path}"
-    headers = {"X-MEXC-APIKEY": API_KEY}
-
-    if method.upper() == "GET":
-        r = requests.get(url, params=params, headers=headers, timeout=TIMEOUT)
-    elif method.upper() == "POST":
-        r = requests.post(url, params=params, headers=headers, timeout=TIMEOUT)
-    else:
-        raise MexcError("Unsupported method")
-
-    if r.status_code != 200:
-        raise MexcError(f"{r.status_code} {r.text}")
-    return r.json()
+    try:
+        return CLIENT.request(method, path, params, signed=True, source="orders", timeout=TIMEOUT)
+    except httpx.HTTPStatusError as e:
+        raise _mexc_error(e) from e
+
+
+async def _public_get_async(path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    try:
+        return await CLIENT.arequest("GET", path, params, source="orders", timeout=TIMEOUT)
+    except httpx.HTTPStatusError as e:
+        raise _mexc_error(e) from e
+
+
+async def _signed_request_async(method: str, path: str, params: Dict[str, Any]) -> Any:
+    try:
+        return await CLIENT.arequest(method, path, params, signed=True, source="orders", timeout=TIMEOUT)
+    except httpx.HTTPStatusError as e:
+        raise _mexc_error(e) from e
 
 
 def get_symbol_filters(symbol: str) -> Tuple[float, float, float]:
     """
     Возвращает (price_tick, qty_step, min_notional) для символа.
+    Берётся из локального индекса symbols_index, без запроса к бирже.
     """
-    info = _public_get("/api/v3/exchangeInfo", {"symbol": symbol})
-    symbols = info.get("symbols", [])
-    if not symbols:
+    filters = symbols_index.get_filters(symbol)
+    if filters is None:
         raise MexcError(f"exchangeInfo: символ {symbol} не найден")
-    s = symbols[0]
+    return filters
 
-    price_tick = 0.0
-    qty_step = 0.0
-    min_notional = 0.0
 
-    for f in s.get("filters", []):
-        if f.get("filterType") == "PRICE_FILTER":
-            price_tick = float(f.get("tickSize", "0"))
-        elif f.get("filterType") == "LOT_SIZE":
-            qty_step = float(f.get("stepSize", "0"))
-        elif f.get("filterType") == "NOTIONAL":
-            min_notional = float(f.get("minNotional", "0"))
-
-    # подстрахуемся, если что-то не пришло
-    if price_tick == 0:
-        price_tick = 0.00000001
-    if qty_step == 0:
-        qty_step = 0.00000001
-    return price_tick, qty_step, min_notional
+async def get_symbol_filters_async(symbol: str) -> Tuple[float, float, float]:
+    """get_symbol_filters без потока: индекс — на месте, промах — async exchangeInfo."""
+    filters = await symbols_index.aget_filters(symbol)
+    if filters is None:
+        raise MexcError(f"exchangeInfo: символ {symbol} не найден")
+    return filters
 
 
 def round_to_step(value: float, step: float) -> float:
@@ -104,9 +87,18 @@ def round_to_tick(value: float, tick: float) -> float:
     return round(round(value / tick) * tick, max(0, -int(math.log10(tick))) if tick < 1 else 0)
 
 
-def get_price(symbol: str) -> float:
-    data = _public_get("/api/v3/ticker/price", {"symbol": symbol})
-    return float(data["price"])
+def get_price(symbol: str, max_age: float = PRICE_MAX_AGE) -> float:
+    try:
+        return CLIENT.price(symbol, max_age, tag="orders", source="orders")
+    except httpx.HTTPStatusError as e:
+        raise _mexc_error(e) from e
+
+
+async def get_price_async(symbol: str, max_age: float = PRICE_MAX_AGE) -> float:
+    try:
+        return await CLIENT.aprice(symbol, max_age, tag="orders", source="orders")
+    except httpx.HTTPStatusError as e:
+        raise _mexc_error(e) from e
 
 
 def get_account_balances() -> Dict[str, float]:
@@ -121,12 +113,9 @@ def get_account_balances() -> Dict[str, float]:
     return balances
 
 
-def preview_market_buy(symbol: str, budget_usdt: float, sl: Optional[float] = None, tp: Optional[float] = None) -> Dict[str, Any]:
-    """
-    Возвращает предпросмотр: текущая цена, рассчитанное количество, округление по шагам, нотацион.
-    """
-    px = get_price(symbol)
-    price_tick, qty_step, min_notional = get_symbol_filters(symbol)
+def _build_preview(symbol: str, budget_usdt: float, px: float, filters: Tuple[float, float, float],
+                   sl: Optional[float], tp: Optional[float]) -> Dict[str, Any]:
+    price_tick, qty_step, min_notional = filters
 
     qty_raw = budget_usdt / px
     qty = round_to_step(qty_raw, qty_step)
@@ -149,12 +138,10 @@ def preview_market_buy(symbol: str, budget_usdt: float, sl: Optional[float] = No
     }
 
 
-def place_market_buy(symbol: str, budget_usdt: float, sl: Optional[float] = None, tp: Optional[float] = None) -> Dict[str, Any]:
+def _market_buy_params(symbol: str, preview: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
-    Выполнить MARKET покупку на MEXC на сумму budget_usdt (в USDT).
-    Возвращает ответ биржи и echo SL/TP (бот их хранит/использует сам).
+    Параметры MARKET BUY или None для демо-режима (тогда preview помечается DRY_RUN).
     """
-    preview = preview_market_buy(symbol, budget_usdt, sl, tp)
     qty = preview["qty"]
     if qty <= 0:
         raise MexcError("Рассчитанное количество = 0. Увеличь бюджет или проверь символ.")
@@ -162,15 +149,71 @@ def place_market_buy(symbol: str, budget_usdt: float, sl: Optional[float] = None
     if not LIVE_ARM:
         # демо-режим — просто вернём предпросмотр
         preview["status"] = "DRY_RUN"
-        return preview
+        return None
 
-    params = {
+    return {
         "symbol": symbol,
         "side": "BUY",
         "type": "MARKET",
         "quantity": f"{qty:.10f}",
     }
-    res = _signed_request("POST", "/api/v3/order", params)
+
+
+def preview_market_buy(symbol: str, budget_usdt: float, sl: Optional[float] = None, tp: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Возвращает предпросмотр: текущая цена, рассчитанное количество, округление по шагам, нотацион.
+    """
+    px = get_price(symbol)
+    filters = get_symbol_filters(symbol)
+    return _build_preview(symbol, budget_usdt, px, filters, sl, tp)
+
+
+def place_market_buy(symbol: str, budget_usdt: float, sl: Optional[float] = None, tp: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Выполнить MARKET покупку на MEXC на сумму budget_usdt (в USDT).
+    Возвращает ответ биржи и echo SL/TP (бот их хранит/использует сам).
+    Все запросы покупки идут в полосе ORDER лимитера — вперёд сканов и выгрузок.
+    """
+    with lane(ORDER):
+        preview = preview_market_buy(symbol, budget_usdt, sl, tp)
+        params = _market_buy_params(symbol, preview)
+        if params is None:
+            return preview
+        res = _signed_request("POST", "/api/v3/order", params)
+    mark_balances_dirty()
+    return {
+        "status": "FILLED",
+        "order": res,
+        "sl": sl,
+        "tp": tp,
+        "preview": preview,
+    }
+
+
+async def preview_market_buy_async(symbol: str, budget_usdt: float, sl: Optional[float] = None, tp: Optional[float] = None) -> Dict[str, Any]:
+    """
+    То же, что preview_market_buy, но без блокировки event loop:
+    цена и фильтры запрашиваются параллельно.
+    """
+    px, filters = await asyncio.gather(
+        get_price_async(symbol),
+        get_symbol_filters_async(symbol),  # обычно O(1) из индекса, без потока
+    )
+    return _build_preview(symbol, budget_usdt, px, filters, sl, tp)
+
+
+async def place_market_buy_async(symbol: str, budget_usdt: float, sl: Optional[float] = None, tp: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Async-вариант place_market_buy на общем пуле соединений mexc_client:
+    несколько пользователей могут покупать параллельно без пула потоков.
+    """
+    with lane(ORDER):
+        preview = await preview_market_buy_async(symbol, budget_usdt, sl, tp)
+        params = _market_buy_params(symbol, preview)
+        if params is None:
+            return preview
+        res = await _signed_request_async("POST", "/api/v3/order", params)
+    mark_balances_dirty()
     return {
         "status": "FILLED",
         "order": res,
@@ -1,27 +1,15 @@
-import json
-import os
 import time
 
-STORAGE_DIR = "storage"
-ORDERS_PATH = os.path.join(STORAGE_DIR, "orders.json")
+import order_journal
 
-def _ensure():
-    if not os.path.isdir(STORAGE_DIR):
-        os.makedirs(STORAGE_DIR, exist_ok=True)
-    if not os.path.isfile(ORDERS_PATH):
-        with open(ORDERS_PATH, "w", encoding="utf-8") as f:
-            json.dump([], f)
+# Тот же журнал, что и order_journal (storage/orders.jsonl): раньше оба модуля
+# переписывали storage/orders.json целиком и в разном формате.
+STORAGE_DIR = order_journal.STORAGE_DIR
+ORDERS_PATH = order_journal.JOURNAL_PATH
 
 def add_order_record(record: dict):
-    _ensure()
-    with open(ORDERS_PATH, "r", encoding="utf-8") as f:
-        arr = json.load(f)
     record["ts"] = int(time.time() * 1000)
-    arr.append(record)
-    with open(ORDERS_PATH, "w", encoding="utf-8") as f:
-        json.dump(arr[-1000:], f, ensure_ascii=False, separators=(",", ":"))
+    order_journal.log_order(record)
 
 def load_orders() -> list[dict]:
-    _ensure()
-    with open(ORDERS_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return order_journal.list_orders(1000)
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Портфель в памяти с инкрементальной оценкой.
+
+Один движок на процесс (ENGINE) держит балансы и последние цены активов;
+экраны портфеля (main_portfolio_adapter, balance_history) — его виды:
+у каждого свой режим количества (free / free+locked), свои стейблы и
+источник входов, а готовые строки (стоимость, P/L) по каждому активу.
+Сеть и подписка на цены — общие, строки пересчитываются только по событиям:
+• цена — подписка на общий кэш цен (price_cache.PRICES): любое обновление
+  цены (WebSocket-поток, bulk-запрос) сразу переоценивает нужный актив во
+  всех видах, итог правится на разницу, без прохода по портфелю;
+• баланс — не чаще раза в BALANCE_MAX_AGE секунд или сразу после
+  mark_balances_dirty() (например, после ордера);
+• входы — при изменении версии источника входов вида и вместе с балансами.
+
+snapshot() вида между обновлениями — это чтение готовых строк.
+
+    VIEW = ENGINE.view(entries_loader, entries_version, qty_mode="total")
+    snap = VIEW.snapshot()     # {"rows": [...], "total": ..., "version": ...}
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from price_cache import PRICES
+
+BALANCE_MAX_AGE = 30.0   # сек; балансы меняются только нашими же ордерами и депозитами
+PRICE_MAX_AGE = 10.0     # сек; если событий цен не было дольше — дотягиваем bulk-запросом
+QUOTE = "USDT"
+
+
+def _load_balances() -> Dict[str, Tuple[float, float]]:
+    from mexc_client import get_account_info
+    acc = get_account_info()
+    out: Dict[str, Tuple[float, float]] = {}
+    for b in acc.get("balances") or []:
+        asset = (b.get("asset") or b.get("currency") or "").upper()
+        try:
+            free = float(b.get("free", 0) or b.get("available", 0) or 0)
+            locked = float(b.get("locked", 0) or 0)
+        except (TypeError, ValueError):
+            continue
+        if asset:
+            f0, l0 = out.get(asset, (0.0, 0.0))
+            out[asset] = (f0 + free, l0 + locked)
+    return out
+
+
+def _load_prices(symbols: List[str]) -> Dict[str, float]:
+    from mexc_client import get_prices_bulk
+    return get_prices_bulk(symbols)
+
+
+class PortfolioView:
+    """Строки одного экрана портфеля поверх общих балансов и цен движка."""
+
+    def __init__(self, engine: "PortfolioEngine", entries_loader: Callable[[List[str]], Dict[str, float]],
+                 entries_version: Callable[[], Any], qty_mode: str, stables: Iterable[str]):
+        self._engine = engine
+        self._entries_loader = entries_loader
+        self._entries_version = entries_version
+        self._qty_free_only = qty_mode == "free"
+        self._stables = {s.upper() for s in stables}
+        self._entries_lock = threading.Lock()
+        self._qty: Dict[str, float] = {}
+        self._entry: Dict[str, float] = {}
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._total = 0.0
+        self._sorted: Optional[List[Dict[str, Any]]] = None
+        self.version = 0
+        self._entries_ver: Any = object()
+        self.stats = {"reads": 0, "entries_loads": 0}
+
+    # --- строки (под engine._lock) -----------------------------------------------------
+
+    def _make_row(self, asset: str, price: Optional[float]) -> Dict[str, Any]:
+        qty = self._qty[asset]
+        entry = self._entry.get(asset) or 0.0
+        value = qty * price if price else 0.0
+        pl_usdt = pl_pct = None
+        if asset not in self._stables and entry > 0 and price:
+            pl_usdt = qty * (price - entry)
+            pl_pct = (price / entry - 1) * 100
+        return {"asset": asset, "qty": qty, "price": price, "value": value,
+                "entry": entry, "pl_usdt": pl_usdt, "pl_pct": pl_pct}
+
+    def _set_row(self, asset: str, price: Optional[float]) -> None:
+        old = self._rows.get(asset)
+        row = self._rows[asset] = self._make_row(asset, price)
+        self._total += row["value"] - (old["value"] if old else 0.0)
+
+    def _changed(self) -> None:
+        self.version += 1
+        self._sorted = None
+
+    def _on_price(self, asset: str, px: float) -> None:
+        row = self._rows.get(asset)
+        if row is not None and asset not in self._stables and row["price"] != px:
+            self._set_row(asset, px)
+            self._changed()
+
+    def _set_balances(self, balances: Dict[str, Tuple[float, float]], prices: Dict[str, float]) -> None:
+        qty = {a: (f if self._qty_free_only else f + l) for a, (f, l) in balances.items()}
+        qty = {a: q for a, q in qty.items() if q > 0}
+        changed = set(qty) ^ set(self._qty) | {a for a in qty if self._qty.get(a) != qty[a]}
+        self._qty = qty
+        for a in changed:
+            if a in qty:
+                self._set_row(a, 1.0 if a in self._stables else prices.get(a + QUOTE))
+            elif a in self._rows:
+                self._total -= self._rows.pop(a)["value"]
+        # балансы перечитаны — входы тоже (новые активы, ручные правки)
+        self._entries_ver = object()
+        if changed:
+            self._changed()
+
+    def set_entries(self, entries: Dict[str, float]) -> None:
+        with self._engine._lock:
+            self._entry = {a.upper(): float(v) for a, v in entries.items() if v}
+            for a, row in list(self._rows.items()):
+                if (self._entry.get(a) or 0.0) != row["entry"]:
+                    self._set_row(a, row["price"])
+            self._changed()
+
+    # --- чтение ---------------------------------------------------------------------------
+
+    def _refresh_entries(self) -> None:
+        with self._entries_lock:
+            if self._entries_version() == self._entries_ver:
+                return
+            with self._engine._lock:
+                assets = [a for a in self._qty if a not in self._stables]
+            self.set_entries(self._entries_loader(assets))
+            self.stats["entries_loads"] += 1
+            # первая загрузка документа сама сдвигает версию — берём её после загрузки
+            self._entries_ver = self._entries_version()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        {"rows": [строки по убыванию стоимости], "total": USDT, "version": N}.
+        Строка: asset, qty, price (None — цены нет), value, entry, pl_usdt, pl_pct.
+        """
+        self._engine.refresh_if_stale()
+        if self._entries_version() != self._entries_ver:
+            self._refresh_entries()
+        with self._engine._lock:
+            self.stats["reads"] += 1
+            if self._sorted is None:
+                self._sorted = sorted((dict(r) for r in self._rows.values()), key=lambda r: r["value"], reverse=True)
+            return {"rows": self._sorted, "total": self._total, "version": self.version}
+
+
+class PortfolioEngine:
+    def __init__(self, balance_loader: Callable[[], Dict[str, Tuple[float, float]]] = _load_balances,
+                 price_loader: Callable[[List[str]], Dict[str, float]] = _load_prices,
+                 balance_max_age: float = BALANCE_MAX_AGE, price_max_age: float = PRICE_MAX_AGE):
+        self._balance_loader = balance_loader
+        self._price_loader = price_loader
+        self.balance_max_age = balance_max_age
+        self.price_max_age = price_max_age
+
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._balances: Dict[str, Tuple[float, float]] = {}
+        self._prices: Dict[str, float] = {}    # "BTCUSDT" -> последняя цена
+        self._by_symbol: Dict[str, str] = {}   # "BTCUSDT" -> "BTC"
+        self._views: List[PortfolioView] = []
+        self._balances_at = 0.0
+        self._priced_at = 0.0
+        self.stats = {"balance_loads": 0, "price_loads": 0, "price_events": 0}
+
+        PRICES.subscribe(self.on_prices)
+
+    def view(self, entries_loader: Callable[[List[str]], Dict[str, float]],
+             entries_version: Callable[[], Any] = lambda: 0,
+             qty_mode: str = "total", stables: Iterable[str] = (QUOTE,)) -> PortfolioView:
+        """
+        entries_loader(assets) -> {ASSET: вход}; entries_version() — меняется, когда входы поменялись.
+        qty_mode: "total" — free+locked, "free" — только свободные.
+        stables — активы с ценой 1.0.
+        """
+        v = PortfolioView(self, entries_loader, entries_version, qty_mode, stables)
+        with self._lock:
+            v._set_balances(self._balances, self._prices)
+            self._views.append(v)
+        return v
+
+    def close(self) -> None:
+        PRICES.unsubscribe(self.on_prices)
+
+    # --- события --------------------------------------------------------------------
+
+    def on_prices(self, items: Dict[str, Any]) -> None:
+        """Подписчик PRICES: переоценить только затронутые активы."""
+        if not self._by_symbol:
+            return
+        with self._lock:
+            hit = False
+            if len(items) < len(self._by_symbol):
+                pairs = [(s, items[s]) for s in items if s in self._by_symbol]
+            else:
+                pairs = [(s, items[s]) for s in self._by_symbol if s in items]
+            for sym, px in pairs:
+                if not isinstance(px, (int, float)) or px <= 0:
+                    continue
+                hit = True
+                px = float(px)
+                if self._prices.get(sym) != px:
+                    self._prices[sym] = px
+                    asset = self._by_symbol[sym]
+                    for v in self._views:
+                        v._on_price(asset, px)
+            if hit:
+                self._priced_at = time.monotonic()
+                self.stats["price_events"] += 1
+
+    def set_balances(self, balances: Dict[str, Tuple[float, float]]) -> None:
+        with self._lock:
+            self._balances = {a: fl for a, fl in balances.items() if fl[0] + fl[1] > 0}
+            self._by_symbol = {a + QUOTE: a for a in self._balances if a != QUOTE}
+            self._prices = {s: px for s, px in self._prices.items() if s in self._by_symbol}
+            for sym in self._by_symbol:
+                if sym not in self._prices:
+                    px = PRICES.peek(sym, self.price_max_age, tag="portfolio")
+                    if px:
+                        self._prices[sym] = px
+            for v in self._views:
+                v._set_balances(self._balances, self._prices)
+            self._balances_at = time.monotonic()
+
+    def mark_balances_dirty(self) -> None:
+        self._balances_at = 0.0
+
+    def invalidate(self) -> None:
+        """Забыть балансы и цены: следующее чтение перечитает их из сети."""
+        with self._lock:
+            self._prices.clear()
+            self._balances_at = 0.0
+            self._priced_at = 0.0
+
+    # --- обновление -------------------------------------------------------------------
+
+    def refresh(self, force: bool = False) -> None:
+        """Дотянуть то, что устарело: балансы и цены. Один обновляющий поток за раз."""
+        now = time.monotonic()
+        with self._refresh_lock:
+            if force or now - self._balances_at > self.balance_max_age:
+                self.set_balances(self._balance_loader())
+                self.stats["balance_loads"] += 1
+            if force or time.monotonic() - self._priced_at > self.price_max_age:
+                syms = list(self._by_symbol)
+                if syms:
+                    # ответ придёт и событием PRICES; здесь — для пар, чья цена не менялась
+                    self.on_prices(self._price_loader(syms))
+                    self.stats["price_loads"] += 1
+                self._priced_at = time.monotonic()
+
+    def refresh_if_stale(self) -> None:
+        now = time.monotonic()
+        if now - self._balances_at > self.balance_max_age or now - self._priced_at > self.price_max_age:
+            self.refresh()
+
+
+# общий движок процесса: виды портфеля — в main_portfolio_adapter и balance_history
+ENGINE = PortfolioEngine()
+
+
+def mark_balances_dirty() -> None:
+    """Балансы поменялись (ордер исполнен) — перечитаем их при следующем чтении."""
+    ENGINE.mark_balances_dirty()
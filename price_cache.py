@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Общий in-process кэш цен.
+
+• у каждого вызывающего свой допустимый возраст значения (max_age, сек);
+• одновременные промахи по одному ключу схлопываются в одну загрузку
+  (single-flight) — и для потоков, и для корутин;
+• LRU-вытеснение при превышении max_entries;
+• счётчики hit/miss по тегам вызывающих — смотреть через stats().
+
+Ключи — символы вида "BTCUSDT" (последняя цена) либо служебные ключи
+с двоеточием ("ticker24h:all") для целых снимков рынка.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+DEFAULT_MAX_AGE = float(os.getenv("PRICE_CACHE_MAX_AGE", "5"))
+MAX_ENTRIES = int(os.getenv("PRICE_CACHE_MAX_ENTRIES", "4096"))
+
+_MISS = object()
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class PriceCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, default_max_age: float = DEFAULT_MAX_AGE):
+        self.max_entries = max_entries
+        self.default_max_age = default_max_age
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (ts, value)
+        self._inflight: Dict[str, _Flight] = {}
+        self._ainflight: Dict[str, asyncio.Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._evictions = 0
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+    # --- внутреннее (вызывать под self._lock) --------------------------------
+
+    def _count(self, tag: str, what: str) -> None:
+        st = self._stats.get(tag)
+        if st is None:
+            st = self._stats[tag] = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+        st[what] += 1
+
+    def _fresh(self, key: str, max_age: float) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return _MISS
+        ts, value = item
+        if time.monotonic() - ts > max_age:
+            return _MISS
+        self._data.move_to_end(key)
+        return value
+
+    def _store(self, key: str, value: Any, ts: float) -> None:
+        self._data[key] = (ts, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self._evictions += 1
+
+    # --- запись / чтение без загрузки -----------------------------------------
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._store(key, value, time.monotonic())
+        self._notify({key: value})
+
+    def put_many(self, items: Dict[str, Any]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for k, v in items.items():
+                self._store(k, v, now)
+        self._notify(items)
+
+    # --- подписка на обновления ---------------------------------------------------
+
+    def subscribe(self, fn: Callable[[Dict[str, Any]], None]) -> None:
+        """fn({key: value, ...}) после каждой записи; вызывается вне блокировки, должна быть быстрой."""
+        self._listeners = self._listeners + [fn]
+
+    def unsubscribe(self, fn: Callable[[Dict[str, Any]], None]) -> None:
+        self._listeners = [f for f in self._listeners if f is not fn]
+
+    def _notify(self, items: Dict[str, Any]) -> None:
+        for fn in self._listeners:
+            try:
+                fn(items)
+            except Exception:
+                pass
+
+    def peek(self, key: str, max_age: Optional[float] = None, tag: str = "default") -> Optional[Any]:
+        """Свежее значение или None; в сеть не ходит. Учитывается в hit/miss."""
+        max_age = self.default_max_age if max_age is None else max_age
+        with self._lock:
+            v = self._fresh(key, max_age)
+            self._count(tag, "misses" if v is _MISS else "hits")
+            return None if v is _MISS else v
+
+    def fresh_many(self, keys, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """Свежие значения для тех ключей, что есть; в счётчики не идёт."""
+        max_age = self.default_max_age if max_age is None else max_age
+        out = {}
+        with self._lock:
+            for k in keys:
+                v = self._fresh(k, max_age)
+                if v is not _MISS:
+                    out[k] = v
+        return out
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    # --- чтение через кэш -----------------------------------------------------
+
+    def get(self, key: str, loader: Callable[[], Any], max_age: Optional[float] = None, tag: str = "default") -> Any:
+        """
+        Синхронное чтение: свежее значение из кэша или loader() (один на ключ,
+        остальные потоки ждут его результата). Исключение loader пробрасывается
+        всем ожидающим и в кэш не попадает.
+        """
+        max_age = self.default_max_age if max_age is None else max_age
+        with self._lock:
+            v = self._fresh(key, max_age)
+            if v is not _MISS:
+                self._count(tag, "hits")
+                return v
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self._count(tag, "misses")
+            else:
+                self._count(tag, "coalesced")
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = loader()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._count(tag, "errors")
+            raise
+        else:
+            flight.value = value
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    async def aget(self, key: str, loader: Callable[[], Awaitable[Any]], max_age: Optional[float] = None, tag: str = "default") -> Any:
+        """Асинхронный вариант get(): loader — корутинная функция."""
+        max_age = self.default_max_age if max_age is None else max_age
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            v = self._fresh(key, max_age)
+            if v is not _MISS:
+                self._count(tag, "hits")
+                return v
+            fut = self._ainflight.get(key)
+            leader = fut is None or fut.done() or fut.get_loop() is not loop
+            if leader:
+                fut = self._ainflight[key] = loop.create_future()
+                self._count(tag, "misses")
+            else:
+                self._count(tag, "coalesced")
+
+        if not leader:
+            return await asyncio.shield(fut)
+
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # помечаем как прочитанное, если ждущих не было
+            with self._lock:
+                self._count(tag, "errors")
+            raise
+        else:
+            self.put(key, value)
+            fut.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                if self._ainflight.get(key) is fut:
+                    del self._ainflight[key]
+
+    # --- метрики --------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        {"entries": N, "evictions": N,
+         "total": {"hits", "misses", "coalesced", "errors", "hit_ratio"},
+         "by_tag": {tag: {...}}}
+        """
+        with self._lock:
+            by_tag = {t: dict(st) for t, st in self._stats.items()}
+            entries, evictions = len(self._data), self._evictions
+        total = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+        for st in by_tag.values():
+            for k in total:
+                total[k] += st[k]
+        for st in list(by_tag.values()) + [total]:
+            looked = st["hits"] + st["misses"] + st["coalesced"]
+            st["hit_ratio"] = round(st["hits"] / looked, 4) if looked else 0.0
+        return {"entries": entries, "evictions": evictions, "total": total, "by_tag": by_tag}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._evictions = 0
+
+
+# Общий экземпляр на процесс — через него читают orders, mexc_client,
+# портфельные рендеры и market_engine.
+PRICES = PriceCache()
+
+
+def stats() -> Dict[str, Any]:
+    return PRICES.stats()
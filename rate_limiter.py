@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Клиентский лимитер по «весу» запросов MEXC (token bucket).
+
+MEXC считает лимиты не в запросах, а в весе: /myTrades стоит 10,
+/ticker/price — 1 и т.д. Лимитер выдаёт вес с постоянной скоростью
+capacity/period и не даёт параллельным задачам выйти за бюджет.
+
+Вес запроса — по таблице WEIGHTS (weight_of(path, params)); HTTP-обёртки
+mexc_client, orders и market_engine берут его сами перед каждым запросом
+и отдают лимитеру ответ (on_response): заголовок использованного веса
+подрезает наш остаток до серверного, 429/418 с Retry-After
+останавливает выдачу на указанное время.
+
+Полосы приоритета: ORDER (ордера) > INTERACTIVE (команды пользователя;
+полоса по умолчанию) > BACKGROUND (сканы рынка и AI-обзор в ежечасном
+отчёте, свечи, выгрузка истории сделок, плановое обновление символов,
+REST-доснимок потока рынка). Пока ждёт запрос более
+срочной полосы, менее срочные вес не получают; кроме того, фону не
+отдаются последние LANE_RESERVE доли бюджета — ордеру всегда есть из чего
+взять. Полоса берётся из контекста (contextvars — наследуется корутинами
+и asyncio.to_thread):
+
+    with lane(BACKGROUND):
+        await compute_avg_entries_async(...)
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Mapping, Optional
+
+import metrics
+
+# по умолчанию — 500 единиц веса за 10 секунд (лимит MEXC на endpoint)
+WEIGHT_CAPACITY = float(os.getenv("MEXC_WEIGHT_CAPACITY", "500"))
+WEIGHT_PERIOD = float(os.getenv("MEXC_WEIGHT_PERIOD", "10"))
+# лимит, относительно которого биржа считает used-weight в заголовке ответа
+USED_WEIGHT_LIMIT = float(os.getenv("MEXC_USED_WEIGHT_LIMIT", str(WEIGHT_CAPACITY)))
+
+# полосы приоритета: меньше — срочнее
+ORDER, INTERACTIVE, BACKGROUND = 0, 1, 2
+LANE_NAMES = {ORDER: "order", INTERACTIVE: "interactive", BACKGROUND: "background"}
+# доля бюджета, которую полоса не трогает (оставляет более срочным)
+LANE_RESERVE = {ORDER: 0.0, INTERACTIVE: 0.05, BACKGROUND: 0.2}
+
+_LANE: contextvars.ContextVar[int] = contextvars.ContextVar("rate_limit_lane", default=INTERACTIVE)
+
+# веса endpoint'ов MEXC spot v3; (без symbol, с symbol) там, где вес зависит от него
+WEIGHTS: Dict[str, Any] = {
+    "/api/v3/ping": 1,
+    "/api/v3/time": 1,
+    "/api/v3/exchangeInfo": 10,
+    "/api/v3/depth": 1,
+    "/api/v3/trades": 5,
+    "/api/v3/klines": 1,
+    "/api/v3/avgPrice": 1,
+    "/api/v3/ticker/24hr": (40, 1),
+    "/api/v3/ticker/price": (2, 1),
+    "/api/v3/ticker/bookTicker": (2, 1),
+    "/api/v3/account": 10,
+    "/api/v3/myTrades": 10,
+    "/api/v3/order": 1,
+    "/api/v3/openOrders": 3,
+}
+DEFAULT_WEIGHT = 1
+
+
+def weight_of(path: str, params: Optional[Mapping[str, Any]] = None) -> float:
+    w = WEIGHTS.get(path, DEFAULT_WEIGHT)
+    if isinstance(w, tuple):
+        return w[1] if params and params.get("symbol") else w[0]
+    return w
+
+
+def current_lane() -> int:
+    return _LANE.get()
+
+
+@contextmanager
+def lane(priority: int):
+    """Все запросы внутри блока (и порождённых им задач) — в полосе priority."""
+    token = _LANE.set(priority)
+    try:
+        yield
+    finally:
+        _LANE.reset(token)
+
+
+class WeightLimiter:
+    def __init__(self, capacity: float = WEIGHT_CAPACITY, period: float = WEIGHT_PERIOD,
+                 reserve: Optional[Dict[int, float]] = None, name: str = ""):
+        """reserve — {полоса: доля бюджета, которую она не трогает}; None — без резерва."""
+        self.name = name
+        self.reserve = reserve or {}
+        self.capacity = capacity
+        self.rate = capacity / period  # единиц веса в секунду
+        self._tokens = capacity
+        self._ts = time.monotonic()
+        self._lock = threading.Lock()
+        self._waiting = {p: 0 for p in LANE_NAMES}
+        self._blocked_until = 0.0
+        self.stats = {"granted": 0, "waited": 0, "server_trims": 0, "penalties": 0}
+
+    def _refill(self, now: float) -> None:
+        # после штрафа _ts сдвинут в будущее: до его конца вес не копится
+        if now > self._ts:
+            self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+            self._ts = now
+
+    def _try_take(self, weight: float, priority: int = INTERACTIVE) -> float:
+        """Забрать вес; вернуть 0 при успехе или сколько секунд подождать."""
+        weight = min(weight, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            self._refill(now)
+            if any(self._waiting[p] for p in self._waiting if p < priority):
+                # впереди ждёт более срочная полоса — уступаем
+                return max(weight / self.rate, 0.005)
+            floor = self.capacity * self.reserve.get(priority, 0.0)
+            if self._tokens - weight >= floor:
+                self._tokens -= weight
+                self.stats["granted"] += 1
+                return 0.0
+            return (weight + floor - self._tokens) / self.rate
+
+    def _wait(self, priority: int, delta: int) -> None:
+        with self._lock:
+            self._waiting[priority] += delta
+
+    async def acquire(self, weight: float = 1, priority: Optional[int] = None) -> None:
+        priority = _LANE.get() if priority is None else priority
+        wait = self._try_take(weight, priority)
+        if not wait:
+            return
+        t0 = time.monotonic()
+        self._wait(priority, 1)
+        try:
+            while wait:
+                await asyncio.sleep(wait)
+                wait = self._try_take(weight, priority)
+        finally:
+            self._wait(priority, -1)
+            self._waited(priority, time.monotonic() - t0)
+
+    def acquire_sync(self, weight: float = 1, priority: Optional[int] = None) -> None:
+        priority = _LANE.get() if priority is None else priority
+        wait = self._try_take(weight, priority)
+        if not wait:
+            return
+        t0 = time.monotonic()
+        self._wait(priority, 1)
+        try:
+            while wait:
+                time.sleep(wait)
+                wait = self._try_take(weight, priority)
+        finally:
+            self._wait(priority, -1)
+            self._waited(priority, time.monotonic() - t0)
+
+    def _waited(self, priority: int, seconds: float) -> None:
+        self.stats["waited"] += 1
+        metrics.observe("rate_limit_wait_seconds", seconds, limiter=self.name or "anon",
+                        lane=LANE_NAMES.get(priority, str(priority)))
+
+    # --- обратная связь от биржи -------------------------------------------------------
+
+    def on_response(self, status: int, headers: Optional[Mapping[str, str]] = None) -> None:
+        """
+        Учесть ответ биржи: заголовок *used-weight* подрезает остаток до
+        серверного (вес могли потратить другие процессы с того же IP);
+        429/418 — пауза на Retry-After (или на период окна).
+        """
+        headers = headers or {}
+        used = None
+        for k, v in headers.items():
+            if "used-weight" in k.lower():
+                try:
+                    used = max(used or 0.0, float(v))
+                except (TypeError, ValueError):
+                    continue
+        with self._lock:
+            now = time.monotonic()
+            if used is not None and USED_WEIGHT_LIMIT > 0:
+                self._refill(now)
+                left = self.capacity * max(0.0, 1.0 - used / USED_WEIGHT_LIMIT)
+                if left < self._tokens:
+                    self._tokens = left
+                    self.stats["server_trims"] += 1
+            if status in (418, 429):
+                ra = headers.get("Retry-After", headers.get("retry-after"))
+                try:
+                    pause = float(ra) if ra is not None else self.capacity / self.rate
+                except (TypeError, ValueError):
+                    pause = self.capacity / self.rate
+                self._blocked_until = max(self._blocked_until, now + pause)
+                self._tokens = 0.0
+                self._ts = now + pause
+                self.stats["penalties"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {"tokens": round(self._tokens, 2), "capacity": self.capacity,
+                    "waiting": {LANE_NAMES[p]: n for p, n in self._waiting.items()},
+                    "blocked_for": round(max(0.0, self._blocked_until - time.monotonic()), 3),
+                    **self.stats}
+
+
+# общий лимитер процесса
+LIMITER = WeightLimiter(reserve=LANE_RESERVE, name="mexc")
+
+
+def _limiter_gauges():
+    s = LIMITER.snapshot()
+    yield "rate_limit_tokens", {}, s["tokens"]
+    yield "rate_limit_blocked_seconds", {}, s["blocked_for"]
+    for name, n in s["waiting"].items():
+        yield "rate_limit_waiting", {"lane": name}, n
+    for k in ("granted", "waited", "server_trims", "penalties"):
+        yield f"rate_limit_{k}", {}, s[k]
+
+
+metrics.register_collector(_limiter_gauges)
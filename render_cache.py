@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш готовых текстов для Telegram (портфель, обзор рынка).
+
+Текст зависит только от снимка данных, поэтому кэшируется по ключу эпохи
+данных: для портфеля — версия PortfolioEngine (меняется при любом изменении
+цен, балансов или входов), для рынка — сам объект TickerFrame (новый снимок
+рынка — новый объект). Пока ключ тот же, повторная команда получает
+готовую строку без форматирования. На каждый рендер — один слот (последняя
+эпоха), старые тексты не копятся.
+
+    text = RENDERS.render("portfolio", snap["version"], lambda: _render(snap))
+    RENDERS.stats()   # hits/misses/hit_ratio и время рендера по именам
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_MISS = object()
+
+
+class RenderCache:
+    def __init__(self):
+        self._slots: Dict[str, Tuple[Any, str]] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _st(self, name: str) -> Dict[str, float]:
+        st = self._stats.get(name)
+        if st is None:
+            st = self._stats[name] = {"hits": 0, "misses": 0, "errors": 0,
+                                      "render_ms_total": 0.0, "render_ms_max": 0.0, "render_ms_last": 0.0}
+        return st
+
+    def render(self, name: str, key: Any, fn: Callable[[], str]) -> str:
+        """Текст для ключа эпохи key; при смене ключа — fn(). Исключения fn не кэшируются."""
+        with self._lock:
+            slot = self._slots.get(name)
+            # ключ — версия или сам объект снимка: сравниваем и по is, и по ==
+            if slot is not None and (slot[0] is key or slot[0] == key):
+                self._st(name)["hits"] += 1
+                return slot[1]
+        t0 = time.perf_counter()
+        try:
+            text = fn()
+        except Exception:
+            with self._lock:
+                self._st(name)["errors"] += 1
+            raise
+        ms = (time.perf_counter() - t0) * 1000
+        with self._lock:
+            st = self._st(name)
+            st["misses"] += 1
+            st["render_ms_total"] += ms
+            st["render_ms_last"] = ms
+            st["render_ms_max"] = max(st["render_ms_max"], ms)
+            self._slots[name] = (key, text)
+        return text
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._slots.clear()
+            else:
+                self._slots.pop(name, None)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """{имя: {hits, misses, errors, hit_ratio, render_ms_avg, render_ms_max, render_ms_last}}."""
+        with self._lock:
+            out = {n: dict(st) for n, st in self._stats.items()}
+        for st in out.values():
+            looked = st["hits"] + st["misses"]
+            st["hit_ratio"] = round(st["hits"] / looked, 4) if looked else 0.0
+            total_ms = st.pop("render_ms_total")
+            st["render_ms_avg"] = round(total_ms / st["misses"], 3) if st["misses"] else 0.0
+            st["render_ms_max"] = round(st["render_ms_max"], 3)
+            st["render_ms_last"] = round(st["render_ms_last"], 3)
+        return out
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+# Общий экземпляр: main_portfolio_adapter, balance_history, market_engine.
+RENDERS = RenderCache()
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    return RENDERS.stats()
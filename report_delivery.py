@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Рассылка отчёта по чатам: у каждого чата своя очередь (порядок сообщений
+сохраняется), чаты обслуживаются параллельно.
+
+• одновременно в Telegram уходит не больше DELIVERY_CONCURRENCY сообщений;
+• общий темп — не больше DELIVERY_GLOBAL_RATE сообщений в секунду;
+• в один чат — пачка до DELIVERY_CHAT_BURST сообщений, дальше не чаще
+  раза в DELIVERY_CHAT_INTERVAL секунд;
+• на «слишком часто» (retry_after) ждём сколько сказано и повторяем.
+Если сообщение в чат не ушло, остальные сообщения этого чата в этом отчёте
+пропускаются — другие чаты это не задерживает.
+
+    fan = Fanout(chat_ids, bot.send_message)
+    fan.post("Ежечасный отчет", text)     # можно сразу, пока другие этапы считаются
+    ...
+    await fan.close()
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from rate_limiter import WeightLimiter
+
+DELIVERY_CONCURRENCY = int(os.getenv("DELIVERY_CONCURRENCY", "8"))
+DELIVERY_GLOBAL_RATE = float(os.getenv("DELIVERY_GLOBAL_RATE", "25"))    # Telegram: ~30/с на бота
+DELIVERY_CHAT_INTERVAL = float(os.getenv("DELIVERY_CHAT_INTERVAL", "1.0"))  # Telegram: ~1/с в чат
+DELIVERY_CHAT_BURST = int(os.getenv("DELIVERY_CHAT_BURST", "3"))
+DELIVERY_RETRIES = 2
+
+_GLOBAL = WeightLimiter(DELIVERY_GLOBAL_RATE, 1.0)
+_CHAT_LIMITS: Dict[int, WeightLimiter] = {}  # живут между отчётами
+
+_STOP = object()
+
+
+class Fanout:
+    def __init__(self, chat_ids: Iterable[int], send: Callable[[int, str], Awaitable],
+                 concurrency: int = DELIVERY_CONCURRENCY):
+        self._send = send
+        self._sem = asyncio.Semaphore(concurrency)
+        self._queues: Dict[int, asyncio.Queue] = {cid: asyncio.Queue() for cid in chat_ids}
+        self._workers = [asyncio.create_task(self._worker(cid, q)) for cid, q in self._queues.items()]
+        self.stats = {"sent": 0, "failed": 0, "skipped": 0, "retries": 0}
+
+    def post(self, *texts: str) -> None:
+        """Поставить сообщения в очередь всех чатов (порядок внутри чата сохраняется)."""
+        for q in self._queues.values():
+            for t in texts:
+                q.put_nowait(t)
+
+    async def close(self) -> Dict[str, int]:
+        """Дождаться, пока все очереди опустеют."""
+        for q in self._queues.values():
+            q.put_nowait(_STOP)
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        return self.stats
+
+    async def _send_one(self, cid: int, text: str) -> None:
+        chat = _CHAT_LIMITS.get(cid)
+        if chat is None:
+            chat = _CHAT_LIMITS[cid] = WeightLimiter(DELIVERY_CHAT_BURST, DELIVERY_CHAT_BURST * DELIVERY_CHAT_INTERVAL)
+        for attempt in range(DELIVERY_RETRIES + 1):
+            await chat.acquire()
+            await _GLOBAL.acquire()
+            try:
+                async with self._sem:
+                    await self._send(cid, text)
+                return
+            except Exception as e:
+                retry_after: Optional[float] = getattr(e, "retry_after", None)
+                if retry_after is None or attempt == DELIVERY_RETRIES:
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(float(retry_after))
+
+    async def _worker(self, cid: int, q: asyncio.Queue) -> None:
+        failed = False
+        while True:
+            text = await q.get()
+            if text is _STOP:
+                return
+            if failed:
+                self.stats["skipped"] += 1
+                continue
+            try:
+                await self._send_one(cid, text)
+                self.stats["sent"] += 1
+            except Exception:
+                failed = True
+                self.stats["failed"] += 1
+
+
+async def broadcast(chat_ids: List[int], send: Callable[[int, str], Awaitable], *texts: str) -> Dict[str, int]:
+    fan = Fanout(chat_ids, send)
+    fan.post(*texts)
+    return await fan.close()
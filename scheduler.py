@@ -1,58 +1,266 @@
 import asyncio
 import os
+import threading
+import time
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from main import build_portfolio_snapshot, bot
-from balance_history import add_point
-from signals_engine import shortlist
-from mexc_client import get_exchange_info
+from balance_history import add_point, portfolio_values, sample_point
+from signals_engine import shortlist_async
+import symbols_index
+import market_feed
+import metrics
+from report_delivery import Fanout
+from rate_limiter import BACKGROUND, lane
 from ai_analyzer import ai_market_review
 
 _scheduler = None
 
+SYMBOLS_REFRESH_MINUTES = int(os.getenv("SYMBOLS_REFRESH_MINUTES", "30"))
+SCREEN_UNIVERSE_LIMIT = int(os.getenv("SCREEN_UNIVERSE_LIMIT", "0"))  # 0 — все USDT-пары
+MARKET_FEED_ENABLED = os.getenv("MEXC_WS_FEED", "1") == "1"
+# как часто пересобирать символы bookTicker/deals потока (мин)
+FEED_SYMBOLS_MINUTES = int(os.getenv("MEXC_WS_SYMBOLS_MINUTES", "10"))
+
+# бюджет ежечасного отчёта: весь прогон и каждый этап по отдельности (сек).
+# Этап, не уложившийся в своё время, отменяется — отчёт уходит без него.
+# Отмена снимает ожидание; оценка сигналов прерывается по флагу, а работа
+# портфеля и AI в потоке (build_portfolio_snapshot, ai_market_review)
+# дорабатывает сама — пока она жива, этап считается занятым и в следующем
+# отчёте не запускается повторно (см. _in_thread).
+REPORT_BUDGET = float(os.getenv("REPORT_BUDGET_SEC", "600"))
+STAGE_TIMEOUTS = {
+    "portfolio": float(os.getenv("REPORT_PORTFOLIO_TIMEOUT", "90")),
+    "signals": float(os.getenv("REPORT_SIGNALS_TIMEOUT", "300")),
+    "ai": float(os.getenv("REPORT_AI_TIMEOUT", "120")),
+}
+# частая выборка стоимости портфеля в историю (сек); 0 — только ежечасная точка
+BALANCE_SAMPLE_SECONDS = int(os.getenv("BALANCE_SAMPLE_SECONDS", "0"))
+# прогон, опоздавший больше чем на столько (бот спал, loop был занят), пропускается
+REPORT_MISFIRE_GRACE = int(os.getenv("REPORT_MISFIRE_GRACE_SEC", "300"))
+
+# метрики задач планировщика: job_id -> счётчики; смотреть через job_metrics()
+_METRICS: dict = {}
+
+def _metrics(job_id: str) -> dict:
+    m = _METRICS.get(job_id)
+    if m is None:
+        m = _METRICS[job_id] = {
+            "runs": 0, "partial": 0, "skipped_overlap": 0, "missed": 0,
+            "last_duration": 0.0, "max_duration": 0.0, "total_duration": 0.0,
+            "stage_timeouts": {}, "stage_errors": {}, "stage_busy": {},
+        }
+    return m
+
+def job_metrics() -> dict:
+    out = {}
+    for job_id, m in _METRICS.items():
+        m = dict(m, stage_timeouts=dict(m["stage_timeouts"]), stage_errors=dict(m["stage_errors"]),
+                 stage_busy=dict(m["stage_busy"]))
+        m["avg_duration"] = round(m["total_duration"] / m["runs"], 3) if m["runs"] else 0.0
+        m["total_duration"] = round(m["total_duration"], 3)
+        out[job_id] = m
+    return out
+
+def _job_gauges():
+    for job_id, m in job_metrics().items():
+        for k in ("runs", "partial", "skipped_overlap", "missed", "last_duration", "max_duration", "avg_duration"):
+            yield f"scheduler_job_{k}", {"job": job_id}, m[k]
+        for stage, n in m["stage_timeouts"].items():
+            yield "scheduler_stage_timeouts", {"job": job_id, "stage": stage}, n
+        for stage, n in m["stage_errors"].items():
+            yield "scheduler_stage_errors", {"job": job_id, "stage": stage}, n
+        for stage, n in m["stage_busy"].items():
+            yield "scheduler_stage_busy", {"job": job_id, "stage": stage}, n
+    for stage in _STAGE_DONE:
+        yield "scheduler_stage_running", {"stage": stage}, 0 if _STAGE_DONE[stage].is_set() else 1
+
+metrics.register_collector(_job_gauges)
+
+def _on_skipped(event):
+    # EVENT_JOB_MAX_INSTANCES — предыдущий прогон ещё идёт; EVENT_JOB_MISSED — опоздали
+    key = "skipped_overlap" if event.code == EVENT_JOB_MAX_INSTANCES else "missed"
+    _metrics(event.job_id)[key] += 1
+
 def list_usdt_symbols(limit: int = 40) -> list[str]:
-    info = get_exchange_info()
-    syms = []
-    for s in info.get("symbols", []):
-        status = str(s.get("status", "")).upper()
-        if s.get("quoteAsset") == "USDT" and status in ("ENABLED", "TRADING", "OPEN"):
-            syms.append(s["symbol"])
-    return syms[:limit]
+    syms = symbols_index.list_symbols("USDT")
+    return syms[:limit] if limit else syms
+
+# символы последнего шортлиста сигналов — кандидаты скринера для потока
+_screened: list[str] = []
+
+def _feed_symbols() -> list[str]:
+    """Символы bookTicker/deals: позиции портфеля по стоимости, затем шортлист скринера."""
+    try:
+        _, assets = portfolio_values()
+    except Exception as e:
+        metrics.swallowed("scheduler.feed_symbols", e)
+        assets = {}
+    held = [f"{a}USDT" for a, _ in sorted(assets.items(), key=lambda kv: -kv[1]) if a not in ("USDT", "USDC")]
+    return list(dict.fromkeys(held + _screened))
+
+def _refresh_symbols():
+    # плановое обновление — фоновая полоса лимитера, команды пользователя вперёд
+    with lane(BACKGROUND):
+        symbols_index.refresh()
+
+async def _update_feed():
+    # первый вызов запускает поток, следующие — правят его подписку
+    await market_feed.start_feed(await asyncio.to_thread(_feed_symbols))
 
 def start_scheduler(chat_ids: list[int]):
     global _scheduler
     if _scheduler:
         return _scheduler
-    _scheduler = AsyncIOScheduler(timezone=os.getenv("TZ", "UTC"))
-    _scheduler.add_job(send_hourly_report, "cron", minute=0, args=[chat_ids])
+    # не больше одного экземпляра каждой задачи; накопившиеся пропуски
+    # схлопываются в один запуск — медленная биржа не удваивает нагрузку
+    _scheduler = AsyncIOScheduler(
+        timezone=os.getenv("TZ", "UTC"),
+        job_defaults={"max_instances": 1, "coalesce": True, "misfire_grace_time": REPORT_MISFIRE_GRACE},
+    )
+    _scheduler.add_listener(_on_skipped, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+    _scheduler.add_job(send_hourly_report, "cron", minute=0, args=[chat_ids], id="hourly_report")
+    _scheduler.add_job(_refresh_symbols, "interval", minutes=SYMBOLS_REFRESH_MINUTES, id="symbols_refresh")
+    if BALANCE_SAMPLE_SECONDS > 0:
+        _scheduler.add_job(asyncio.to_thread, "interval", args=[sample_point], seconds=BALANCE_SAMPLE_SECONDS, id="balance_sample")
+    if metrics.METRICS_DUMP_SECONDS > 0:
+        _scheduler.add_job(asyncio.to_thread, "interval", args=[metrics.dump_json], seconds=metrics.METRICS_DUMP_SECONDS, id="metrics_dump")
+    metrics.serve()  # METRICS_PORT=0 — не поднимаем
+    if MARKET_FEED_ENABLED:
+        # поток рынка по WebSocket: обзор и сигналы читают зеркало вместо REST
+        _scheduler.add_job(_update_feed, "date")
+        _scheduler.add_job(_update_feed, "interval", minutes=FEED_SYMBOLS_MINUTES, id="feed_symbols")
     _scheduler.start()
     return _scheduler
 
-async def send_hourly_report(chat_ids: list[int]):
+# этап -> событие «работа этапа в потоке закончилась»; отмена ожидания поток
+# не останавливает, поэтому занятость этапа смотрим по нему, а не по задаче
+_STAGE_DONE: dict = {}
+
+def _stage_running(name: str) -> bool:
+    done = _STAGE_DONE.get(name)
+    return done is not None and not done.is_set()
+
+async def _in_thread(name: str, fn, *args):
+    done = threading.Event()
+    _STAGE_DONE[name] = done
+
+    def run():
+        try:
+            return fn(*args)
+        finally:
+            done.set()
+    return await asyncio.to_thread(run)
+
+def _portfolio_work():
+    text, total_usdt = build_portfolio_snapshot()
+    try:
+        _, assets = portfolio_values()
+    except Exception:
+        assets = None  # итог всё равно запишем
+    return text, total_usdt, assets
+
+async def _portfolio_stage():
+    """(текст, итог, {актив: стоимость}); точка истории пишется уже после этапа."""
+    with metrics.timer("report_stage_seconds", stage="portfolio"):
+        return await _in_thread("portfolio", _portfolio_work)
+
+async def _record_point(total_usdt: float, assets, m: dict) -> None:
+    # вне бюджета этапа: медленное хранилище не должно стоить отчёту портфеля
     try:
-        text, total_usdt = await asyncio.to_thread(build_portfolio_snapshot)
-        add_point(total_usdt)
-
-        syms = await asyncio.to_thread(list_usdt_symbols, 40)
-        strong = await asyncio.to_thread(shortlist, syms, 0.68, 7)
-
-        ai_text = await asyncio.to_thread(ai_market_review, text, strong)
-
-        for cid in chat_ids:
-            try:
-                await bot.send_message(cid, "Ежечасный отчет")
-                await bot.send_message(cid, text)
-                if strong:
-                    best = "\n".join([f"{i+1}. {x['symbol']} score {x['score']:.2f} votes {x['votes']}/{x['total_tools']}" for i, x in enumerate(strong)])
-                    await bot.send_message(cid, "Сильные сигналы")
-                    await bot.send_message(cid, best)
-                await bot.send_message(cid, "AI обзор")
-                await bot.send_message(cid, ai_text)
-            except Exception:
-                pass
+        await asyncio.to_thread(add_point, total_usdt, assets)
     except Exception as e:
-        for cid in chat_ids:
-            try:
-                await bot.send_message(cid, f"Ошибка отчета {e}")
-            except Exception:
-                pass
+        m["stage_errors"]["history"] = m["stage_errors"].get("history", 0) + 1
+        metrics.swallowed("scheduler.add_point", e)
+
+async def _signals_stage() -> list:
+    # вся вселенная USDT: свечи тянутся хвостами, оценка — шардами в пуле процессов
+    # скан рынка по расписанию — фоновая полоса лимитера (наследуют свечи и потоки)
+    with metrics.timer("report_stage_seconds", stage="signals"), lane(BACKGROUND):
+        syms = await asyncio.to_thread(list_usdt_symbols, SCREEN_UNIVERSE_LIMIT)
+        return await shortlist_async(syms, 0.68, 7)
+
+def _busy(name: str, m: dict):
+    """Работа этапа с прошлого отчёта ещё идёт — второй раз не запускаем."""
+    m["stage_busy"][name] = m["stage_busy"].get(name, 0) + 1
+    return None, "прошлый прогон этапа ещё идёт"
+
+async def _stage(name: str, aw, deadline: float, m: dict):
+    """(результат, None) или (None, причина) — этап не дольше своего таймаута и остатка бюджета."""
+    timeout = max(0.0, min(STAGE_TIMEOUTS[name], deadline - time.monotonic()))
+    # этапы запущены заранее — время ожидания здесь и есть их хвост в отчёте
+    with metrics.timer("report_stage_wait_seconds", stage=name):
+        try:
+            return await asyncio.wait_for(aw, timeout), None
+        except asyncio.TimeoutError:
+            m["stage_timeouts"][name] = m["stage_timeouts"].get(name, 0) + 1
+            return None, "таймаут"
+        except Exception as e:
+            m["stage_errors"][name] = m["stage_errors"].get(name, 0) + 1
+            return None, f"ошибка {e}"
+
+async def send_hourly_report(chat_ids: list[int]):
+    # портфель и скан рынка считаются одновременно; каждая часть отчёта уходит
+    # в чаты, как только готова, — пока остальные этапы ещё работают.
+    # Этап, упавший или не уложившийся в бюджет, заменяется пометкой.
+    m = _metrics("hourly_report")
+    started = time.monotonic()
+    deadline = started + REPORT_BUDGET
+    fan = Fanout(chat_ids, bot.send_message)
+    portfolio = None if _stage_running("portfolio") else asyncio.create_task(_portfolio_stage())
+    signals = asyncio.create_task(_signals_stage())
+    point = None
+    notes = []
+    try:
+        if portfolio is None:
+            res, why = _busy("portfolio", m)
+        else:
+            res, why = await _stage("portfolio", portfolio, deadline, m)
+        text = None
+        if res is not None:
+            text, total_usdt, assets = res
+            point = asyncio.create_task(_record_point(total_usdt, assets, m))
+        if why:
+            notes.append(f"портфель: {why}")
+            fan.post("Ежечасный отчет", f"Портфель недоступен ({why})")
+        else:
+            fan.post("Ежечасный отчет", text)
+
+        strong, why = await _stage("signals", signals, deadline, m)
+        if why:
+            notes.append(f"сигналы: {why}")
+        elif strong:
+            _screened[:] = [x["symbol"] for x in strong]
+            best = "\n".join([f"{i+1}. {x['symbol']} score {x['score']:.2f} votes {x['votes']}/{x['total_tools']}" for i, x in enumerate(strong)])
+            fan.post("Сильные сигналы", best)
+
+        if _stage_running("ai"):
+            ai_text, why = _busy("ai", m)
+        elif text is not None or strong:
+            # обзор рынка для AI тянет 24ч-тикеры — тоже фон
+            with lane(BACKGROUND):
+                ai_text, why = await _stage("ai", _in_thread("ai", ai_market_review, text or "", strong or []), deadline, m)
+        else:
+            ai_text, why = None, "нет данных"
+        if why:
+            notes.append(f"AI обзор: {why}")
+        else:
+            fan.post("AI обзор", ai_text)
+
+        if notes:
+            m["partial"] += 1
+            fan.post("Отчет неполный: " + "; ".join(notes))
+    finally:
+        for t in (portfolio, signals):
+            if t is not None:
+                t.cancel()
+        if point is not None:
+            await point
+        await fan.close()
+        d = time.monotonic() - started
+        m["runs"] += 1
+        m["last_duration"] = round(d, 3)
+        m["max_duration"] = round(max(m["max_duration"], d), 3)
+        m["total_duration"] += d
+        metrics.observe("report_seconds", d)
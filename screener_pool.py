@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Оценка всей вселенной символов в пуле процессов.
+
+Свечи всех символов складываются в один блок shared memory — массив
+(символы, KEEP, 6), дополненный NaN, плюс длины. Символы режутся на шарды,
+каждый воркер подключается к блоку по имени (без копирования свечей через
+pickle), доливает индикаторы в переданные ему состояния, оценивает свой
+шард и возвращает свой top-k и новые состояния. Главный процесс сливает
+top-k шардов и хранит состояния до следующего прогона.
+
+    top = screener_pool.evaluate(arrays, states, 0.68, 7, now_ms, CANDLES.interval_ms)
+
+Число воркеров — SCREENER_WORKERS (по умолчанию число ядер);
+подобрать под машину: python -m bench.bench_screener.
+
+cancel (threading.Event) — прервать оценку: последовательный путь
+проверяет его между символами, параллельный — между шардами (ещё не
+начатые шарды снимаются с очереди, начатые дорабатывают в воркерах, но
+их результат уже никто не ждёт). Прерванная оценка бросает Cancelled.
+"""
+import heapq
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import indicators
+
+SCREENER_WORKERS = int(os.getenv("SCREENER_WORKERS", "0")) or (os.cpu_count() or 1)
+# меньше стольких символов пул не поднимаем — накладные расходы больше выигрыша
+PARALLEL_MIN_SYMBOLS = int(os.getenv("SCREENER_PARALLEL_MIN", "200"))
+SHARDS_PER_WORKER = 2
+CANCEL_POLL = 0.2  # как часто параллельный путь смотрит на cancel (сек)
+
+
+class Cancelled(RuntimeError):
+    pass
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False, cancel_futures=True)
+            # forkserver: воркеры не наследуют потоки и сокеты бота
+            method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context(method))
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def shutdown() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=True, cancel_futures=True)
+            _POOL = None
+
+
+# --- оценка шарда (выполняется и в воркере, и в главном процессе) ---------------------
+
+def _evaluate_rows(symbols: List[str], block: np.ndarray, lens: np.ndarray,
+                   states: Dict[str, Dict[str, Any]], min_score: float, limit: int, now_ms: float,
+                   interval_ms: float, cancel: Optional[threading.Event] = None
+                   ) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    out, new_states = [], {}
+    for i, sym in enumerate(symbols):
+        if cancel is not None and cancel.is_set():
+            raise Cancelled("оценка прервана")
+        arr = block[i, : lens[i]]
+        n = len(arr)
+        while n and arr[n - 1, 0] + interval_ms > now_ms:
+            n -= 1  # последняя свеча ещё не закрыта
+        closed = arr[:n]
+        st = new_states[sym] = indicators.fold(states.get(sym), closed)
+        res = indicators.evaluate(st, closed)
+        if res is not None and res["score"] >= min_score:
+            res["symbol"] = sym
+            out.append(res)
+    return heapq.nlargest(limit, out, key=lambda x: (x["score"], x["votes"])), new_states
+
+
+def _shard_worker(shm_name: str, shape: Tuple[int, int, int], lo: int, hi: int, symbols: List[str],
+                  lens: np.ndarray, states: Dict[str, Dict[str, Any]], min_score: float, limit: int,
+                  now_ms: float, interval_ms: float):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = None
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        return _evaluate_rows(symbols, block[lo:hi], lens, states, min_score, limit, now_ms, interval_ms)
+    finally:
+        block = None  # view на shm.buf должен умереть до close()
+        shm.close()
+
+
+def _pack(arrays: Dict[str, np.ndarray], shm: Optional[shared_memory.SharedMemory] = None):
+    symbols = list(arrays)
+    depth = max((len(a) for a in arrays.values()), default=0) or 1
+    shape = (len(symbols), depth, 6)
+    lens = np.array([len(arrays[s]) for s in symbols], dtype=np.int64)
+    if shm is None:
+        block = np.full(shape, np.nan)
+    else:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        block[:] = np.nan
+    for i, s in enumerate(symbols):
+        if lens[i]:
+            block[i, : lens[i]] = arrays[s]
+    return symbols, block, lens, shape
+
+
+def evaluate(arrays: Dict[str, np.ndarray], states: Dict[str, Dict[str, Any]], min_score: float,
+             limit: int, now_ms: float, interval_ms: float, workers: Optional[int] = None,
+             shards: Optional[int] = None, cancel: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+    """
+    Оценить все символы; states (symbol -> состояние indicators.fold) обновляется на месте.
+    Возвращает слитый top-limit по убыванию score.
+    """
+    workers = SCREENER_WORKERS if workers is None else max(1, workers)
+    if workers <= 1 or len(arrays) < PARALLEL_MIN_SYMBOLS:
+        symbols, block, lens, _ = _pack(arrays)
+        top, new_states = _evaluate_rows(symbols, block, lens, states, min_score, limit, now_ms, interval_ms,
+                                         cancel)
+        states.update(new_states)
+        return top
+
+    n = len(arrays)
+    shards = max(1, min(n, shards or workers * SHARDS_PER_WORKER))
+    depth = max((len(a) for a in arrays.values()), default=0) or 1
+    shm = shared_memory.SharedMemory(create=True, size=n * depth * 6 * 8)
+    block = None
+    try:
+        symbols, block, lens, shape = _pack(arrays, shm)
+        pool = _get_pool(workers)
+        bounds = np.linspace(0, n, shards + 1).astype(int)
+        futs = []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            if lo == hi:
+                continue
+            part = symbols[lo:hi]
+            futs.append(pool.submit(_shard_worker, shm.name, shape, int(lo), int(hi), part, lens[lo:hi],
+                                    {s: states[s] for s in part if s in states},
+                                    min_score, limit, now_ms, interval_ms))
+        tops: List[Dict[str, Any]] = []
+        pending = set(futs)
+        while pending:
+            done, pending = wait(pending, timeout=CANCEL_POLL if cancel is not None else None,
+                                 return_when=FIRST_COMPLETED)
+            for f in done:
+                top, new_states = f.result()
+                tops += top
+                states.update(new_states)
+            if pending and cancel is not None and cancel.is_set():
+                for f in pending:
+                    f.cancel()
+                raise Cancelled("оценка прервана")
+        return heapq.nlargest(limit, tops, key=lambda x: (x["score"], x["votes"]))
+    finally:
+        block = None
+        shm.close()
+        shm.unlink()
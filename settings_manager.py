@@ -1,7 +1,8 @@
 import os
-import json
 from typing import Dict, Any
 
+import json_store
+
 STORAGE_DIR = os.path.join(os.getcwd(), "storage")
 SETTINGS_PATH = os.path.join(STORAGE_DIR, "settings.json")
 
@@ -11,28 +12,24 @@ _DEFAULTS = {
     "watchlist": [],
 }
 
-def _ensure_dirs():
-    if not os.path.isdir(STORAGE_DIR):
-        os.makedirs(STORAGE_DIR, exist_ok=True)
+_DOC = json_store.doc(SETTINGS_PATH)
 
 def load_settings() -> Dict[str, Any]:
-    _ensure_dirs()
-    if not os.path.isfile(SETTINGS_PATH):
-        save_settings(_DEFAULTS.copy())
-        return _DEFAULTS.copy()
-    try:
-        with open(SETTINGS_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        # дополняем новыми ключами, если добавились
-        for k, v in _DEFAULTS.items():
-            data.setdefault(k, v)
-        return data
-    except Exception:
-        # если файл битый — перезапишем дефолтом
+    # читается из памяти; файл разбирается только при внешнем изменении
+    if not _DOC.exists() or _DOC.corrupt:
+        # нет файла или он битый — перезапишем дефолтом
         save_settings(_DEFAULTS.copy())
         return _DEFAULTS.copy()
+    data = _DOC.load()
+    # дополняем новыми ключами, если добавились
+    for k, v in _DEFAULTS.items():
+        data.setdefault(k, v)
+    return data
 
 def save_settings(data: Dict[str, Any]) -> None:
-    _ensure_dirs()
-    with open(SETTINGS_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    _DOC.save(data)
+
+def settings_version() -> int:
+    """Меняется при каждом изменении настроек — ключ для кэшей производных данных."""
+    _DOC.view()
+    return _DOC.version
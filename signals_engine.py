@@ -1,22 +1,84 @@
-from typing import List, Dict
+import asyncio
+import threading
+import time
 from decimal import Decimal
-import math
+from typing import Any, Callable, Dict, List, Optional
 
-# Пытаемся аккуратно подтянуть витрину рынка из клиента
+import numpy as np
+
+import metrics
+import screener_pool
+from candle_store import CANDLES, KLINES_CONCURRENCY
+from market_frame import TickerFrame
+from mexc_client import run_sync
+
+# Витрина рынка — общий кэш market_engine (REST или зеркало WebSocket-потока)
 try:
-    from mexc_client import get_24h_all
+    from market_engine import get_frame
 except Exception:
-    get_24h_all = None  # на всякий случай, чтобы не ронять импорт
+    get_frame = None  # на всякий случай, чтобы не ронять импорт
 
+# Скоринг считается сразу по всему рынку массивами, без цикла по строкам.
+# Функция скоринга: (frame, mask) -> массив скоров 0..1 длины len(frame);
+# строки вне mask не смотрятся. Новая эвристика — новая функция в реестре:
+#
+#     @register_scorer("my_idea")
+#     def _my_idea(fr, mask):
+#         return np.clip(fr["vola"] * 2, 0, 0.99)
+#
+#     scan_market_for_signals(scorer="my_idea")
+
+ScoreFn = Callable[[TickerFrame, np.ndarray], np.ndarray]
+SCORERS: Dict[str, ScoreFn] = {}
+
+MIN_QUOTE_VOLUME = 1_000_000.0  # ликвидность: от ~1e6 USDT за сутки
+MIN_MOVE_PCT = 5.0              # интересны и рост, и сильные движения
+
+
+def register_scorer(name: str):
+    def deco(fn: ScoreFn) -> ScoreFn:
+        SCORERS[name] = fn
+        return fn
+    return deco
+
+
+@register_scorer("momentum_volume")
+def _momentum_volume(fr: TickerFrame, mask: np.ndarray) -> np.ndarray:
+    # рост даёт +, объём даёт + (логарифмически), ограничиваем 0..0.99
+    vol_bonus = np.minimum(0.3, np.log10(np.maximum(fr["volq"], 0) + 1) / 10)
+    base = 0.5 + fr["pct"] / 100 + vol_bonus
+    return np.clip(base, 0.0, 0.99)
+
+
+def signal_mask(fr: TickerFrame) -> np.ndarray:
+    """Базовый отбор: USDT-пары, есть цена, ликвидность и сильное движение."""
+    m = fr.mask(quotes=("USDT",), min_volq=MIN_QUOTE_VOLUME, min_abs_pct=MIN_MOVE_PCT)
+    m &= fr["last"] > 0
+    return m
 
-def _to_dec(x, default="0"):
-    try:
-        return Decimal(str(x))
-    except Exception:
-        return Decimal(default)
 
+def _num(x: float) -> str:
+    # как прежний Decimal(str(...)): без хвостов float (6.300000000000001) и без экспоненты
+    return format(Decimal(f"{x:.12g}"), "f")
 
-def scan_market_for_signals() -> List[Dict]:
+
+def score_frame(fr: TickerFrame, scorer: str = "momentum_volume", limit: int = 10) -> List[Dict]:
+    m = signal_mask(fr)
+    if not m.any():
+        return []
+    scores = np.round(SCORERS[scorer](fr, m), 3)
+    ideas = []
+    for i in fr.top(scores, limit, m):
+        r = fr.row(i)
+        ideas.append({
+            "symbol": r["symbol"],
+            "score": float(scores[i]),
+            "reason": f"Δ {_num(r['pct'])}% | V {_num(r['volq'])} | P {_num(r['last'])}"
+        })
+    return ideas
+
+
+def scan_market_for_signals(scorer: str = "momentum_volume", limit: int = 10) -> List[Dict]:
     """
     Возвращает список идей вида:
     {
@@ -27,56 +89,63 @@ def scan_market_for_signals() -> List[Dict]:
 
     Логика простая и безопасная:
     - Берём только USDT-пары
-    - Считаем грубый скор на основе роста за 24ч и объёма
+    - Считаем грубый скор на основе роста за 24ч и объёма (см. SCORERS)
     - В случае ошибки возвращаем []
     """
     try:
-        if get_24h_all is None:
+        if get_frame is None:
             return []
+        # Сортируем по score убыв. и вернём топ-limit
+        return score_frame(get_frame(), scorer, limit)
 
-        data = get_24h_all()
-        if not isinstance(data, list):
-            return []
+    except Exception as e:
+        # Никогда не роняем бота — просто пусто (но считаем)
+        metrics.swallowed("signals_engine.scan_market_for_signals", e)
+        return []
 
-        ideas: List[Dict] = []
-        for t in data:
-            sym = str(t.get("symbol", ""))
-            if not sym.endswith("USDT"):
-                continue
 
-            ch_pct = _to_dec(t.get("priceChangePercent", "0"))
-            qvol = _to_dec(t.get("quoteVolume", "0"))
-            last = _to_dec(t.get("lastPrice", "0"))
+# ===== Шортлист по свечам (индикаторы с голосованием) =====
 
-            # простые эвристики отбора
-            if qvol <= 0 or last <= 0:
-                continue
+_IND_STATE: Dict[str, Dict[str, Any]] = {}  # symbol -> состояние indicators.fold
+_IND_LOCK = threading.Lock()
 
-            # фильтр по ликвидности (примерно от 1e6 USDT за сутки)
-            liquid_ok = qvol >= Decimal("1000000")
 
-            # интересны и рост, и сильные движения
-            strong_move = abs(ch_pct) >= Decimal("5")
+async def shortlist_async(symbols: List[str], min_score: float = 0.68, limit: int = 7,
+                          workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Свечи всех символов обновляются параллельно (только новые хвосты), затем
+    символы оцениваются — при большой вселенной шардами в пуле процессов
+    (screener_pool). Результат — по убыванию score:
+    [{"symbol", "score", "votes", "total_tools", "tools", "price"}, ...]
 
-            if not (liquid_ok and strong_move):
-                continue
+    Отмена (таймаут этапа) доходит и до оценки в потоке: она прерывается на
+    границе символа/шарда и отпускает _IND_LOCK, следующий прогон не ждёт.
+    """
+    sem = asyncio.Semaphore(KLINES_CONCURRENCY)
 
-            # скор: рост даёт +, объём даёт + (логарифмически), ограничиваем 0..0.99
-            vol_bonus = min(0.3, Decimal(str(math.log10(float(qvol) + 1))) / Decimal("10"))
-            base = Decimal("0.5") + (ch_pct / Decimal("100")) + vol_bonus
-            score = float(max(Decimal("0.0"), min(Decimal("0.99"), base)))
+    async def one(sym: str):
+        try:
+            return await CANDLES.update(sym, sem)
+        except Exception:
+            return CANDLES.get(sym)  # биржа не ответила — оценим по кэшу
 
-            ideas.append({
-                "symbol": sym,
-                "score": round(score, 3),
-                "reason": f"Δ {ch_pct}% | V {qvol} | P {last}"
-            })
+    syms = [s.upper() for s in symbols]
+    arrays = dict(zip(syms, await asyncio.gather(*(one(s) for s in syms))))
 
-        # Сортируем по score убыв.
-        ideas.sort(key=lambda x: x["score"], reverse=True)
-        # Вернём топ-10
-        return ideas[:10]
+    cancel = threading.Event()
 
-    except Exception:
-        # Никогда не роняем бота — просто пусто
-        return []
+    def _evaluate():
+        with _IND_LOCK:
+            return screener_pool.evaluate(arrays, _IND_STATE, min_score, limit, time.time() * 1000,
+                                          CANDLES.interval_ms, workers, cancel=cancel)
+
+    try:
+        return await asyncio.to_thread(_evaluate)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
+
+
+def shortlist(symbols: List[str], min_score: float = 0.68, limit: int = 7) -> List[Dict[str, Any]]:
+    """Синхронная обёртка для планировщика (вызывается из потока)."""
+    return run_sync(shortlist_async(symbols, min_score, limit))
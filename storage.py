@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 import os
-import json
 from decimal import Decimal
-from typing import Dict
+from typing import Dict, List
+
+import json_store
 
 # Здесь максимально простые функции-заглушки.
 # Если у тебя уже есть реальные реализации — можешь: либо
@@ -33,57 +34,55 @@ def load_balances() -> Dict[str, str]:
 def load_prices(balances: Dict[str, str]) -> Dict[str, str]:
     """
     Верни цены для <ASSET>USDT. Для USDT цена=1.
-    Вставь свою логику обращения к mexc_client / кэшу.
+    Все цены берутся одним запросом (mexc_client.get_prices_bulk).
     """
     out = {}
+    symbols = []
     for asset in balances.keys():
         if asset.upper() == "USDT":
             out["USDT"] = "1"
         else:
-            symbol = f"{asset.upper()}USDT"
-            p = _get_price_safe(symbol)
-            if p is not None:
-                out[symbol] = str(p)
+            symbols.append(f"{asset.upper()}USDT")
+    for symbol, p in _get_prices_safe(symbols).items():
+        out[symbol] = str(p)
     return out
 
-def _get_price_safe(symbol: str) -> Decimal | None:
+def _get_prices_safe(symbols: List[str]) -> Dict[str, Decimal]:
+    if not symbols:
+        return {}
     try:
         import mexc_client
-        if hasattr(mexc_client, "get_price"):
-            p = mexc_client.get_price(symbol)
-            return Decimal(str(p))
-        if hasattr(mexc_client, "get_prices_bulk"):
-            prices = mexc_client.get_prices_bulk([symbol])
-            p = prices.get(symbol)
-            if p is not None:
-                return Decimal(str(p))
+        prices = mexc_client.get_prices_bulk(symbols)
+        return {s: Decimal(str(p)) for s, p in prices.items() if s in symbols}
     except Exception:
-        pass
-    return None
+        return {}
 
 # ---------- РУЧНЫЕ ВХОДЫ ----------
+_MANUAL_DOC = json_store.doc(ENTRIES_MANUAL_JSON)
+
+def _normalize_manual(data) -> Dict[str, str]:
+    return {k.upper(): str(v) for k, v in data.items() if v not in (None, "")}
+
 def load_manual_entries() -> Dict[str, str]:
-    if not os.path.exists(ENTRIES_MANUAL_JSON):
-        return {}
-    try:
-        with open(ENTRIES_MANUAL_JSON, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            # нормализуем ключи
-            return {k.upper(): str(v) for k, v in data.items() if v not in (None, "")}
-    except Exception:
+    data = _MANUAL_DOC.view()
+    if not isinstance(data, dict):
         return {}
+    # нормализуем ключи
+    return _normalize_manual(data)
 
 def save_manual_entry(symbol: str, price: str | None):
-    data = load_manual_entries()
     symbol = symbol.upper()
-    if price is None:
-        # удалить
-        if symbol in data:
-            del data[symbol]
-    else:
-        data[symbol] = str(price)
-    with open(ENTRIES_MANUAL_JSON, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def _apply(data):
+        data = _normalize_manual(data if isinstance(data, dict) else {})
+        if price is None:
+            # удалить
+            data.pop(symbol, None)
+        else:
+            data[symbol] = str(price)
+        return data
+
+    _MANUAL_DOC.update(_apply)
 
 # ---------- ВХОДЫ ИЗ ИСТОРИИ ----------
 def derive_entries_from_logs(balances: Dict[str, str]) -> Dict[str, str]:
@@ -91,45 +90,28 @@ def derive_entries_from_logs(balances: Dict[str, str]) -> Dict[str, str]:
     Средневзвешенный вход по каждому символу из orders_log.json
     Берём только BUY и считаем по формуле:
       avg_price = sum(qty*price) / sum(qty)
-    Если лог пустой/нет данных — вернётся {}.
+    Суммы считает trade_store (SQLite-зеркало лога, файл разбирается
+    только когда изменился). Если лог пустой/нет данных — вернётся {}.
     """
     if not os.path.exists(ORDERS_LOG):
         return {}
 
     try:
-        with open(ORDERS_LOG, "r", encoding="utf-8") as f:
-            orders = json.load(f)
+        import trade_store
+        totals = trade_store.logged_buy_totals(ORDERS_LOG)
     except Exception:
         return {}
 
-    # Считаем по активным балансам
-    entries: Dict[str, Decimal] = {}
-    qty_sum: Dict[str, Decimal] = {}
-
-    for o in orders:
+    out: Dict[str, str] = {}
+    for symbol, (val, qty) in totals.items():
+        # если у пользователя нет этого актива сейчас — пропускаем
+        # (иначе будет «вход» на нулевую позицию)
+        asset = symbol.replace("USDT", "")
         try:
-            if str(o.get("side", "")).upper() != "BUY":
-                continue
-            symbol = str(o.get("symbol", "")).upper()
-            qty = Decimal(str(o.get("quantity")))
-            price = Decimal(str(o.get("price")))
-            if qty <= 0 or price <= 0:
-                continue
-
-            # если у пользователя нет этого актива сейчас — можно пропустить, но не обязательно
-            asset = symbol.replace("USDT", "")
             if balances and Decimal(str(balances.get(asset, "0"))) <= 0:
-                # нет позиции — пропускаем (иначе будет «вход» на нулевую позицию)
                 continue
-
-            entries[symbol] = entries.get(symbol, Decimal("0")) + qty * price
-            qty_sum[symbol] = qty_sum.get(symbol, Decimal("0")) + qty
         except Exception:
             continue
-
-    out: Dict[str, str] = {}
-    for symbol, val in entries.items():
-        if qty_sum.get(symbol, Decimal("0")) > 0:
-            avg = val / qty_sum[symbol]
-            out[symbol] = str(avg)
+        if qty and qty > 0:
+            out[symbol] = str(val / qty)
     return out
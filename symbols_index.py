@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Индекс метаданных символов из /api/v3/exchangeInfo.
+
+Загружается один раз (сначала с диска — тёплый старт, затем из API),
+обновляется планировщиком через refresh() и отвечает за O(1):
+    get("BTCUSDT") -> {"symbol", "status", "base", "quote",
+                       "tick", "step", "min_notional"}
+Символ, которого нет в индексе, догружается точечным запросом
+exchangeInfo?symbol=X и добавляется в индекс; если биржа его не знает,
+промах помнится MISS_TTL секунд — повторные вопросы не ходят в сеть.
+
+Индекс с диска старше MAX_AGE при первом обращении обновляется из API
+(фильтры tick/step могли смениться, пока бот не работал); если биржа
+недоступна — работаем со старым, пока не сработает refresh().
+
+Из event loop — aget()/aget_filters(): попадание в индекс отвечается на
+месте, без потоков; промах догружается async-запросом через exchange_client.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+STORAGE_DIR = "storage"
+INDEX_PATH = os.path.join(STORAGE_DIR, "symbols_index.json")
+ACTIVE_STATUSES = ("ENABLED", "TRADING", "OPEN")
+# индекс с диска старше этого (сек) при старте обновляется из API
+MAX_AGE = float(os.getenv("SYMBOLS_MAX_AGE_SEC", "1800"))
+# сколько помнить, что символа на бирже нет (сек)
+MISS_TTL = float(os.getenv("SYMBOLS_MISS_TTL_SEC", "60"))
+
+_LOCK = threading.RLock()
+_index: Dict[str, Dict[str, Any]] = {}
+_updated_at = 0.0
+_loaded = False
+_misses: Dict[str, float] = {}  # символ -> monotonic-время промаха
+
+
+def _parse_symbol(s: Dict[str, Any]) -> Dict[str, Any]:
+    price_tick = 0.0
+    qty_step = 0.0
+    min_notional = 0.0
+    for f in s.get("filters", []):
+        if f.get("filterType") == "PRICE_FILTER":
+            price_tick = float(f.get("tickSize", "0"))
+        elif f.get("filterType") == "LOT_SIZE":
+            qty_step = float(f.get("stepSize", "0"))
+        elif f.get("filterType") == "NOTIONAL":
+            min_notional = float(f.get("minNotional", "0"))
+    # подстрахуемся, если что-то не пришло
+    if price_tick == 0:
+        price_tick = 0.00000001
+    if qty_step == 0:
+        qty_step = 0.00000001
+    return {
+        "symbol": str(s.get("symbol", "")).upper(),
+        "status": str(s.get("status", "")).upper(),
+        "base": str(s.get("baseAsset", "")).upper(),
+        "quote": str(s.get("quoteAsset", "")).upper(),
+        "tick": price_tick,
+        "step": qty_step,
+        "min_notional": min_notional,
+    }
+
+
+def _save() -> None:
+    os.makedirs(STORAGE_DIR, exist_ok=True)
+    # уникальный tmp: индекс могут сохранять несколько процессов сразу
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(INDEX_PATH) + ".", suffix=".tmp", dir=STORAGE_DIR)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"updated_at": _updated_at, "symbols": _index}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, INDEX_PATH)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _load_from_disk() -> bool:
+    global _index, _updated_at
+    try:
+        with open(INDEX_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        _index = dict(data.get("symbols") or {})
+        _updated_at = float(data.get("updated_at") or 0.0)
+        return bool(_index)
+    except Exception:
+        return False
+
+
+def _ensure_loaded() -> None:
+    global _loaded
+    if _loaded:
+        return
+    with _LOCK:
+        if _loaded:
+            return
+        if not _load_from_disk():
+            refresh()
+        elif time.time() - _updated_at > MAX_AGE:
+            try:
+                refresh()
+            except Exception:
+                pass  # биржа недоступна — лучше старый индекс, чем никакого
+        _loaded = True
+
+
+def refresh() -> int:
+    """
+    Полное обновление из exchangeInfo (вызывается планировщиком).
+    Возвращает число символов, которые появились, исчезли или поменяли
+    фильтры/статус с прошлого обновления.
+    """
+    global _index, _updated_at, _loaded
+    from mexc_client import get_exchange_info
+    info = get_exchange_info()
+    fresh = {}
+    for s in info.get("symbols", []):
+        meta = _parse_symbol(s)
+        if meta["symbol"]:
+            fresh[meta["symbol"]] = meta
+
+    with _LOCK:
+        if not _loaded:
+            _load_from_disk()
+        changed = sum(1 for k, v in fresh.items() if _index.get(k) != v)
+        changed += sum(1 for k in _index if k not in fresh)
+        _index = fresh
+        _updated_at = time.time()
+        _misses.clear()  # новые листинги
+        _save()
+        _loaded = True
+    return changed
+
+
+def _known(sym: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """(ответ есть без сети, meta): символ в индексе или недавний промах."""
+    meta = _index.get(sym)
+    if meta is not None:
+        return True, meta
+    missed = _misses.get(sym)
+    return missed is not None and time.monotonic() - missed < MISS_TTL, None
+
+
+def _lookup_failed(sym: str, e: Exception) -> None:
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if status is not None and 400 <= status < 500 and status not in (418, 429):
+        _misses[sym] = time.monotonic()  # "Invalid symbol" — биржа такого не знает
+
+
+def _add_fetched(sym: str, symbols: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Ответ exchangeInfo?symbol=sym — в индекс (или в промахи)."""
+    global _index
+    if not symbols or str(symbols[0].get("symbol", "")).upper() != sym:
+        _misses[sym] = time.monotonic()
+        return None
+    meta = _parse_symbol(symbols[0])
+    with _LOCK:
+        # копия, а не правка на месте: list_symbols может итерировать в другом потоке
+        index = dict(_index)
+        index[meta["symbol"]] = meta
+        _index = index
+        _misses.pop(sym, None)
+        _save()
+    return meta
+
+
+def get(symbol: str) -> Optional[Dict[str, Any]]:
+    _ensure_loaded()
+    sym = symbol.upper()
+    known, meta = _known(sym)
+    if known:
+        return meta
+
+    # точечная догрузка нового символа
+    try:
+        from mexc_client import get_exchange_info
+        symbols = get_exchange_info(sym).get("symbols", [])
+    except Exception as e:
+        _lookup_failed(sym, e)
+        return None
+    return _add_fetched(sym, symbols)
+
+
+async def aget(symbol: str) -> Optional[Dict[str, Any]]:
+    """get() для event loop: без потоков, пока символ в индексе."""
+    if not _loaded:
+        await asyncio.to_thread(_ensure_loaded)  # один раз за процесс
+    sym = symbol.upper()
+    known, meta = _known(sym)
+    if known:
+        return meta
+    try:
+        from exchange_client import CLIENT
+        info = await CLIENT.arequest("GET", "/api/v3/exchangeInfo", {"symbol": sym}, source="symbols_index")
+        symbols = info.get("symbols", [])
+    except Exception as e:
+        _lookup_failed(sym, e)
+        return None
+    return _add_fetched(sym, symbols)
+
+
+def get_filters(symbol: str) -> Optional[Tuple[float, float, float]]:
+    """(price_tick, qty_step, min_notional) или None, если символа нет."""
+    meta = get(symbol)
+    if meta is None:
+        return None
+    return meta["tick"], meta["step"], meta["min_notional"]
+
+
+async def aget_filters(symbol: str) -> Optional[Tuple[float, float, float]]:
+    meta = await aget(symbol)
+    if meta is None:
+        return None
+    return meta["tick"], meta["step"], meta["min_notional"]
+
+
+def list_symbols(quote: str = "USDT", statuses: Tuple[str, ...] = ACTIVE_STATUSES) -> List[str]:
+    _ensure_loaded()
+    quote = quote.upper()
+    return [s for s, m in _index.items() if m["quote"] == quote and m["status"] in statuses]
+
+
+def age_seconds() -> float:
+    _ensure_loaded()
+    return time.time() - _updated_at if _updated_at else float("inf")
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+Общие настройки тестов: корень репозитория в sys.path (модули плоские),
+каждый тест — в своей временной папке (storage/ и data/ относительные).
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def _tmp_cwd(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import candle_store
+from candle_store import INTERVAL_MS, CandleStore
+
+STEP = INTERVAL_MS["60m"]
+NOW = 1_000 * STEP + STEP // 2  # середина свечи 1000
+
+
+class Exchange:
+    """get_klines по вечной сетке свечей; запоминает запросы."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def get_klines(self, symbol, interval, start_ms=None, limit=500):
+        self.calls.append((symbol, interval, start_ms, limit))
+        last = NOW - NOW % STEP
+        first = start_ms if start_ms is not None else last - (limit - 1) * STEP
+        out = []
+        t = first
+        while t <= last and len(out) < limit:
+            c = 100.0 + t / STEP
+            out.append([t, str(c), str(c + 1), str(c - 1), str(c), "10"])
+            t += STEP
+        return out
+
+
+@pytest.fixture
+def exchange(monkeypatch):
+    ex = Exchange()
+    monkeypatch.setattr(candle_store, "get_klines", ex.get_klines)
+    monkeypatch.setattr(candle_store, "time", SimpleNamespace(time=lambda: NOW / 1000))
+    return ex
+
+
+def _store(tmp_path, keep=50):
+    return CandleStore(interval="60m", keep=keep, root=str(tmp_path / "candles"))
+
+
+def test_empty_cache_fetches_full_depth(tmp_path, exchange):
+    store = _store(tmp_path)
+    arr = asyncio.run(store.update("btcusdt"))
+    assert exchange.calls == [("BTCUSDT", "60m", None, 50)]
+    assert len(arr) == 50 and arr[-1, 0] == 1000 * STEP
+    assert store.stats["cold"] == 1
+
+
+def test_update_asks_only_for_the_tail(tmp_path, exchange):
+    store = _store(tmp_path)
+    full = asyncio.run(Exchange().get_klines("BTCUSDT", "60m", None, 50))
+    store.merge("BTCUSDT", candle_store._to_array(full[:-3]))  # кэш отстал на 3 свечи
+    last = 997 * STEP
+    arr = asyncio.run(store.update("BTCUSDT"))
+    missing = (NOW - last) // STEP + 1
+    assert exchange.calls == [("BTCUSDT", "60m", last, missing + 1)]
+    assert store.stats["cold"] == 0
+    # результат — тот же, что при полной выгрузке; последняя свеча из кэша заменена
+    np.testing.assert_array_equal(arr, candle_store._to_array(full))
+    # и он же лежит на диске
+    np.testing.assert_array_equal(np.load(store._path("BTCUSDT")), arr)
+
+
+def test_stale_cache_falls_back_to_cold_fetch(tmp_path, exchange):
+    store = _store(tmp_path, keep=50)
+    old = [[t * STEP, "1", "1", "1", "1", "1"] for t in range(900, 940)]  # отстал на 60 > keep свечей
+    store.merge("BTCUSDT", candle_store._to_array(old))
+    arr = asyncio.run(store.update("BTCUSDT"))
+    assert exchange.calls == [("BTCUSDT", "60m", None, 50)]
+    assert store.stats["cold"] == 1
+    assert arr[0, 0] == 951 * STEP  # старые свечи не склеены с новыми
+    assert len(arr) == 50
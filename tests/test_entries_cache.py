@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+from decimal import Decimal
+
+import pytest
+
+import entries_cache
+import storage
+import trade_store
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(trade_store, "DB_PATH", str(tmp_path / "data" / "trades.sqlite3"))
+    monkeypatch.setattr(entries_cache, "_LOCAL_ENTRIES", {})
+    return tmp_path
+
+
+class FakeTrades:
+    """Биржа со списком сделок; отдаёт окно [start, end] не больше limit штук."""
+
+    def __init__(self):
+        self.trades = []
+        self.calls = 0
+
+    def add(self, tid, ts, qty, price, buy=True):
+        self.trades.append({"id": tid, "time": ts, "qty": str(qty), "price": str(price),
+                            "quoteQty": str(qty * price), "isBuyer": buy, "commission": "0",
+                            "commissionAsset": "BTC"})
+
+    async def __call__(self, sym, start_ms=None, end_ms=None, limit=1000):
+        self.calls += 1
+        win = [t for t in self.trades if start_ms <= t["time"] <= end_ms]
+        return sorted(win, key=lambda t: t["time"])[:limit]
+
+
+@pytest.fixture
+def exchange(monkeypatch):
+    ex = FakeTrades()
+    monkeypatch.setattr(entries_cache, "get_my_trades", ex)
+    return ex
+
+
+def test_incremental_cursor_skips_counted_trades_on_the_same_millisecond(store, exchange):
+    now = int(time.time() * 1000)
+    exchange.add(1, now - 5000, 1.0, 100.0)
+    exchange.add(2, now - 1000, 1.0, 200.0)
+    r = entries_cache.compute_avg_entries(["BTCUSDT"])["BTCUSDT"]
+    assert r["avg_entry"] == pytest.approx(150.0)
+    assert r["last_ts"] == now - 1000 and r["last_ids"] == ["2"]
+
+    # ещё одна сделка в ту же миллисекунду, что и курсор, и одна позже
+    exchange.add(3, now - 1000, 2.0, 300.0)
+    exchange.add(4, now - 500, 0.0, 1.0)
+    r = entries_cache.compute_avg_entries(["BTCUSDT"])["BTCUSDT"]
+    assert r["qty_seen"] == pytest.approx(4.0)
+    assert r["avg_entry"] == pytest.approx((100 + 200 + 600) / 4)
+
+    # повтор без новых сделок ничего не меняет
+    again = entries_cache.compute_avg_entries(["BTCUSDT"])["BTCUSDT"]
+    assert again["avg_entry"] == pytest.approx(r["avg_entry"])
+
+
+def test_full_page_is_followed_from_the_last_trade_time(store, exchange, monkeypatch):
+    monkeypatch.setattr(entries_cache, "TRADES_PAGE_LIMIT", 2)
+    now = int(time.time() * 1000)
+    for i in range(5):
+        exchange.add(i, now - 10_000 + i * 1000, 1.0, 10.0 * (i + 1))
+    r = entries_cache.compute_avg_entries(["BTCUSDT"], full=True)["BTCUSDT"]
+    assert r["qty_seen"] == pytest.approx(5.0)
+    assert r["avg_entry"] == pytest.approx(30.0)
+
+
+def test_local_entries_cached_until_cursor_changes(store, monkeypatch):
+    loads = []
+    real = trade_store.load_trades
+    monkeypatch.setattr(trade_store, "load_trades", lambda sym, **kw: loads.append(sym) or real(sym, **kw))
+
+    assert entries_cache.compute_avg_entries_local(["XUSDT"])["XUSDT"]["avg_entry"] is None
+    assert entries_cache.compute_avg_entries_local(["XUSDT"])["XUSDT"]["avg_entry"] is None
+    assert loads == ["XUSDT"]
+
+    # новые сделки приходят вместе с курсором в автокэше — кэш сбрасывается
+    trade_store.upsert_trades("XUSDT", [{"id": 1, "time": 1, "qty": "2", "price": "5", "isBuyer": True}])
+    entries_cache.save_auto_entries({"XUSDT": {"last_ts": 1, "last_ids": ["1"]}})
+    assert entries_cache.compute_avg_entries_local(["XUSDT"])["XUSDT"]["avg_entry"] == pytest.approx(5.0)
+    assert loads == ["XUSDT", "XUSDT"]
+
+
+def test_logged_entries_are_summed_in_decimal(store, tmp_path, monkeypatch):
+    log = tmp_path / "orders_log.json"
+    log.write_text(json.dumps([
+        {"symbol": "ABCUSDT", "side": "BUY", "quantity": "0.1", "price": "0.3"},
+        {"symbol": "ABCUSDT", "side": "BUY", "quantity": "0.2", "price": "0.3"},
+        {"symbol": "ABCUSDT", "side": "SELL", "quantity": "1", "price": "9"},
+        {"symbol": "ABCUSDT", "side": "BUY", "quantity": "bad", "price": "1"},
+    ]))
+    monkeypatch.setattr(storage, "ORDERS_LOG", str(log))
+    assert storage.derive_entries_from_logs({"ABC": "1"}) == {"ABCUSDT": "0.3"}
+    totals = trade_store.logged_buy_totals(str(log))
+    assert totals["ABCUSDT"] == (Decimal("0.09"), Decimal("0.3"))
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import hashlib
+import hmac
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+import entries_cache
+import exchange_client
+import mexc_client
+from exchange_client import ExchangeClient, MexcError
+
+SECRET = "s3cret"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+
+class SlowLimiter:
+    """Лимитер, который «ждёт» wait секунд по фальшивым часам и пишет порядок вызовов."""
+
+    def __init__(self, clock, wait):
+        self.clock, self.wait, self.log = clock, wait, []
+
+    def acquire_sync(self, weight=1, priority=None):
+        self.log.append(("acquire", weight))
+        self.clock.now += self.wait
+
+    async def acquire(self, weight=1, priority=None):
+        self.acquire_sync(weight, priority)
+
+    def on_response(self, status, headers=None):
+        self.log.append(("response", status))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(exchange_client, "time", c)
+    return c
+
+
+def _verify(request):
+    """Подпись проверяем как биржа: по сырой query до &signature=."""
+    raw = request.url.query.decode()
+    payload, _, sig = raw.rpartition("&signature=")
+    assert sig == hmac.new(SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
+    return {k: v[0] for k, v in parse_qs(payload).items()}
+
+
+def _client(handler, limiter):
+    cli = ExchangeClient(base_url="https://mexc.test", api_key="key", api_secret=SECRET, limiter=limiter)
+    transport = httpx.MockTransport(handler)
+    cli._sync_client = httpx.Client(base_url=cli.base_url, transport=transport)
+    return cli, transport
+
+
+def test_sent_query_is_exactly_the_signed_one(clock):
+    sent = []
+
+    def handler(request):
+        sent.append((request.headers["X-MEXC-APIKEY"], _verify(request)))
+        return httpx.Response(200, json={})
+    cli, _ = _client(handler, SlowLimiter(clock, 0))
+    cli.request("POST", "/api/v3/order", {"symbol": "BTCUSDT", "side": "BUY", "type": "MARKET",
+                                          "quoteOrderQty": "25.5", "newClientOrderId": "a b/c+d"}, signed=True)
+    key, params = sent[0]
+    assert key == "key"
+    assert params["newClientOrderId"] == "a b/c+d"
+    assert params["recvWindow"] == str(exchange_client.RECV_WINDOW)
+    # подпись та же, что отдаёт sign() при тех же параметрах
+    q, _ = cli.sign({"symbol": "BTCUSDT", "timestamp": 1})
+    assert q.startswith("recvWindow=5000&symbol=BTCUSDT&timestamp=1&signature=")
+
+
+def test_signs_after_limiter_wait_sync(clock):
+    sent = []
+    limiter = SlowLimiter(clock, wait=30.0)  # дольше recvWindow
+
+    def handler(request):
+        limiter.log.append(("send", None))
+        sent.append(_verify(request))
+        return httpx.Response(200, json={})
+    cli, _ = _client(handler, limiter)
+    cli.request("GET", "/api/v3/account", {}, signed=True)
+    assert [e[0] for e in limiter.log] == ["acquire", "send", "response"]
+    assert int(sent[0]["timestamp"]) == int(clock.now * 1000)
+
+
+def test_signs_after_limiter_wait_async(clock):
+    sent = []
+    limiter = SlowLimiter(clock, wait=30.0)
+
+    def handler(request):
+        sent.append(_verify(request))
+        return httpx.Response(200, json={})
+    cli, transport = _client(handler, limiter)
+
+    async def run():
+        cli._client = httpx.AsyncClient(base_url=cli.base_url, transport=transport)
+        cli._client_loop = asyncio.get_running_loop()
+        await cli.arequest("GET", "/api/v3/account", {}, signed=True)
+        await cli.close_async()
+    asyncio.run(run())
+    assert int(sent[0]["timestamp"]) == int(clock.now * 1000)
+
+
+def test_missing_keys_fail_before_taking_weight(clock):
+    limiter = SlowLimiter(clock, 0)
+    cli = ExchangeClient(base_url="https://mexc.test", api_key="", api_secret="", limiter=limiter)
+    with pytest.raises(MexcError):
+        cli.request("GET", "/api/v3/account", {}, signed=True)
+    assert limiter.log == []
+
+
+def test_trades_retry_is_signed_again(clock, monkeypatch):
+    sent = []
+    limiter = SlowLimiter(clock, wait=2.0)
+
+    def handler(request):
+        sent.append(_verify(request))
+        if len(sent) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"}, json={"code": -1003})
+        return httpx.Response(200, json=[{"id": 1, "time": 5}])
+    cli, transport = _client(handler, limiter)
+    monkeypatch.setattr(mexc_client, "CLIENT", cli)
+
+    async def run():
+        cli._client = httpx.AsyncClient(base_url=cli.base_url, transport=transport)
+        cli._client_loop = asyncio.get_running_loop()
+        page = await entries_cache._fetch_page("BTCUSDT", 0, 10, asyncio.Semaphore(1))
+        await cli.close_async()
+        return page
+    assert asyncio.run(run()) == [{"id": 1, "time": 5}]
+    assert [e[0] for e in limiter.log] == ["acquire", "response", "acquire", "response"]
+    first, second = (int(p["timestamp"]) for p in sent)
+    assert second - first == 2000
+    assert second == int(clock.now * 1000)
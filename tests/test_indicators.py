@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import indicators
+from candle_store import H, INTERVAL_MS, L, T
+
+STEP = INTERVAL_MS["60m"]
+
+
+def _candles(n, seed=3):
+    rnd = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rnd.normal(0, 1, n))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) + rnd.uniform(0, 1, n)
+    low = np.minimum(open_, close) - rnd.uniform(0, 1, n)
+    vol = rnd.uniform(100, 1000, n)
+    t = np.arange(n, dtype=np.float64) * STEP
+    return np.column_stack([t, open_, high, low, close, vol])
+
+
+def _same(a, b):
+    assert a.keys() == b.keys()
+    for k in a:
+        assert a[k] == pytest.approx(b[k], rel=1e-12), k
+
+
+def test_incremental_fold_matches_full_fold():
+    arr = _candles(300)
+    full = indicators.fold(None, arr)
+    st = indicators.fold(None, arr[:120])
+    for end in (121, 122, 180, 180, 299, 300):  # по одной, пачкой и без новых свечей
+        st = indicators.fold(st, arr[:end])
+    _same(st, full)
+    assert st["n"] == 300
+
+
+def test_fold_over_sliding_window_keeps_full_history():
+    # кэш свечей хранит только хвост keep=100; состояние помнит всю историю
+    arr = _candles(250)
+    st = None
+    for end in range(100, 251, 7):
+        st = indicators.fold(st, arr[max(0, end - 100):end])
+    st = indicators.fold(st, arr[150:250])
+    _same(st, indicators.fold(None, arr))
+
+
+def test_fold_restarts_when_cache_begins_after_state():
+    arr = _candles(200)
+    old = indicators.fold(None, arr[:50])
+    # символ перевыгружен с нуля: кэш начинается позже последней учтённой свечи
+    st = indicators.fold(old, arr[80:200])
+    _same(st, indicators.fold(None, arr[80:200]))
+
+
+def test_first_candle_seeds_state():
+    arr = _candles(1)
+    st = indicators.fold(None, arr)
+    assert st["ema_fast"] == st["ema_slow"] == arr[0, 4]
+    assert st["atr"] == pytest.approx(arr[0, H] - arr[0, L])
+    assert st["t"] == arr[0, T]
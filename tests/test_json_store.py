@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import json_store
+from json_store import JsonDoc, file_lock
+
+
+def _external_write(path, data):
+    """Запись «другого процесса»: мимо JsonDoc, с гарантированно новым mtime."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_pending_updates_replayed_over_external_change(tmp_path):
+    path = str(tmp_path / "s.json")
+    d = JsonDoc(path, flush_delay=60)
+    d.update(lambda x: x.update(a=1))
+    d.update(lambda x: x.update(n=x.get("n", 0) + 1))
+    _external_write(path, {"b": 2, "n": 10})  # второй писатель между update и flush
+    d.flush()
+    assert _read(path) == {"b": 2, "n": 11, "a": 1}
+    assert d.view() == {"b": 2, "n": 11, "a": 1}
+
+
+def test_updates_within_delay_coalesce_into_one_write(tmp_path, monkeypatch):
+    path = str(tmp_path / "s.json")
+    d = JsonDoc(path, flush_delay=0.05)
+    writes = []
+    orig = JsonDoc._write
+    monkeypatch.setattr(JsonDoc, "_write", lambda self: (writes.append(1), orig(self)))
+    for i in range(5):
+        d.update(lambda x, i=i: x.update({str(i): i}))
+    assert writes == [] and not os.path.exists(path)
+    time.sleep(0.3)
+    assert writes == [1]
+    assert _read(path) == {str(i): i for i in range(5)}
+
+
+def test_failed_write_keeps_old_file_and_no_tmp(tmp_path):
+    path = str(tmp_path / "s.json")
+    d = JsonDoc(path)
+    d.update(lambda x: x.update(a=1))
+    with pytest.raises(TypeError):
+        d.update(lambda x: x.update(bad=object()))
+    assert _read(path) == {"a": 1}
+    assert sorted(os.listdir(tmp_path)) == ["s.json", "s.json.lock"]
+
+
+def test_reads_pick_up_external_change(tmp_path):
+    path = str(tmp_path / "s.json")
+    d = JsonDoc(path, check_interval=0)
+    d.update(lambda x: x.update(a=1))
+    v = d.version
+    _external_write(path, {"a": 2})
+    assert d.view() == {"a": 2}
+    assert d.version > v
+
+
+def test_corrupt_file_reads_as_default(tmp_path):
+    path = tmp_path / "s.json"
+    path.write_text("{not json", encoding="utf-8")
+    d = JsonDoc(str(path))
+    assert d.view() == {}
+    assert d.corrupt
+
+
+def test_flush_waits_for_the_file_lock(tmp_path):
+    path = str(tmp_path / "s.json")
+    d = JsonDoc(path)
+    done = threading.Event()
+    with file_lock(path + ".lock"):
+        t = threading.Thread(target=lambda: (d.update(lambda x: x.update(a=1)), done.set()))
+        t.start()
+        time.sleep(0.1)
+        assert not done.is_set()  # другой «процесс» держит документ
+        assert not os.path.exists(path)
+    t.join(2)
+    assert done.is_set()
+    assert _read(path) == {"a": 1}
+
+
+def test_doc_is_shared_per_path(tmp_path):
+    a = json_store.doc(str(tmp_path / "x.json"))
+    b = json_store.doc(os.path.join(str(tmp_path), ".", "x.json"))
+    assert a is b
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+import market_engine
+from bench.mock_ws import MockMexcWs
+from market_frame import TickerFrame
+from market_feed import MIRROR, MarketFeed
+from render_cache import RENDERS
+
+SYMBOLS = [f"C{i}USDT" for i in range(50)]
+
+
+@pytest.fixture
+def feed_running():
+    srv = MockMexcWs(SYMBOLS, interval=0.01).start()
+    MIRROR.clear()
+    RENDERS.invalidate()
+    RENDERS.reset_stats()
+    market_engine._mirror_frame = (-1, 0.0, None)
+    yield srv
+    srv.stop()
+    MIRROR.clear()
+
+
+def test_overview_hits_render_cache_while_feed_streams(feed_running):
+    snapshot = [{"symbol": s, "lastPrice": "1", "priceChangePercent": "0.01", "quoteVolume": "1000"} for s in SYMBOLS]
+
+    async def main():
+        feed = MarketFeed(url=feed_running.url, snapshot=lambda: snapshot)
+        await feed.start()
+        try:
+            assert await feed.wait_connected(5)
+            texts = []
+            versions = set()
+            for _ in range(30):
+                texts.append(market_engine.get_market_overview_text())
+                versions.add(MIRROR.version)
+                await asyncio.sleep(0.02)  # поток тем временем шлёт обновления
+            return texts, versions
+        finally:
+            await feed.stop()
+
+    texts, versions = asyncio.run(main())
+    assert len(versions) > 5                      # зеркало действительно менялось
+    st = RENDERS.stats()["market_overview"]
+    assert st["misses"] == 1 and st["hits"] == 29  # а витрина и текст — нет
+    assert len(set(texts)) == 1
+
+
+def test_frame_is_rebuilt_after_the_interval(feed_running, monkeypatch):
+    monkeypatch.setattr(market_engine, "MIRROR_FRAME_INTERVAL", 0.0)
+    MIRROR.apply_snapshot([{"symbol": "AUSDT", "lastPrice": "1"}], 0.0)
+    fr1 = market_engine.get_frame()
+    assert market_engine.get_frame() is fr1       # версия та же — та же витрина
+    MIRROR.apply_mini_tickers([{"s": "AUSDT", "p": "2", "r": "0"}])
+    assert market_engine.get_frame() is not fr1
+
+
+def test_missing_base_volume_keeps_the_symbol():
+    row = {"lastPrice": "2", "priceChangePercent": "5", "quoteVolume": "3000",
+           "highPrice": "2.2", "lowPrice": "1.8", "openPrice": "1.9"}
+    fr = TickerFrame.from_rows([
+        dict(row, symbol="AUSDT", volume=None),     # базового объёма нет — строка остаётся
+        dict(row, symbol="BUSDT", volume="1500"),
+        dict(row, symbol="CUSDT", lastPrice=None),  # нет цены — отбрасываем, как раньше
+    ])
+    assert fr.valid.tolist() == [True, True, False]
+    text = market_engine._render_overview(fr)
+    assert "AUSDT" in text and "CUSDT" not in text
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from bench.mock_ws import MockMexcWs
+from market_feed import BOOK_TICKER, DEALS, MINI_TICKERS, MarketFeed, MarketMirror
+
+
+@pytest.fixture
+def ws():
+    srvs = []
+
+    def make(**kw):
+        srv = MockMexcWs(["BTCUSDT", "ETHUSDT"], interval=0.05, **kw).start()
+        srvs.append(srv)
+        return srv
+    yield make
+    for srv in srvs:
+        srv.stop()
+
+
+async def _until(cond, timeout=3.0):
+    end = asyncio.get_running_loop().time() + timeout
+    while not cond():
+        assert asyncio.get_running_loop().time() < end, "не дождались"
+        await asyncio.sleep(0.02)
+
+
+def test_symbols_are_subscribed_and_changed_live(ws):
+    srv = ws()
+
+    async def main():
+        mirror = MarketMirror()
+        feed = MarketFeed(["BTCUSDT"], url=srv.url, mirror=mirror, snapshot=lambda: [])
+        await feed.start()
+        try:
+            await _until(lambda: (mirror.get("BTCUSDT") or {}).get("bidPrice"))
+            await feed.set_symbols(["ETHUSDT"])
+            await _until(lambda: (mirror.get("ETHUSDT") or {}).get("askPrice"))
+            assert sorted(srv.subscriptions) == sorted([MINI_TICKERS, BOOK_TICKER + "ETHUSDT", DEALS + "ETHUSDT"])
+            assert srv.connections == 1  # без переподключения
+        finally:
+            await feed.stop()
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("mode", ["reject", "binary"])
+def test_unusable_feed_fails_loudly(ws, mode, caplog):
+    srv = ws(**{mode: True})
+
+    async def main():
+        feed = MarketFeed(["BTCUSDT"], url=srv.url, mirror=MarketMirror(), snapshot=lambda: [])
+        await feed.start()
+        await _until(lambda: feed.failed)
+        await asyncio.sleep(0.1)
+        return feed
+    feed = asyncio.run(main())
+    assert feed._task.done() and srv.connections == 1  # не долбим биржу переподключениями
+    assert any("market_feed остановлен" in r.message for r in caplog.records)
+
+
+def test_silent_feed_gives_up_after_fail_after_sessions(ws):
+    srv = ws()
+    srv.paused = True
+
+    async def main():
+        feed = MarketFeed(url=srv.url, mirror=MarketMirror(), snapshot=lambda: [], stale_after=0.1, fail_after=2)
+        await feed.start()
+        await _until(lambda: feed.failed, timeout=10)
+        return feed
+    feed = asyncio.run(main())
+    assert feed.failed.startswith("no data")
+    assert srv.connections == 2
+
+
+def test_reconnects_and_resnapshots_after_drop_and_stale_stream(ws):
+    srv = ws()
+    snaps = []
+
+    def snapshot():
+        snaps.append(1)
+        return [{"symbol": "SNAPUSDT", "lastPrice": str(len(snaps))}]
+
+    async def main():
+        mirror = MarketMirror()
+        feed = MarketFeed(["BTCUSDT"], url=srv.url, mirror=mirror, snapshot=snapshot, stale_after=0.3)
+        await feed.start()
+        try:
+            await _until(lambda: (mirror.get("BTCUSDT") or {}).get("bidPrice"))
+            assert mirror.price("SNAPUSDT") == 1
+
+            # разрыв потока: переподключение, новая подписка и новый REST-снапшот
+            srv.drop_all()
+            await _until(lambda: srv.connections == 2 and feed.stats["snapshots"] == 2, timeout=5)
+            assert mirror.price("SNAPUSDT") == 2
+            await _until(lambda: BOOK_TICKER + "BTCUSDT" in srv.subscriptions)
+
+            # поток замолчал дольше stale_after — то же самое
+            srv.paused = True
+            await _until(lambda: feed.stats["stale"] == 1, timeout=5)
+            srv.paused = False
+            await _until(lambda: srv.connections == 3 and feed.stats["snapshots"] == 3, timeout=5)
+            assert mirror.price("SNAPUSDT") == 3
+            await _until(lambda: sorted(srv.subscriptions) == sorted([MINI_TICKERS, BOOK_TICKER + "BTCUSDT",
+                                                                      DEALS + "BTCUSDT"]))
+            assert feed.failed is None
+        finally:
+            await feed.stop()
+    asyncio.run(main())
+
+
+def test_rest_snapshot_runs_in_background_lane(monkeypatch):
+    import market_feed
+    import mexc_client
+    from rate_limiter import BACKGROUND, current_lane
+
+    seen = []
+    monkeypatch.setattr(mexc_client, "get_24h_all", lambda: seen.append(current_lane()) or [])
+    asyncio.run(asyncio.to_thread(market_feed._rest_snapshot))
+    assert seen == [BACKGROUND]
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import order_journal
+from json_store import file_lock
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    d = tmp_path / "storage"
+    monkeypatch.setattr(order_journal, "STORAGE_DIR", str(d))
+    monkeypatch.setattr(order_journal, "JOURNAL_PATH", str(d / "orders.jsonl"))
+    monkeypatch.setattr(order_journal, "LEGACY_PATH", str(d / "orders.json"))
+    monkeypatch.setattr(order_journal, "JOURNAL_FSYNC", "never")
+    return d
+
+
+def _write_records(path, n):
+    recs = [{"n": i} for i in range(n)]
+    path.write_bytes(b"".join(json.dumps(r, separators=(",", ":")).encode() + b"\n" for r in recs))
+    return recs
+
+
+@pytest.mark.parametrize("block, limit", [
+    (3, 4),     # блок короче строки
+    (16, 4),    # строки по 8 байт: граница блока ровно по концу строки
+    (16, 99),   # limit больше, чем записей в файле
+    (8192, 5),
+])
+def test_tail_records_on_block_boundaries(tmp_path, block, limit):
+    path = tmp_path / "f"
+    recs = _write_records(path, 10)  # {"n":0}\n — 8 байт
+    assert order_journal._tail_records(str(path), limit, block=block) == recs[-limit:]
+
+
+def test_tail_records_skip_torn_lines_without_counting_them(tmp_path):
+    path = tmp_path / "f"
+    path.write_bytes(b'{"n":1}\n{"n":2}\n{"n":\n{"n":3}\n{"n":4')
+    assert order_journal._tail_records(str(path), 2, block=4) == [{"n": 2}, {"n": 3}]
+    assert order_journal._tail_records(str(path), 10) == [{"n": 1}, {"n": 2}, {"n": 3}]
+
+
+def test_log_order_does_not_glue_onto_torn_tail(journal):
+    order_journal.log_order({"n": 1, "ts": 0})
+    with open(order_journal.JOURNAL_PATH, "ab") as f:
+        f.write(b'{"n":2,"ts"')  # падение посреди записи
+    order_journal.log_order({"n": 3, "ts": 0})
+    assert [r["n"] for r in order_journal.list_orders(2)] == [1, 3]
+
+
+def test_list_orders_across_rotated_segments(journal, monkeypatch):
+    monkeypatch.setattr(order_journal, "JOURNAL_MAX_BYTES", 200)
+    for i in range(40):
+        order_journal.log_order({"n": i, "ts": 0})
+    assert os.path.exists(order_journal._segment(1))
+    got = [r["n"] for r in order_journal.list_orders(25)]
+    assert got == list(range(15, 40))
+
+
+def test_compact_keeps_tail_and_drops_segments(journal, monkeypatch):
+    monkeypatch.setattr(order_journal, "JOURNAL_MAX_BYTES", 200)
+    for i in range(30):
+        order_journal.log_order({"n": i, "ts": 0})
+    assert order_journal.compact(keep=7) == 7
+    assert not os.path.exists(order_journal._segment(1))
+    assert [r["n"] for r in order_journal.list_orders(100)] == list(range(23, 30))
+
+
+def test_legacy_array_is_migrated_once(journal):
+    os.makedirs(journal)
+    (journal / "orders.json").write_text(json.dumps([{"n": 1}, {"n": 2}]), encoding="utf-8")
+    assert [r["n"] for r in order_journal.list_orders(10)] == [1, 2]
+    order_journal.log_order({"n": 3})
+    assert [r["n"] for r in order_journal.list_orders(10)] == [1, 2, 3]
+    assert (journal / "orders.json.migrated").exists()
+
+
+def test_writes_wait_for_the_file_lock(journal):
+    os.makedirs(journal)
+    done = threading.Event()
+    with file_lock(order_journal.JOURNAL_PATH + ".lock"):
+        t = threading.Thread(target=lambda: (order_journal.log_order({"n": 1}), done.set()))
+        t.start()
+        time.sleep(0.1)
+        assert not done.is_set()  # другой «процесс» держит журнал
+    t.join(2)
+    assert done.is_set()
+    assert order_journal.list_orders(5) == [{"n": 1, "ts": order_journal.list_orders(5)[0]["ts"]}]
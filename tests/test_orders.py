@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+import orders
+import symbols_index
+from exchange_client import CLIENT
+
+META = {"symbol": "BTCUSDT", "status": "ENABLED", "base": "BTC", "quote": "USDT",
+        "tick": 0.01, "step": 0.0001, "min_notional": 1.0}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(symbols_index, "_index", {"BTCUSDT": META})
+    monkeypatch.setattr(symbols_index, "_loaded", True)
+    monkeypatch.setattr(symbols_index, "_misses", {})
+
+    async def price(symbol, max_age=orders.PRICE_MAX_AGE):
+        return 50000.0
+    monkeypatch.setattr(orders, "get_price_async", price)
+
+
+def test_preview_async_reads_index_inline(index, monkeypatch):
+    def no_threads(*a, **kw):
+        raise AssertionError("preview не должен уходить в поток")
+    monkeypatch.setattr(asyncio, "to_thread", no_threads)
+    p = asyncio.run(orders.preview_market_buy_async("btcusdt", 25.0))
+    assert p["qty"] == pytest.approx(0.0005)
+
+
+def test_preview_async_fetches_missing_symbol_with_async_client(index, monkeypatch):
+    seen = []
+
+    async def arequest(method, path, params=None, **kw):
+        seen.append((method, path, params))
+        return {"symbols": [{"symbol": "ETHUSDT", "status": "ENABLED", "baseAsset": "ETH", "quoteAsset": "USDT",
+                             "filters": [{"filterType": "LOT_SIZE", "stepSize": "0.01"}]}]}
+    monkeypatch.setattr(CLIENT, "arequest", arequest)
+    monkeypatch.setattr(symbols_index, "_save", lambda: None)
+    p = asyncio.run(orders.preview_market_buy_async("ETHUSDT", 1000.0))
+    assert p["qty"] == pytest.approx(0.02)
+    assert seen == [("GET", "/api/v3/exchangeInfo", {"symbol": "ETHUSDT"})]
+    assert "ETHUSDT" in symbols_index._index
+
+
+def test_preview_async_unknown_symbol_raises(index, monkeypatch):
+    async def arequest(method, path, params=None, **kw):
+        return {"symbols": []}
+    monkeypatch.setattr(CLIENT, "arequest", arequest)
+    with pytest.raises(orders.MexcError):
+        asyncio.run(orders.preview_market_buy_async("NOPEUSDT", 25.0))
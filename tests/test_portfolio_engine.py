@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import portfolio_engine
+from portfolio_engine import PortfolioEngine
+from price_cache import PRICES
+
+
+@pytest.fixture
+def market():
+    state = {
+        "balances": {"BTC": (1.0, 0.0), "ETH": (2.0, 1.0), "USDT": (100.0, 0.0)},
+        "prices": {"BTCUSDT": 100.0, "ETHUSDT": 10.0},
+        "entries": {"BTC": 80.0},
+        "entries_ver": 1,
+        "balance_loads": 0,
+        "entries_loads": 0,
+    }
+
+    def balances():
+        state["balance_loads"] += 1
+        return dict(state["balances"])
+
+    def prices(symbols):
+        return {s: state["prices"][s] for s in symbols if s in state["prices"]}
+
+    def entries(assets):
+        state["entries_loads"] += 1
+        return {a: v for a, v in state["entries"].items() if a in assets}
+
+    engine = PortfolioEngine(balance_loader=balances, price_loader=prices, balance_max_age=60, price_max_age=60)
+    view = engine.view(entries, lambda: state["entries_ver"], qty_mode="free")
+    yield state, engine, view
+    engine.close()
+
+
+def _rows(snap):
+    return {r["asset"]: r for r in snap["rows"]}
+
+
+def test_snapshot_values_rows(market):
+    state, engine, view = market
+    snap = view.snapshot()
+    rows = _rows(snap)
+    assert rows["ETH"]["qty"] == 2.0  # qty_mode="free"
+    assert snap["total"] == pytest.approx(100 + 20 + 100)
+    assert rows["BTC"]["pl_usdt"] == pytest.approx(20.0)
+    assert rows["BTC"]["pl_pct"] == pytest.approx(25.0)
+    assert rows["ETH"]["pl_usdt"] is None  # входа нет
+
+
+def test_price_event_updates_only_that_row_and_total(market):
+    state, engine, view = market
+    snap = view.snapshot()
+    btc_row = view._rows["BTC"]
+    PRICES.put("ETHUSDT", 15.0)
+    snap2 = view.snapshot()
+    assert snap2["version"] > snap["version"]
+    assert view._rows["BTC"] is btc_row  # другие строки не пересчитывались
+    assert _rows(snap2)["ETH"]["value"] == pytest.approx(30.0)
+    assert snap2["total"] == pytest.approx(snap["total"] + 10.0)
+    # чужие символы и та же цена версию не двигают
+    PRICES.put_many({"XRPUSDT": 1.0, "ETHUSDT": 15.0})
+    assert view.snapshot()["version"] == snap2["version"]
+
+
+def test_views_share_balances_and_prices(market):
+    state, engine, view = market
+    total = engine.view(lambda assets: {}, qty_mode="total")
+    view.snapshot()
+    assert _rows(total.snapshot())["ETH"]["qty"] == 3.0
+    assert state["balance_loads"] == 1
+    PRICES.put("ETHUSDT", 20.0)
+    assert _rows(total.snapshot())["ETH"]["value"] == pytest.approx(60.0)
+    assert _rows(view.snapshot())["ETH"]["value"] == pytest.approx(40.0)
+
+
+def test_mark_balances_dirty_refetches(market):
+    state, engine, view = market
+    view.snapshot()
+    view.snapshot()
+    assert state["balance_loads"] == 1
+    state["balances"]["BTC"] = (3.0, 0.0)
+    engine.mark_balances_dirty()
+    snap = view.snapshot()
+    assert state["balance_loads"] == 2
+    assert _rows(snap)["BTC"]["value"] == pytest.approx(300.0)
+
+
+def test_invalidate_refetches_balances_and_prices(market):
+    state, engine, view = market
+    view.snapshot()
+    loads = engine.stats["price_loads"]
+    state["prices"]["BTCUSDT"] = 150.0
+    view.snapshot()
+    assert engine.stats["price_loads"] == loads
+    engine.invalidate()
+    snap = view.snapshot()
+    assert state["balance_loads"] == 2
+    assert engine.stats["price_loads"] == loads + 1
+    assert _rows(snap)["BTC"]["price"] == pytest.approx(150.0)
+
+
+def test_module_mark_balances_dirty_reaches_shared_engine():
+    portfolio_engine.ENGINE._balances_at = 1e12
+    portfolio_engine.mark_balances_dirty()
+    assert portfolio_engine.ENGINE._balances_at == 0.0
+
+
+def test_entries_version_change_recomputes_pl(market):
+    state, engine, view = market
+    view.snapshot()
+    loads = state["entries_loads"]
+    state["entries"]["BTC"] = 50.0
+    # версия та же — входы не перечитываются
+    assert _rows(view.snapshot())["BTC"]["pl_usdt"] == pytest.approx(20.0)
+    assert state["entries_loads"] == loads
+    state["entries_ver"] = 2
+    snap = view.snapshot()
+    assert state["entries_loads"] == loads + 1
+    assert _rows(snap)["BTC"]["pl_usdt"] == pytest.approx(50.0)
+    assert _rows(snap)["BTC"]["pl_pct"] == pytest.approx(100.0)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import time
+
+from price_cache import PriceCache
+
+
+def test_threads_share_one_load():
+    cache = PriceCache()
+    calls = []
+    gate = threading.Event()
+
+    def loader():
+        calls.append(1)
+        gate.wait(2)
+        return 42.0
+
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(cache.get("BTCUSDT", loader, 5, tag="t")))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join(2)
+    assert calls == [1]
+    assert out == [42.0] * 8
+    st = cache.stats()["by_tag"]["t"]
+    assert st["misses"] == 1 and st["coalesced"] == 7
+
+
+def test_coroutines_share_one_load_and_error_is_not_cached():
+    cache = PriceCache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return 7.0
+
+    async def run():
+        first = await asyncio.gather(*(cache.aget("ETHUSDT", loader, 5) for _ in range(5)),
+                                     return_exceptions=True)
+        second = await asyncio.gather(*(cache.aget("ETHUSDT", loader, 5) for _ in range(5)))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert all(isinstance(e, RuntimeError) for e in first)
+    assert second == [7.0] * 5
+    assert len(calls) == 2
+
+
+def test_max_age_is_per_caller():
+    cache = PriceCache()
+    cache.put("BTCUSDT", 1.0)
+    time.sleep(0.02)
+    assert cache.get("BTCUSDT", lambda: 2.0, max_age=5) == 1.0
+    assert cache.get("BTCUSDT", lambda: 2.0, max_age=0.01) == 2.0
+
+
+def test_lru_eviction():
+    cache = PriceCache(max_entries=2)
+    cache.put("A", 1)
+    cache.put("B", 2)
+    assert cache.peek("A") == 1  # A свежее B
+    cache.put("C", 3)
+    assert cache.peek("B") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_loader_error_reaches_waiting_threads():
+    cache = PriceCache()
+    gate = threading.Event()
+
+    def loader():
+        gate.wait(2)
+        raise ValueError("down")
+
+    errors = []
+
+    def call():
+        try:
+            cache.get("X", loader, 5)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join(2)
+    assert len(errors) == 3
+    assert cache.peek("X") is None
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+import rate_limiter
+from rate_limiter import BACKGROUND, INTERACTIVE, ORDER, WeightLimiter, lane, weight_of
+
+
+class Clock:
+    """Фальшивое время: sleep продвигает monotonic, а не ждёт."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, s):
+        self.slept.append(s)
+        self.now += s
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(rate_limiter, "time", c)
+    return c
+
+
+def test_weight_of_depends_on_symbol():
+    assert weight_of("/api/v3/myTrades") == 10
+    assert weight_of("/api/v3/ticker/24hr") == 40
+    assert weight_of("/api/v3/ticker/24hr", {"symbol": "BTCUSDT"}) == 1
+    assert weight_of("/api/v3/unknown") == rate_limiter.DEFAULT_WEIGHT
+
+
+def test_bucket_waits_for_refill(clock):
+    lim = WeightLimiter(capacity=100, period=10)  # 10 веса в секунду
+    lim.acquire_sync(100)
+    assert clock.slept == []
+    lim.acquire_sync(30)
+    assert sum(clock.slept) == pytest.approx(3.0)
+    assert lim.stats["waited"] == 1
+
+
+def test_async_acquire_sleeps_without_blocking(clock, monkeypatch):
+    lim = WeightLimiter(capacity=10, period=1)
+    slept = []
+
+    async def fake_sleep(s):
+        slept.append(s)
+        clock.now += s
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake_sleep)
+
+    async def run():
+        await lim.acquire(10)
+        await lim.acquire(5)
+    asyncio.run(run())
+    assert sum(slept) == pytest.approx(0.5)
+
+
+def test_background_leaves_reserve_for_orders(clock):
+    lim = WeightLimiter(capacity=100, period=10, reserve={ORDER: 0.0, INTERACTIVE: 0.05, BACKGROUND: 0.2})
+    assert lim._try_take(80, BACKGROUND) == 0
+    # у фона остались только 20% резерва — ждёт
+    assert lim._try_take(10, BACKGROUND) > 0
+    # ордер берёт из резерва сразу
+    assert lim._try_take(10, ORDER) == 0
+
+
+def test_waiting_urgent_lane_holds_back_background(clock):
+    lim = WeightLimiter(capacity=100, period=10)
+    lim._wait(ORDER, 1)
+    assert lim._try_take(1, BACKGROUND) > 0
+    assert lim._try_take(1, ORDER) == 0
+    lim._wait(ORDER, -1)
+    assert lim._try_take(1, BACKGROUND) == 0
+
+
+def test_lane_comes_from_context(clock):
+    lim = WeightLimiter(capacity=100, period=10, reserve={BACKGROUND: 0.5})
+    lim.acquire_sync(50)
+    with lane(BACKGROUND):
+        lim.acquire_sync(10)
+    # фон ждал, пока в корзине не станет 50 + 10
+    assert sum(clock.slept) == pytest.approx(1.0)
+
+
+def test_429_blocks_for_retry_after(clock):
+    lim = WeightLimiter(capacity=100, period=10)
+    lim.on_response(429, {"Retry-After": "7"})
+    assert lim._try_take(1) == pytest.approx(7.0)
+    clock.now += 7.0
+    # после штрафа вес копится с нуля
+    assert lim._try_take(1) == pytest.approx(0.1)
+    assert lim.stats["penalties"] == 1
+
+
+def test_used_weight_header_trims_tokens(clock):
+    lim = WeightLimiter(capacity=100, period=10)
+    lim.on_response(200, {"x-mbx-used-weight-1m": str(rate_limiter.USED_WEIGHT_LIMIT * 0.9)})
+    assert lim.snapshot()["tokens"] == pytest.approx(10.0)
+    assert lim.stats["server_trims"] == 1
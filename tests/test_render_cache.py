@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from render_cache import RenderCache
+
+
+def test_same_epoch_returns_cached_text():
+    cache = RenderCache()
+    calls = []
+
+    def render():
+        calls.append(1)
+        return f"text {len(calls)}"
+
+    assert cache.render("portfolio", 1, render) == "text 1"
+    assert cache.render("portfolio", 1, render) == "text 1"
+    assert cache.render("portfolio", 2, render) == "text 2"
+    # слот один — к старой эпохе не возвращаемся
+    assert cache.render("portfolio", 1, render) == "text 3"
+    st = cache.stats()["portfolio"]
+    assert (st["hits"], st["misses"]) == (1, 3)
+    assert st["hit_ratio"] == 0.25
+
+
+def test_object_key_compared_by_identity_first():
+    class Frame:
+        def __eq__(self, other):
+            raise AssertionError("сравнение по == не нужно, это тот же объект")
+        __hash__ = object.__hash__
+
+    cache = RenderCache()
+    frame = Frame()
+    cache.render("market", frame, lambda: "a")
+    assert cache.render("market", frame, lambda: "b") == "a"
+
+
+def test_errors_are_not_cached():
+    cache = RenderCache()
+
+    def boom():
+        raise RuntimeError("render failed")
+
+    with pytest.raises(RuntimeError):
+        cache.render("portfolio", 1, boom)
+    assert cache.render("portfolio", 1, lambda: "ok") == "ok"
+    st = cache.stats()["portfolio"]
+    assert (st["errors"], st["misses"]) == (1, 1)
+
+
+def test_invalidate_by_name():
+    cache = RenderCache()
+    cache.render("portfolio", 1, lambda: "p")
+    cache.render("market", 1, lambda: "m")
+    cache.invalidate("portfolio")
+    assert cache.render("portfolio", 1, lambda: "p2") == "p2"
+    assert cache.render("market", 1, lambda: "m2") == "m"
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import random
+import time
+
+import pytest
+
+import report_delivery
+from report_delivery import Fanout
+
+
+class RetryAfter(Exception):
+    def __init__(self, seconds):
+        super().__init__(f"retry after {seconds}")
+        self.retry_after = seconds
+
+
+@pytest.fixture(autouse=True)
+def fast_limits(monkeypatch):
+    monkeypatch.setattr(report_delivery, "_CHAT_LIMITS", {})
+    monkeypatch.setattr(report_delivery, "DELIVERY_CHAT_INTERVAL", 0.001)
+
+
+def test_messages_keep_order_within_each_chat():
+    got = {1: [], 2: [], 3: []}
+    rnd = random.Random(5)
+
+    async def send(cid, text):
+        await asyncio.sleep(rnd.uniform(0, 0.005))
+        got[cid].append(text)
+
+    async def run():
+        fan = Fanout(got, send)
+        fan.post("a", "b")
+        fan.post("c")
+        fan.post("d", "e")
+        return await fan.close()
+
+    stats = asyncio.run(run())
+    assert all(v == ["a", "b", "c", "d", "e"] for v in got.values())
+    assert stats["sent"] == 15
+
+
+def test_failed_chat_does_not_block_others():
+    got = []
+
+    async def send(cid, text):
+        if cid == 1:
+            raise RuntimeError("chat not found")
+        await asyncio.sleep(0.001)
+        got.append(text)
+
+    async def run():
+        fan = Fanout([1, 2], send)
+        fan.post("a", "b", "c")
+        return await fan.close()
+
+    stats = asyncio.run(run())
+    assert got == ["a", "b", "c"]
+    # после первой ошибки остальное в этот чат не шлём
+    assert (stats["sent"], stats["failed"], stats["skipped"]) == (3, 1, 2)
+
+
+def test_retry_after_is_respected():
+    attempts = []
+
+    async def send(cid, text):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RetryAfter(0.2)
+
+    async def run():
+        fan = Fanout([1], send)
+        fan.post("a")
+        return await fan.close()
+
+    stats = asyncio.run(run())
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.2
+    assert (stats["sent"], stats["retries"], stats["failed"]) == (1, 1, 0)
+
+
+def test_retry_after_gives_up_after_retries():
+    calls = []
+
+    async def send(cid, text):
+        calls.append(text)
+        raise RetryAfter(0)
+
+    stats = asyncio.run(report_delivery.broadcast([1], send, "a", "b"))
+    assert calls == ["a"] * (report_delivery.DELIVERY_RETRIES + 1)
+    assert (stats["failed"], stats["skipped"]) == (1, 1)
+
+
+def test_chat_waiting_on_retry_after_does_not_delay_others():
+    done = {}
+
+    async def send(cid, text):
+        if cid == 1:
+            raise RetryAfter(0.3)
+        done[text] = time.monotonic()
+
+    async def run():
+        t0 = time.monotonic()
+        fan = Fanout([1, 2], send)
+        fan.post("a", "b")
+        await fan.close()
+        return t0
+
+    t0 = asyncio.run(run())
+    assert set(done) == {"a", "b"}
+    assert max(done.values()) - t0 < 0.3
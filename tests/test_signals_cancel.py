@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import indicators
+import screener_pool
+import signals_engine
+from candle_store import CANDLES
+
+
+def _candles(n=60):
+    t0 = 1_700_000_000_000
+    t = t0 + np.arange(n) * CANDLES.interval_ms
+    c = np.linspace(1, 2, n)
+    return np.column_stack([t, c, c * 1.01, c * 0.99, c, np.full(n, 100.0)])
+
+
+def test_serial_evaluation_stops_on_cancel():
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(screener_pool.Cancelled):
+        screener_pool.evaluate({"AUSDT": _candles()}, {}, 0.5, 5, time.time() * 1000, CANDLES.interval_ms,
+                               workers=1, cancel=cancel)
+
+
+def test_timed_out_shortlist_releases_indicator_lock(monkeypatch):
+    arrays = {f"S{i}USDT": _candles() for i in range(300)}
+
+    async def update(sym, sem=None):
+        return arrays[sym]
+    monkeypatch.setattr(CANDLES, "update", update)
+    real = indicators.evaluate
+
+    def slow(st, closed):
+        time.sleep(0.01)  # 300 символов ~ 3 с
+        return real(st, closed)
+    monkeypatch.setattr(indicators, "evaluate", slow)
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(signals_engine.shortlist_async(list(arrays), workers=1), 0.2)
+
+    t0 = time.monotonic()
+    asyncio.run(main())
+    assert signals_engine._IND_LOCK.acquire(timeout=1.0)  # оценка бросила работу, а не доделывает её
+    signals_engine._IND_LOCK.release()
+    assert time.monotonic() - t0 < 2.0
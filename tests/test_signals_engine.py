@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+import signals_engine
+from market_frame import TickerFrame
+
+
+def test_reason_renders_numbers_like_the_api():
+    fr = TickerFrame.from_rows([
+        {"symbol": "AUSDT", "lastPrice": "111000", "priceChangePercent": "6.3", "quoteVolume": "1234567.0",
+         "highPrice": "112000", "lowPrice": "104000", "openPrice": "104400"},
+    ])
+    fr.cols["pct"][0] = 0.063 * 100  # как из зеркала: доля * 100 = 6.300000000000001
+    (idea,) = signals_engine.score_frame(fr)
+    assert idea["reason"] == "Δ 6.3% | V 1234567 | P 111000"
+
+
+def test_num_keeps_small_and_large_values_positional():
+    assert signals_engine._num(0.00001234) == "0.00001234"
+    assert signals_engine._num(1.2e9) == "1200000000"
+    assert signals_engine._num(-5.5) == "-5.5"
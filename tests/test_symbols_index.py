@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import time
+
+import pytest
+
+import mexc_client
+import symbols_index
+
+
+def _info(*symbols):
+    return {"symbols": [{"symbol": s, "status": "ENABLED", "baseAsset": s[:-4], "quoteAsset": "USDT",
+                         "filters": [{"filterType": "PRICE_FILTER", "tickSize": "0.01"},
+                                     {"filterType": "LOT_SIZE", "stepSize": "0.001"}]}
+                        for s in symbols]}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def fake(symbol=None):
+        calls.append(symbol)
+        if symbol is None:
+            return _info("BTCUSDT", "ETHUSDT")
+        return _info(symbol) if symbol == "NEWUSDT" else {"symbols": []}
+
+    monkeypatch.setattr(mexc_client, "get_exchange_info", fake)
+    monkeypatch.setattr(symbols_index, "_index", {})
+    monkeypatch.setattr(symbols_index, "_updated_at", 0.0)
+    monkeypatch.setattr(symbols_index, "_loaded", False)
+    monkeypatch.setattr(symbols_index, "_misses", {})
+    return calls
+
+
+def _write_disk(updated_at):
+    os.makedirs(symbols_index.STORAGE_DIR, exist_ok=True)
+    meta = symbols_index._parse_symbol(_info("OLDUSDT")["symbols"][0])
+    with open(symbols_index.INDEX_PATH, "w", encoding="utf-8") as f:
+        json.dump({"updated_at": updated_at, "symbols": {"OLDUSDT": meta}}, f)
+
+
+def test_fresh_disk_index_is_used_without_network(calls):
+    _write_disk(time.time())
+    assert symbols_index.get("OLDUSDT")["tick"] == 0.01
+    assert calls == []
+
+
+def test_stale_disk_index_is_refreshed_on_first_use(calls):
+    _write_disk(time.time() - symbols_index.MAX_AGE - 1)
+    assert symbols_index.get("BTCUSDT") is not None
+    assert calls == [None]
+    assert symbols_index.age_seconds() < 5
+
+
+def test_unknown_symbol_is_negatively_cached(calls, monkeypatch):
+    _write_disk(time.time())
+    assert symbols_index.get("NOPEUSDT") is None
+    assert symbols_index.get("NOPEUSDT") is None
+    assert calls == ["NOPEUSDT"]
+    monkeypatch.setattr(symbols_index, "MISS_TTL", 0.0)
+    assert symbols_index.get("NOPEUSDT") is None
+    assert calls == ["NOPEUSDT", "NOPEUSDT"]
+
+
+def test_new_symbol_is_added_and_saved_without_leftover_tmp(calls):
+    _write_disk(time.time())
+    assert symbols_index.get("NEWUSDT")["symbol"] == "NEWUSDT"
+    assert symbols_index.get("NEWUSDT") is not None
+    assert calls == ["NEWUSDT"]
+    assert os.listdir(symbols_index.STORAGE_DIR) == ["symbols_index.json"]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from timeseries_store import HOUR, Series
+
+
+def test_append_many_drops_points_older_than_accepted_max():
+    s = Series("total", root="series")
+    # 5000 больше соседа 3000, но меньше уже принятой 10000 — тоже отбрасывается
+    n = s.append_many([1000, 10_000, 3000, 5000, 12_000], [1.0, 2.0, 3.0, 4.0, 5.0])
+    assert n == 3
+    assert s.raw.view()["ts"].tolist() == [1000, 10_000, 12_000]
+
+
+def test_append_many_nan_does_not_raise_bar_and_respects_last():
+    s = Series("total", root="series")
+    assert s.append(5000, 1.0)
+    n = s.append_many([4000, 9000, 6000, 7000], [2.0, float("nan"), 3.0, 4.0])
+    assert n == 2
+    assert s.raw.view()["ts"].tolist() == [5000, 6000, 7000]
+
+
+def test_rollups_follow_accepted_points():
+    s = Series("total", root="series")
+    s.append_many([0, 2 * HOUR, HOUR, 2 * HOUR + 1], [1.0, 5.0, 9.0, 3.0])
+    h = s.range(0, 3 * HOUR, level="1h")
+    assert h["ts"].tolist() == [0, 2 * HOUR]
+    assert np.allclose(h["high"], [1.0, 5.0])
+    assert h["close"].tolist() == [1.0, 3.0]
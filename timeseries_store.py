@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Компактное хранилище временных рядов (стоимость портфеля, активы) — data/series/.
+
+Каждый ряд — набор файлов фиксированной ширины, читаются через np.memmap:
+  <name>.raw.bin  — точки как есть: ts (int64, мс) + value (float64), 16 байт;
+  <name>.1h.bin, <name>.1d.bin, <name>.1w.bin — свёртки: ts начала бакета,
+                    open/high/low/close (float64) и count (int64), 48 байт.
+Свёртки ведутся на лету: точка обновляет последний бакет каждого уровня на
+месте или дописывает новый. Точки идут по возрастанию времени (более старые,
+чем последняя, отбрасываются), поэтому поиск диапазона — searchsorted по ts.
+Хранение ограничено RETENTION (по уровням); старое вырезается атомарной
+перезаписью файла не чаще раза в RETENTION_CHECK секунд.
+
+    SERIES.append("total", ts_ms, 1234.5)
+    arr = SERIES.range("total", start_ms, end_ms)          # уровень — по длине диапазона
+    st = SERIES.stats("total", start_ms, end_ms)           # min/max/change/drawdown
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+DATA_DIR = os.path.join("data", "series")
+
+RAW = np.dtype([("ts", "<i8"), ("value", "<f8")])
+ROLLUP = np.dtype([("ts", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+                   ("close", "<f8"), ("count", "<i8")])
+
+HOUR = 3_600_000
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+LEVELS = ("1h", "1d", "1w")
+_STEP = {"1h": HOUR, "1d": DAY, "1w": WEEK}
+
+# сколько хранить по уровням, мс (None — без ограничений)
+RETENTION: Dict[str, Optional[int]] = {
+    "raw": int(float(os.getenv("SERIES_RAW_RETENTION_DAYS", "366")) * DAY),
+    "1h": int(float(os.getenv("SERIES_1H_RETENTION_DAYS", "732")) * DAY),
+    "1d": None,
+    "1w": None,
+}
+RETENTION_CHECK = 3600.0
+
+
+def bucket(ts_ms, level: str):
+    """Начало бакета уровня для ts (число или массив, мс)."""
+    if level == "1w":
+        # недели с понедельника; 1970-01-01 — четверг
+        return ts_ms - (ts_ms + 3 * DAY) % WEEK
+    return ts_ms - ts_ms % _STEP[level]
+
+
+class _File:
+    """Один файл записей фиксированной ширины: дозапись, правка последней записи, memmap для чтения."""
+
+    def __init__(self, path: str, dtype: np.dtype):
+        self.path = path
+        self.dtype = dtype
+        self._mm: Optional[np.ndarray] = None
+        self._mm_len = -1
+        self.last: Optional[np.void] = None
+        n = self._fix_tail()
+        if n:
+            self.last = self.view()[-1].copy()
+
+    def _fix_tail(self) -> int:
+        # недописанная запись после падения — отрезаем
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return 0
+        n, rest = divmod(size, self.dtype.itemsize)
+        if rest:
+            with open(self.path, "r+b") as f:
+                f.truncate(n * self.dtype.itemsize)
+        return n
+
+    def __len__(self) -> int:
+        try:
+            return os.path.getsize(self.path) // self.dtype.itemsize
+        except OSError:
+            return 0
+
+    def view(self) -> np.ndarray:
+        """Все записи (memmap, только чтение); переоткрывается, если файл вырос."""
+        n = len(self)
+        if n == 0:
+            return np.empty(0, dtype=self.dtype)
+        if self._mm is None or self._mm_len != n:
+            self._mm = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(n,))
+            self._mm_len = n
+        return self._mm
+
+    def append(self, recs: np.ndarray) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "ab") as f:
+            f.write(recs.astype(self.dtype, copy=False).tobytes())
+        self.last = recs[-1].copy()
+
+    def replace_last(self, rec: np.void) -> None:
+        n = len(self)
+        with open(self.path, "r+b") as f:
+            f.seek((n - 1) * self.dtype.itemsize)
+            f.write(np.array([rec], dtype=self.dtype).tobytes())
+        self.last = rec.copy()
+
+    def cut_before(self, ts_ms: int) -> int:
+        """Атомарно удалить записи старше ts_ms; вернуть число удалённых."""
+        arr = self.view()
+        i = int(np.searchsorted(arr["ts"], ts_ms, side="left"))
+        if i == 0:
+            return 0
+        keep = np.array(arr[i:])
+        self._mm = None
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(keep.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._mm_len = -1
+        return i
+
+
+class Series:
+    def __init__(self, name: str, root: str = DATA_DIR):
+        safe = name.replace("/", "_").replace(":", "_")
+        base = os.path.join(root, safe)
+        self.name = name
+        self.raw = _File(base + ".raw.bin", RAW)
+        self.rollups = {lv: _File(f"{base}.{lv}.bin", ROLLUP) for lv in LEVELS}
+        self._lock = threading.Lock()
+        self._retention_at = 0.0
+
+    def _fold(self, level: str, ts: np.ndarray, vals: np.ndarray) -> None:
+        f = self.rollups[level]
+        b = bucket(ts, level)
+        # границы бакетов в пачке
+        starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+        ends = np.r_[starts[1:], len(b)]
+        recs = np.empty(len(starts), dtype=ROLLUP)
+        recs["ts"] = b[starts]
+        recs["open"] = vals[starts]
+        recs["high"] = np.maximum.reduceat(vals, starts)
+        recs["low"] = np.minimum.reduceat(vals, starts)
+        recs["close"] = vals[ends - 1]
+        recs["count"] = ends - starts
+        last = f.last
+        if last is not None and recs[0]["ts"] == last["ts"]:
+            m = last.copy()
+            r = recs[0]
+            m["high"], m["low"] = max(m["high"], r["high"]), min(m["low"], r["low"])
+            m["close"], m["count"] = r["close"], m["count"] + r["count"]
+            f.replace_last(m)
+            recs = recs[1:]
+        if len(recs):
+            f.append(recs)
+
+    def append_many(self, ts_ms: Iterable[int], values: Iterable[float]) -> int:
+        """Дописать точки (по возрастанию времени). Вернуть число принятых."""
+        ts = np.asarray(list(ts_ms), dtype=np.int64)
+        vals = np.asarray(list(values), dtype=np.float64)
+        with self._lock:
+            last = self.raw.last
+            ok = np.isfinite(vals)
+            if len(ts):
+                # точка принимается, только если она позже всех принятых до неё:
+                # сравниваем с накопленным максимумом, а не с соседом (сосед мог быть отброшен)
+                lo = np.iinfo(np.int64).min
+                seen = np.where(ok, ts, lo)
+                prev = np.maximum.accumulate(np.r_[lo if last is None else last["ts"], seen[:-1]])
+                ok &= ts > prev
+            ts, vals = ts[ok], vals[ok]
+            if not len(ts):
+                return 0
+            recs = np.empty(len(ts), dtype=RAW)
+            recs["ts"], recs["value"] = ts, vals
+            self.raw.append(recs)
+            for lv in LEVELS:
+                self._fold(lv, ts, vals)
+            if time.monotonic() - self._retention_at > RETENTION_CHECK:
+                self._retention_at = time.monotonic()
+                self._enforce_retention(int(ts[-1]))
+            return len(ts)
+
+    def append(self, ts_ms: int, value: float) -> bool:
+        return self.append_many([ts_ms], [value]) == 1
+
+    def _enforce_retention(self, now_ms: int) -> None:
+        for lv, f in [("raw", self.raw)] + list(self.rollups.items()):
+            keep = RETENTION.get(lv)
+            if keep:
+                f.cut_before(now_ms - keep)
+
+    # --- чтение -----------------------------------------------------------------------
+
+    def level_for(self, start_ms: int, end_ms: int) -> str:
+        span = end_ms - start_ms
+        if span <= 2 * DAY:
+            return "raw"
+        if span <= 90 * DAY:
+            return "1h"
+        if span <= 3 * 366 * DAY:
+            return "1d"
+        return "1w"
+
+    def range(self, start_ms: int, end_ms: int, level: str = "auto") -> np.ndarray:
+        """Записи с ts в [start_ms, end_ms] — срез memmap без копирования."""
+        if level == "auto":
+            level = self.level_for(start_ms, end_ms)
+        f = self.raw if level == "raw" else self.rollups[level]
+        if level != "raw":
+            start_ms = bucket(start_ms, level)
+        arr = f.view()
+        ts = arr["ts"]
+        lo = int(np.searchsorted(ts, start_ms, side="left"))
+        hi = int(np.searchsorted(ts, end_ms, side="right"))
+        return arr[lo:hi]
+
+    def points(self, start_ms: int, end_ms: int, level: str = "auto") -> Tuple[np.ndarray, np.ndarray]:
+        """(ts, value) для графика; у свёрток value — close бакета."""
+        arr = self.range(start_ms, end_ms, level)
+        if arr.dtype == RAW:
+            return np.asarray(arr["ts"]), np.asarray(arr["value"])
+        return np.asarray(arr["ts"]), np.asarray(arr["close"])
+
+    def stats(self, start_ms: int, end_ms: int, level: str = "auto") -> Dict[str, float]:
+        """first/last/min/max/mean/change_pct/max_drawdown_pct за диапазон."""
+        arr = self.range(start_ms, end_ms, level)
+        if not len(arr):
+            return {}
+        if arr.dtype == RAW:
+            v = np.asarray(arr["value"])
+            lo, hi, first, mean = v.min(), v.max(), v[0], v.mean()
+            peaks_src, troughs = v, v
+        else:
+            v = np.asarray(arr["close"])
+            lo, hi, first = arr["low"].min(), arr["high"].max(), arr["open"][0]
+            mean = v.mean()
+            # внутри бакета пик мог быть до минимума — берём high как пик, low как дно
+            peaks_src, troughs = np.asarray(arr["high"]), np.asarray(arr["low"])
+        peaks = np.maximum.accumulate(peaks_src)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dd = np.where(peaks > 0, troughs / peaks - 1.0, 0.0)
+        last = float(v[-1])
+        return {
+            "first": float(first), "last": last, "min": float(lo), "max": float(hi), "mean": float(mean),
+            "change_pct": (last / float(first) - 1.0) * 100 if first else 0.0,
+            "max_drawdown_pct": float(dd.min()) * 100,
+            "points": int(len(arr)),
+        }
+
+
+class SeriesStore:
+    def __init__(self, root: str = DATA_DIR):
+        self.root = root
+        self._series: Dict[str, Series] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Series:
+        with self._lock:
+            s = self._series.get(name)
+            if s is None:
+                s = self._series[name] = Series(name, self.root)
+            return s
+
+    def append(self, name: str, ts_ms: int, value: float) -> bool:
+        return self.get(name).append(ts_ms, value)
+
+    def range(self, name: str, start_ms: int, end_ms: int, level: str = "auto") -> np.ndarray:
+        return self.get(name).range(start_ms, end_ms, level)
+
+    def stats(self, name: str, start_ms: int, end_ms: int, level: str = "auto") -> Dict[str, float]:
+        return self.get(name).stats(start_ms, end_ms, level)
+
+    def names(self):
+        try:
+            files = os.listdir(self.root)
+        except OSError:
+            return []
+        return sorted({f[: -len(".raw.bin")] for f in files if f.endswith(".raw.bin")})
+
+
+SERIES = SeriesStore()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Локальное хранилище истории сделок (SQLite, data/trades.sqlite3).
+
+• trades — сделки с биржи (/api/v3/myTrades), ключ (symbol, id),
+  индекс по (symbol, time); повторная выгрузка той же сделки — upsert;
+• order_log — зеркало orders_log.json, чтобы storage не перечитывал
+  весь файл на каждый вызов: файл разбирается только если изменился.
+  Количество и цена хранятся текстом и суммируются в Decimal — как
+  storage считал по самому файлу.
+
+Сделки отдаются в той же форме, что и API (qty/price/quoteQty/isBuyer/...),
+так что entries_cache считает по ним теми же функциями.
+"""
+import json
+import os
+import sqlite3
+import threading
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DATA_DIR = os.path.join("data")
+DB_PATH = os.path.join(DATA_DIR, "trades.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    symbol           TEXT    NOT NULL,
+    id               TEXT    NOT NULL,
+    time             INTEGER NOT NULL,
+    is_buyer         INTEGER NOT NULL,
+    qty              REAL    NOT NULL,
+    price            REAL    NOT NULL,
+    quote_qty        REAL    NOT NULL,
+    commission       REAL    NOT NULL,
+    commission_asset TEXT    NOT NULL,
+    PRIMARY KEY (symbol, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS trades_symbol_time ON trades (symbol, time);
+
+CREATE TABLE IF NOT EXISTS order_log (
+    source TEXT    NOT NULL,
+    seq    INTEGER NOT NULL,
+    symbol TEXT    NOT NULL,
+    side   TEXT    NOT NULL,
+    qty    TEXT    NOT NULL,
+    price  TEXT    NOT NULL,
+    PRIMARY KEY (source, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS order_log_symbol ON order_log (source, side, symbol);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def _conn() -> sqlite3.Connection:
+    # sqlite3-соединение нельзя делить между потоками — держим по одному на поток
+    c = getattr(_local, "conn", None)
+    if c is None or getattr(_local, "path", None) != DB_PATH:
+        os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+        c = sqlite3.connect(DB_PATH, timeout=10)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.executescript(_SCHEMA)
+        _local.conn, _local.path = c, DB_PATH
+    return c
+
+
+# --- сделки -------------------------------------------------------------------
+
+def _trade_row(symbol: str, t: Dict[str, Any]) -> Tuple:
+    q = float(t.get("qty") or t.get("executedQty") or 0.0)
+    p = float(t.get("price") or 0.0)
+    return (
+        symbol,
+        str(t.get("id")),
+        int(t.get("time") or 0),
+        1 if t.get("isBuyer") else 0,
+        q,
+        p,
+        float(t.get("quoteQty") or (p * q)),
+        float(t.get("commission") or 0.0),
+        (t.get("commissionAsset") or "").upper(),
+    )
+
+
+def upsert_trades(symbol: str, trades: Iterable[Dict[str, Any]]) -> int:
+    """Сохранить сделки символа; дубликаты по id перезаписываются. Возвращает число строк."""
+    sym = symbol.upper()
+    rows = [_trade_row(sym, t) for t in trades if t.get("id") is not None]
+    if not rows:
+        return 0
+    c = _conn()
+    with c:
+        c.executemany("INSERT OR REPLACE INTO trades VALUES (?,?,?,?,?,?,?,?,?)", rows)
+    return len(rows)
+
+
+def load_trades(symbol: str, since_ms: Optional[int] = None, until_ms: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Сделки символа по времени, в форме ответа /api/v3/myTrades."""
+    sql = ("SELECT id, time, is_buyer, qty, price, quote_qty, commission, commission_asset "
+           "FROM trades WHERE symbol = ?")
+    args: List[Any] = [symbol.upper()]
+    if since_ms is not None:
+        sql += " AND time >= ?"
+        args.append(int(since_ms))
+    if until_ms is not None:
+        sql += " AND time <= ?"
+        args.append(int(until_ms))
+    sql += " ORDER BY time, id"
+    return [
+        {"symbol": symbol.upper(), "id": r[0], "time": r[1], "isBuyer": bool(r[2]), "qty": r[3],
+         "price": r[4], "quoteQty": r[5], "commission": r[6], "commissionAsset": r[7]}
+        for r in _conn().execute(sql, args)
+    ]
+
+
+def last_trade_time(symbol: str) -> Optional[int]:
+    row = _conn().execute("SELECT MAX(time) FROM trades WHERE symbol = ?", (symbol.upper(),)).fetchone()
+    return row[0] if row else None
+
+
+def list_symbols() -> List[str]:
+    return [r[0] for r in _conn().execute("SELECT DISTINCT symbol FROM trades ORDER BY symbol")]
+
+
+# --- зеркало orders_log.json --------------------------------------------------
+
+def ingest_orders_log(path: str) -> int:
+    """
+    Подтянуть новые записи из JSON-массива ордеров. Файл разбирается только
+    если изменились mtime/размер; дописываются записи после уже загруженных.
+    Если файл стал короче (переписан) — зеркало строится заново.
+    Возвращает число добавленных записей.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return 0
+    source = os.path.abspath(path)
+    stamp = f"{st.st_mtime_ns}:{st.st_size}"
+    c = _conn()
+    row = c.execute("SELECT value FROM meta WHERE key = ?", ("order_log:" + source,)).fetchone()
+    prev_stamp, prev_count = (row[0].rsplit(":", 1)[0], int(row[0].rsplit(":", 1)[1])) if row else ("", 0)
+    if prev_stamp == stamp:
+        return 0
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            orders = json.load(f)
+    except Exception:
+        return 0
+    if not isinstance(orders, list):
+        return 0
+    if len(orders) < prev_count:
+        prev_count = -1  # файл переписан — перестраиваем
+
+    rows = []
+    for seq, o in enumerate(orders):
+        if seq < prev_count:
+            continue
+        try:
+            # Decimal(str(...)) — как storage разбирал лог; невалидные записи пропускаем
+            rows.append((source, seq, str(o.get("symbol", "")).upper(), str(o.get("side", "")).upper(),
+                         str(Decimal(str(o.get("quantity")))), str(Decimal(str(o.get("price"))))))
+        except (InvalidOperation, AttributeError):
+            continue
+    with c:
+        if prev_count < 0:
+            c.execute("DELETE FROM order_log WHERE source = ?", (source,))
+        c.executemany("INSERT OR REPLACE INTO order_log VALUES (?,?,?,?,?,?)", rows)
+        c.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", ("order_log:" + source, f"{stamp}:{len(orders)}"))
+    return len(rows)
+
+
+# source -> (отметка зеркала, итоги): пока лог не менялся, суммы не пересчитываем
+_buy_totals: Dict[str, Tuple[str, Dict[str, Tuple[Decimal, Decimal]]]] = {}
+
+
+def logged_buy_totals(path: str) -> Dict[str, Tuple[Decimal, Decimal]]:
+    """{SYMBOL: (sum(qty*price), sum(qty))} в Decimal по BUY-записям orders_log (qty>0, price>0)."""
+    ingest_orders_log(path)
+    source = os.path.abspath(path)
+    c = _conn()
+    row = c.execute("SELECT value FROM meta WHERE key = ?", ("order_log:" + source,)).fetchone()
+    stamp = row[0] if row else ""
+    hit = _buy_totals.get(source)
+    if hit is not None and hit[0] == stamp:
+        return dict(hit[1])
+    totals: Dict[str, Tuple[Decimal, Decimal]] = {}
+    cur = c.execute("SELECT symbol, qty, price FROM order_log WHERE source = ? AND side = 'BUY' ORDER BY seq",
+                    (source,))
+    for symbol, qty, price in cur:
+        q, p = Decimal(qty), Decimal(price)
+        if q <= 0 or p <= 0:
+            continue
+        val, qs = totals.get(symbol, (Decimal("0"), Decimal("0")))
+        totals[symbol] = (val + q * p, qs + q)
+    _buy_totals[source] = (stamp, totals)
+    return dict(totals)